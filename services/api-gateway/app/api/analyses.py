@@ -1,26 +1,34 @@
+import base64
 from datetime import datetime, timezone
 import re
 from uuid import UUID
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
-from sqlalchemy import func, select, update
+from sqlalchemy import func, or_, select, true, tuple_, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.auth import get_current_user
-from app.api.deps import parse_uuid
+from app.api.deps import conditional_headers, etag_matches, parse_uuid, revision_etag
 from app.core.config import settings
+from app.core.responses import ORJSONResponse
 from app.db.models.analysis import Analysis, TzCharacteristicReview
 from app.db.models.extraction_results import ExtractionResult
 from app.db.models.comparison_jobs import ComparisonJob
 from app.db.models.extraction_jobs import ExtractionJob
 from app.db.models.files import File as FileModel
-from app.db.models.analysis import ComparisonRow, HiddenCharacteristic, UserEdit
+from app.db.models.analysis import (
+    ComparisonRow,
+    HiddenCharacteristic,
+    UserEdit,
+    ViewerContextSnapshot,
+)
 from app.db.models.users import User
 from app.db.session import get_db
+from app.services import presigned_urls, revisions
 from app.services.extraction_backends import extraction_backend_label
 from app.tasks import extract_file
 
@@ -364,87 +372,190 @@ def _utc_isoformat(dt: datetime | None) -> str | None:
     return dt.isoformat()
 
 
-async def build_analysis_items(db: AsyncSession, user: User | None = None) -> list[dict]:
-    query = select(
-        Analysis.id,
-        Analysis.status,
-        Analysis.created_at,
-        Analysis.extraction_backend,
-        Analysis.task_id,
-        Analysis.product_model,
-        Analysis.completed_at,
+# Статусы анализа по группам фильтра (status_key из _status_key). Всё, что
+# сюда не попало, показывается как in-progress.
+_STATUS_KEY_GROUPS = {
+    "in-progress": (
+        "processing_files",
+        "files_uploaded",
+        "extracting_data",
+        "analyzing_data",
+        "extracting_passport",
+    ),
+    "review": ("tz_review",),
+    "ready": ("ready",),
+    "error": ("failed",),
+}
+
+
+def encode_analysis_cursor(created_at: datetime, analysis_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{analysis_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_analysis_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, analysis_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(analysis_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _status_key_filter(status_keys: list[str]):
+    known = [status for group in _STATUS_KEY_GROUPS.values() for status in group]
+    conditions = []
+    for key in status_keys:
+        if key not in _STATUS_KEY_GROUPS:
+            raise HTTPException(status_code=400, detail=f"Invalid status filter: {key}")
+        conditions.append(Analysis.status.in_(_STATUS_KEY_GROUPS[key]))
+        if key == "in-progress":
+            conditions.append(Analysis.status.not_in(known))
+    return or_(*conditions)
+
+
+def _analysis_list_query(
+    user: User | None,
+    *,
+    limit: int | None,
+    after: tuple[datetime, UUID] | None,
+    status_keys: list[str] | None,
+):
+    """Список анализов одним запросом: файлы ТЗ/паспорта и последняя ошибка
+    извлечения/сравнения подтягиваются LATERAL-подзапросами, а не отдельным
+    запросом на каждый анализ. Ошибки ищутся только у failed-анализов."""
+    tz_file = (
+        select(FileModel.id, FileModel.original_name)
+        .where(FileModel.analysis_id == Analysis.id, FileModel.file_type == "tz")
+        .limit(1)
+        .lateral("tz_file")
+    )
+    passport_file = (
+        select(FileModel.id, FileModel.original_name)
+        .where(FileModel.analysis_id == Analysis.id, FileModel.file_type == "passport")
+        .limit(1)
+        .lateral("passport_file")
+    )
+    extraction_error = (
+        select(ExtractionJob.file_type, ExtractionJob.last_error)
+        .where(
+            Analysis.status == "failed",
+            ExtractionJob.analysis_id == Analysis.id,
+            ExtractionJob.last_error.is_not(None),
+        )
+        .order_by(ExtractionJob.updated_at.desc())
+        .limit(1)
+        .lateral("extraction_error")
+    )
+    comparison_error = (
+        select(ComparisonJob.last_error)
+        .where(
+            Analysis.status == "failed",
+            ComparisonJob.analysis_id == Analysis.id,
+            ComparisonJob.last_error.is_not(None),
+        )
+        .order_by(ComparisonJob.updated_at.desc())
+        .limit(1)
+        .lateral("comparison_error")
+    )
+    query = (
+        select(
+            Analysis.id,
+            Analysis.status,
+            Analysis.created_at,
+            Analysis.extraction_backend,
+            Analysis.task_id,
+            Analysis.product_model,
+            Analysis.completed_at,
+            tz_file.c.id.label("tz_id"),
+            tz_file.c.original_name.label("tz_name"),
+            passport_file.c.id.label("passport_id"),
+            passport_file.c.original_name.label("passport_name"),
+            extraction_error.c.file_type.label("extraction_error_file_type"),
+            extraction_error.c.last_error.label("extraction_error"),
+            comparison_error.c.last_error.label("comparison_error"),
+        )
+        .outerjoin(tz_file, true())
+        .outerjoin(passport_file, true())
+        .outerjoin(extraction_error, true())
+        .outerjoin(comparison_error, true())
     )
     if user is not None:
         query = query.where(Analysis.user_id == user.id)
-    rows = await db.execute(query.order_by(Analysis.created_at.desc()))
-    analyses = rows.all()
-    items = []
-    for analysis_id, status, created_at, extraction_backend, task_id, product_model, completed_at in analyses:
-        files_rows = await db.execute(
-            select(
-                FileModel.id,
-                FileModel.file_type,
-                FileModel.original_name,
-                FileModel.status,
-            ).where(FileModel.analysis_id == analysis_id)
-        )
-        files = files_rows.all()
-        tz = next((f for f in files if f.file_type == "tz"), None)
-        passport = next((f for f in files if f.file_type == "passport"), None)
-        error_summary = None
-        error_detail = None
-        if status == "failed":
-            extraction_error_rows = await db.execute(
-                select(ExtractionJob.file_type, ExtractionJob.last_error)
-                .where(ExtractionJob.analysis_id == analysis_id)
-                .where(ExtractionJob.last_error.is_not(None))
-                .order_by(ExtractionJob.updated_at.desc())
+    if status_keys:
+        query = query.where(_status_key_filter(status_keys))
+    if after is not None:
+        # Keyset-пагинация: продолжаем строго после последнего анализа
+        # предыдущей страницы в порядке (created_at, id) по убыванию.
+        query = query.where(tuple_(Analysis.created_at, Analysis.id) < tuple_(*after))
+    query = query.order_by(Analysis.created_at.desc(), Analysis.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _analysis_item(row) -> dict:
+    error_summary = None
+    error_detail = None
+    if row.status == "failed":
+        if row.extraction_error:
+            file_label = "ТЗ" if row.extraction_error_file_type == "tz" else "паспорт"
+            error_summary, error_detail = _build_error_payload(
+                f"Ошибка извлечения ({file_label})",
+                row.extraction_error,
             )
-            extraction_error = extraction_error_rows.first()
-            if extraction_error:
-                file_label = "ТЗ" if extraction_error.file_type == "tz" else "паспорт"
-                error_summary, error_detail = _build_error_payload(
-                    f"Ошибка извлечения ({file_label})",
-                    extraction_error.last_error,
-                )
-            else:
-                comparison_error_rows = await db.execute(
-                    select(ComparisonJob.last_error)
-                    .where(ComparisonJob.analysis_id == analysis_id)
-                    .where(ComparisonJob.last_error.is_not(None))
-                    .order_by(ComparisonJob.updated_at.desc())
-                )
-                comparison_error = comparison_error_rows.scalar_one_or_none()
-                error_summary, error_detail = _build_error_payload(
-                    "Ошибка сравнения",
-                    comparison_error,
-                )
+        else:
+            error_summary, error_detail = _build_error_payload(
+                "Ошибка сравнения",
+                row.comparison_error,
+            )
+    return {
+        "analysis_id": str(row.id),
+        "task_id": row.task_id,
+        "product_model": row.product_model,
+        "tz": row.tz_name or "",
+        "tz_id": str(row.tz_id) if row.tz_id else "",
+        "passport": row.passport_name or "",
+        "passport_id": str(row.passport_id) if row.passport_id else "",
+        "status": _status_label(row.status),
+        "status_key": _status_key(row.status),
+        "extraction_backend": row.extraction_backend,
+        "extraction_backend_label": extraction_backend_label(row.extraction_backend),
+        "created_at": _utc_isoformat(row.created_at),
+        "completed_at": _utc_isoformat(row.completed_at),
+        "error_message": _truncate_error(error_detail),
+        "error_summary": error_summary,
+        "error_detail": error_detail,
+    }
 
-        items.append(
-            {
-                "analysis_id": str(analysis_id),
-                "task_id": task_id,
-                "product_model": product_model,
-                "tz": tz.original_name if tz else "",
-                "tz_id": str(tz.id) if tz else "",
-                "passport": passport.original_name if passport else "",
-                "passport_id": str(passport.id) if passport else "",
-                "status": _status_label(status),
-                "status_key": _status_key(status),
-                "extraction_backend": extraction_backend,
-                "extraction_backend_label": extraction_backend_label(extraction_backend),
-                "created_at": _utc_isoformat(created_at),
-                "completed_at": _utc_isoformat(completed_at),
-                "error_message": _truncate_error(error_detail),
-                "error_summary": error_summary,
-                "error_detail": error_detail,
-            }
-        )
-    return items
 
+async def build_analysis_items(
+    db: AsyncSession,
+    user: User | None = None,
+    *,
+    limit: int | None = None,
+    cursor: str | None = None,
+    status_keys: list[str] | None = None,
+) -> tuple[list[dict], str | None]:
+    """Элементы списка анализов и курсор следующей страницы (None — страница
+    последняя или limit не задан)."""
+    after = decode_analysis_cursor(cursor) if cursor else None
+    result = await db.execute(
+        _analysis_list_query(user, limit=limit, after=after, status_keys=status_keys)
+    )
+    rows = result.all()
+    next_cursor = None
+    if limit is not None and len(rows) == limit:
+        next_cursor = encode_analysis_cursor(rows[-1].created_at, rows[-1].id)
+    return [_analysis_item(row) for row in rows], next_cursor
 
-async def _compute_processing_seconds(
-    analysis_id: UUID, db: AsyncSession
+
+def _compute_processing_seconds(
+    created_at: datetime | None,
+    completed_at: datetime | None,
+    status: str,
+    tz_ready_at: datetime | None,
+    passport_started_at: datetime | None,
 ) -> float | None:
     """Время обработки в секундах: ВСЁ время от загрузки документов до статуса
     «готово», на паузе ТОЛЬКО когда система ждёт действия пользователя.
@@ -455,39 +566,14 @@ async def _compute_processing_seconds(
     поэтому конец паузы = старт извлечения паспорта, а НЕ создание comparison_job
     (между ними идёт извлечение паспорта — это активная работа, её вычитать нельзя).
 
-    Активное время = (конец − старт) − (старт_извлечения_паспорта − готовность_ТЗ)."""
-    analysis = (
-        await db.execute(
-            select(Analysis.created_at, Analysis.completed_at, Analysis.status).where(
-                Analysis.id == analysis_id
-            )
-        )
-    ).one_or_none()
-    if analysis is None:
-        return None
-    created_at, completed_at, status = analysis
+    Активное время = (конец − старт) − (старт_извлечения_паспорта − готовность_ТЗ).
+
+    tz_ready_at — готовность ТЗ, начало паузы (система перешла в tz_review и
+    ждёт пользователя); passport_started_at — старт извлечения паспорта, конец
+    паузы (пользователь подтвердил ТЗ). Оба берутся из _viewer_state_query."""
     if created_at is None:
         return None
 
-    # Готовность ТЗ → начало паузы (система перешла в tz_review и ждёт пользователя).
-    tz_ready_at = (
-        await db.execute(
-            select(func.max(ExtractionJob.completed_at)).where(
-                ExtractionJob.analysis_id == analysis_id,
-                ExtractionJob.file_type == "tz",
-            )
-        )
-    ).scalar_one_or_none()
-    # Старт извлечения паспорта → конец паузы (пользователь подтвердил ТЗ).
-    passport_started_at = (
-        await db.execute(
-            select(func.min(ExtractionJob.created_at)).where(
-                ExtractionJob.analysis_id == analysis_id,
-                ExtractionJob.file_type == "passport",
-            )
-        )
-    ).scalar_one_or_none()
-
     # Конечная точка отсчёта: завершение, либо граница паузы / «сейчас» если в работе.
     end_at = completed_at
     if end_at is None:
@@ -510,7 +596,99 @@ async def _compute_processing_seconds(
     return round(total, 1) if total >= 0 else None
 
 
-async def build_viewer_context_payload(analysis_id: UUID, db: AsyncSession) -> dict:
+def _viewer_state_query(analysis_id: UUID):
+    """Изменчивая часть viewer-context, ревизия анализа и ревизия сохранённого
+    снимка — одним запросом.
+
+    Время обработки и прогресс сравнения меняются без правки данных снимка
+    (идёт время, приходят /compare/progress), поэтому в снимок они не входят
+    и читаются на каждый запрос. Сам снимок (мегабайты JSONB) читается
+    отдельно и только если ответ не 304."""
+    tz_ready_at = (
+        select(func.max(ExtractionJob.completed_at))
+        .where(ExtractionJob.analysis_id == Analysis.id, ExtractionJob.file_type == "tz")
+        .scalar_subquery()
+    )
+    passport_started_at = (
+        select(func.min(ExtractionJob.created_at))
+        .where(ExtractionJob.analysis_id == Analysis.id, ExtractionJob.file_type == "passport")
+        .scalar_subquery()
+    )
+    return (
+        select(
+            Analysis.created_at,
+            Analysis.completed_at,
+            Analysis.status,
+            Analysis.revision,
+            tz_ready_at.label("tz_ready_at"),
+            passport_started_at.label("passport_started_at"),
+            ComparisonJob.status.label("comparison_status"),
+            ComparisonJob.progress,
+            ViewerContextSnapshot.revision.label("snapshot_revision"),
+        )
+        .outerjoin(ComparisonJob, ComparisonJob.analysis_id == Analysis.id)
+        .outerjoin(ViewerContextSnapshot, ViewerContextSnapshot.analysis_id == Analysis.id)
+        .where(Analysis.id == analysis_id)
+    )
+
+
+async def build_viewer_context_payload(
+    analysis_id: UUID,
+    db: AsyncSession,
+    if_none_match: str | None = None,
+) -> tuple[dict | None, str]:
+    """Ответ viewer-context и его ETag: снимок документов и строк
+    (пересобирается, только если ревизия анализа изменилась) плюс изменчивое
+    состояние анализа. Если клиентская копия совпадает с ETag, вместо ответа
+    возвращается None — снимок при этом не читается и не собирается."""
+    state = (await db.execute(_viewer_state_query(analysis_id))).one()
+    processing_seconds = _compute_processing_seconds(
+        state.created_at,
+        state.completed_at,
+        state.status,
+        state.tz_ready_at,
+        state.passport_started_at,
+    )
+    # Время обработки, статус и прогресс сравнения меняют ответ без правки
+    # данных снимка (и без bump ревизии) — поэтому они входят в ETag наравне
+    # с ревизией.
+    etag = revision_etag(
+        state.revision,
+        processing_seconds,
+        state.comparison_status,
+        state.progress,
+    )
+    if etag_matches(if_none_match, etag):
+        return None, etag
+
+    snapshot = None
+    if state.snapshot_revision == state.revision:
+        snapshot = (
+            await db.execute(
+                select(ViewerContextSnapshot.payload)
+                .where(ViewerContextSnapshot.analysis_id == analysis_id)
+                .where(ViewerContextSnapshot.revision == state.revision)
+            )
+        ).scalar_one_or_none()
+    if snapshot is None:
+        snapshot = await _build_viewer_snapshot(analysis_id, db)
+        await revisions.store_snapshot(db, analysis_id, state.revision, snapshot)
+
+    return {
+        "analysis_id": str(analysis_id),
+        "evidence_version": "v2",
+        "documents": snapshot["documents"],
+        "available_documents": snapshot["documents"],
+        "processing_seconds": processing_seconds,
+        # Пока сравнение идёт, rows содержит только строки готовых chunk'ов
+        # (POST /compare/partial); progress — процент готовых строк.
+        "comparison_status": state.comparison_status,
+        "progress": state.progress,
+        "rows": snapshot["rows"],
+    }, etag
+
+
+async def _build_viewer_snapshot(analysis_id: UUID, db: AsyncSession) -> dict:
     extraction_result_rows = await db.execute(
         select(ExtractionResult).where(ExtractionResult.analysis_id == analysis_id)
     )
@@ -537,7 +715,13 @@ async def build_viewer_context_payload(analysis_id: UUID, db: AsyncSession) -> d
         }
 
     rows_result = await db.execute(
-        select(ComparisonRow).where(ComparisonRow.analysis_id == analysis_id)
+        select(ComparisonRow)
+        .where(ComparisonRow.analysis_id == analysis_id)
+        .order_by(
+            ComparisonRow.position.asc().nulls_last(),
+            ComparisonRow.created_at,
+            ComparisonRow.id,
+        )
     )
     all_rows = rows_result.scalars().all()
 
@@ -592,14 +776,8 @@ async def build_viewer_context_payload(analysis_id: UUID, db: AsyncSession) -> d
         if tz_row.name and tz_row.comment and tz_row.comment.strip():
             tz_comments_by_name.setdefault(tz_row.name, []).append(tz_row.comment.strip())
 
-    processing_seconds = await _compute_processing_seconds(analysis_id, db)
-
     return {
-        "analysis_id": str(analysis_id),
-        "evidence_version": "v2",
         "documents": documents,
-        "available_documents": documents,
-        "processing_seconds": processing_seconds,
         "rows": [
             _build_viewer_row(
                 row, user_edits_by_row, tz_comments_by_name, feedback_by_row
@@ -863,6 +1041,8 @@ async def _save_tz_review_decisions(
             comment=comment,
             db=db,
         )
+    # Комментарии ТЗ-ревью показываются в строках viewer-context.
+    await revisions.bump(db, analysis_id)
 
 
 def _review_target_characteristics(
@@ -1078,11 +1258,20 @@ async def list_extraction_backends(
 
 @router.get("/analyses")
 async def list_analyses(
+    limit: int | None = Query(default=None, ge=1, le=500),
+    cursor: str | None = Query(default=None),
+    status: list[str] | None = Query(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    items = await build_analysis_items(db, current_user)
-    return {"items": items}
+    """Анализы пользователя, новые сверху. Без limit — весь список, как
+    раньше; с limit — страница и next_cursor для следующей. status —
+    фильтр по status_key (in-progress, review, ready, error), можно
+    несколько."""
+    items, next_cursor = await build_analysis_items(
+        db, current_user, limit=limit, cursor=cursor, status_keys=status
+    )
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.post("/analyses/{analysis_id}/status")
@@ -1097,7 +1286,7 @@ async def set_status(
     await db.execute(
         update(Analysis)
         .where(Analysis.id == analysis_uuid)
-        .values(status=status, updated_at=datetime.utcnow())
+        .values(status=status, updated_at=datetime.utcnow(), revision=Analysis.revision + 1)
     )
     await db.commit()
     return {"ok": True}
@@ -1107,13 +1296,17 @@ async def set_status(
 async def get_extraction(
     analysis_id: str,
     file_type: str,
+    if_none_match: str | None = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if file_type not in {"tz", "passport"}:
         raise HTTPException(status_code=400, detail="Invalid file type")
     analysis_uuid = parse_uuid(analysis_id)
-    await _ensure_analysis_owner(analysis_uuid, db, current_user)
+    analysis = await _ensure_analysis_owner(analysis_uuid, db, current_user)
+    etag = revision_etag(analysis.revision)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=conditional_headers(etag))
     result = await db.execute(
         select(ExtractionResult)
         .where(ExtractionResult.analysis_id == analysis_uuid)
@@ -1122,13 +1315,14 @@ async def get_extraction(
     row = result.scalar_one_or_none()
     if row is None:
         raise HTTPException(status_code=404, detail="Not found")
-    return JSONResponse(content=row.payload)
+    return ORJSONResponse(content=row.payload, headers=conditional_headers(etag))
 
 
 @router.get("/analyses/{analysis_id}/ocr-index/{file_type}")
 async def get_ocr_index(
     analysis_id: str,
     file_type: str,
+    if_none_match: str | None = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -1143,7 +1337,10 @@ async def get_ocr_index(
     if file_type not in {"tz", "passport"}:
         raise HTTPException(status_code=400, detail="Invalid file type")
     analysis_uuid = parse_uuid(analysis_id)
-    await _ensure_analysis_owner(analysis_uuid, db, current_user)
+    analysis = await _ensure_analysis_owner(analysis_uuid, db, current_user)
+    etag = revision_etag(analysis.revision)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=conditional_headers(etag))
 
     cache_file_type = f"{file_type}_ocr_index"
     cached = await db.execute(
@@ -1153,7 +1350,7 @@ async def get_ocr_index(
     )
     cached_row = cached.scalar_one_or_none()
     if cached_row is not None:
-        return JSONResponse(content=cached_row.payload)
+        return ORJSONResponse(content=cached_row.payload, headers=conditional_headers(etag))
 
     file_result = await db.execute(
         select(FileModel)
@@ -1165,13 +1362,7 @@ async def get_ocr_index(
         raise HTTPException(status_code=404, detail="File not found")
 
     try:
-        async with httpx.AsyncClient(timeout=15) as presign_client:
-            presign_resp = await presign_client.get(
-                f"{settings.FILE_SERVICE_URL}/files/presign",
-                params={"key": file_record.storage_path, "expires_in": 3600},
-            )
-            presign_resp.raise_for_status()
-            presigned_url = presign_resp.json().get("url", "")
+        presigned_url = await presigned_urls.aget_url(file_record.storage_path)
     except Exception as exc:
         raise HTTPException(status_code=502, detail=f"Failed to presign file: {exc}") from exc
     if not presigned_url:
@@ -1206,35 +1397,45 @@ async def get_ocr_index(
     await db.execute(upsert_stmt)
     await db.commit()
 
-    return JSONResponse(content=payload)
+    return ORJSONResponse(content=payload, headers=conditional_headers(etag))
 
 
 @router.get("/analyses/{analysis_id}/comparison")
 async def get_comparison(
     analysis_id: str,
+    if_none_match: str | None = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     analysis_uuid = parse_uuid(analysis_id)
-    await _ensure_analysis_owner(analysis_uuid, db, current_user)
+    analysis = await _ensure_analysis_owner(analysis_uuid, db, current_user)
+    etag = revision_etag(analysis.revision)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=conditional_headers(etag))
     result = await db.execute(
         select(ComparisonJob).where(ComparisonJob.analysis_id == analysis_uuid)
     )
     job = result.scalar_one_or_none()
     if job is None or job.result is None:
         raise HTTPException(status_code=404, detail="Not found")
-    return JSONResponse(content=job.result)
+    return ORJSONResponse(content=job.result, headers=conditional_headers(etag))
 
 
 @router.get("/analyses/{analysis_id}/viewer-context")
 async def get_viewer_context(
     analysis_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     analysis_uuid = parse_uuid(analysis_id)
     await _ensure_analysis_owner(analysis_uuid, db, current_user)
-    return await build_viewer_context_payload(analysis_uuid, db)
+    payload, etag = await build_viewer_context_payload(analysis_uuid, db, if_none_match)
+    if payload is None:
+        return Response(status_code=304, headers=conditional_headers(etag))
+    response.headers.update(conditional_headers(etag))
+    return payload
 
 
 @router.put("/analyses/{analysis_id}/tz-marks")
@@ -1276,5 +1477,6 @@ async def save_tz_marks(
         )
         updated += 1
 
+    await revisions.bump(db, analysis_uuid)
     await db.commit()
     return {"ok": True, "updated": updated}
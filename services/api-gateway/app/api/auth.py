@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import time
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import select, update
@@ -14,6 +15,8 @@ from app.core.security import (
 from app.db.models.users import User, UserSession
 from app.db.session import get_db
 from app.schemas.user import LoginRequest, LoginResponse, UserCreate, UserPublic
+from app.services import session_cache
+from app.services.session_cache import AuthSession
 
 router = APIRouter()
 MIN_PASSWORD_LENGTH = 8
@@ -49,32 +52,39 @@ def _session_expiry() -> datetime:
     return datetime.utcnow() + timedelta(minutes=settings.SESSION_EXPIRE_MINUTES)
 
 
-async def _get_user_from_session_cookie(request: Request, db: AsyncSession) -> User | None:
+async def resolve_auth_session(request: Request, db: AsyncSession) -> AuthSession | None:
+    """Сессия по cookie: из request.state, если её уже нашёл auth_gate, иначе
+    из кэша процесса или из базы. last_seen_at пишется пакетно
+    (session_cache.flush_last_seen)."""
+    if hasattr(request.state, "auth_session"):
+        return request.state.auth_session
     token = request.cookies.get(settings.SESSION_COOKIE_NAME)
     if not token:
+        request.state.auth_session = None
         return None
 
+    token_hash = hash_secret_token(token)
     now = datetime.utcnow()
-    result = await db.execute(
-        select(UserSession, User)
-        .join(User, User.id == UserSession.user_id)
-        .where(UserSession.token_hash == hash_secret_token(token))
-        .where(UserSession.revoked_at.is_(None))
-        .where(UserSession.expires_at > now)
-    )
-    row = result.one_or_none()
-    if row is None:
-        return None
-
-    session, user = row
-    if not session.last_seen_at or (now - session.last_seen_at).total_seconds() > 60:
-        await db.execute(
-            update(UserSession)
-            .where(UserSession.id == session.id)
-            .values(last_seen_at=now)
+    monotonic_now = time.monotonic()
+    auth = session_cache.get(token_hash, now, monotonic_now)
+    if auth is None:
+        result = await db.execute(
+            select(UserSession, User)
+            .join(User, User.id == UserSession.user_id)
+            .where(UserSession.token_hash == token_hash)
+            .where(UserSession.revoked_at.is_(None))
+            .where(UserSession.expires_at > now)
         )
-        await db.commit()
-    return user
+        row = result.one_or_none()
+        if row is not None:
+            session, user = row
+            auth = AuthSession(session.id, user, session.csrf_token_hash, session.expires_at)
+            session_cache.put(token_hash, auth, monotonic_now)
+
+    if auth is not None:
+        session_cache.touch(auth.session_id, now)
+    request.state.auth_session = auth
+    return auth
 
 
 async def get_current_user(
@@ -94,7 +104,8 @@ async def get_current_user_optional(
     request: Request,
     db: AsyncSession = Depends(get_db),
 ) -> User | None:
-    return await _get_user_from_session_cookie(request, db)
+    auth = await resolve_auth_session(request, db)
+    return auth.user if auth is not None else None
 
 
 async def create_user_session(
@@ -148,6 +159,7 @@ async def revoke_current_session(
 ) -> None:
     session_token = request.cookies.get(settings.SESSION_COOKIE_NAME)
     if session_token:
+        session_cache.invalidate(hash_secret_token(session_token))
         await db.execute(
             update(UserSession)
             .where(UserSession.token_hash == hash_secret_token(session_token))
@@ -170,14 +182,15 @@ async def validate_csrf(request: Request, db: AsyncSession) -> bool:
     if csrf_cookie != csrf_header:
         return False
 
-    result = await db.execute(
-        select(UserSession.id)
-        .where(UserSession.token_hash == hash_secret_token(session_token))
-        .where(UserSession.csrf_token_hash == hash_secret_token(csrf_cookie))
-        .where(UserSession.revoked_at.is_(None))
-        .where(UserSession.expires_at > datetime.utcnow())
-    )
-    return result.scalar_one_or_none() is not None
+    csrf_hash = hash_secret_token(csrf_cookie)
+    auth = await resolve_auth_session(request, db)
+    if auth is not None and auth.csrf_token_hash != csrf_hash:
+        # CSRF-токен мог смениться через /auth/csrf в другом процессе gateway,
+        # а здесь в кэше ещё старый — перечитываем сессию из базы.
+        session_cache.invalidate(hash_secret_token(session_token))
+        del request.state.auth_session
+        auth = await resolve_auth_session(request, db)
+    return auth is not None and auth.csrf_token_hash == csrf_hash
 
 
 @router.post("/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
@@ -252,6 +265,7 @@ async def read_csrf_token(
         csrf_token = generate_secret_token()
         session.csrf_token_hash = hash_secret_token(csrf_token)
         await db.commit()
+        session_cache.invalidate(session.token_hash)
         response.set_cookie(
             settings.CSRF_COOKIE_NAME,
             csrf_token,
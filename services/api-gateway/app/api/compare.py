@@ -1,19 +1,303 @@
+import re
 from datetime import datetime
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException
-from sqlalchemy import delete, update
+from sqlalchemy import bindparam, delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
 from app.db.models.comparison_jobs import ComparisonJob
 from app.db.models.analysis import Analysis, ComparisonRow
+from app.core.config import settings
 from app.db.session import get_db
+from app.services import revisions
 from app.services.comp_data import update_comp_data
 
 router = APIRouter()
 
 
+def _comparison_row_values(analysis_id: UUID, item: dict, position: int | None) -> dict:
+    tz_value = item.get("tz_value")
+    passport_value = item.get("passport_value")
+    tz_value = str(tz_value) if tz_value is not None else None
+    passport_value = str(passport_value) if passport_value is not None else None
+    return {
+        "analysis_id": analysis_id,
+        "product_name": item.get("product_name"),
+        "is_target_model": item.get("is_target_model"),
+        "characteristic": item.get("characteristic") or "",
+        "tz_value": tz_value,
+        "passport_value": passport_value,
+        "tz_quote": item.get("tz_quote"),
+        "passport_quote": item.get("passport_quote"),
+        "tz_evidence": item.get("tz_evidence"),
+        "passport_evidence": item.get("passport_evidence"),
+        "passport_value_candidates": item.get("passport_value_candidates"),
+        "llm_result": item.get("is_match"),
+        "user_result": None,
+        "note": item.get("note"),
+        # Старый domain-analyze position не присылает — тогда место в списке.
+        "position": item.get("position") if isinstance(item.get("position"), int) else position,
+    }
+
+
+async def insert_comparison_rows(
+    db: AsyncSession, analysis_id: UUID, comparisons: list
+) -> int:
+    """Вставляет строки сравнения пачками через executemany, минуя unit of
+    work ORM: на сотнях строк с крупными JSONB объекты ORM и их flush
+    занимали большую часть времени callback'а. Возвращает число строк."""
+    values = [
+        _comparison_row_values(analysis_id, item, position)
+        for position, item in enumerate(comparisons)
+        if isinstance(item, dict)
+    ]
+    await _insert_row_values(db, values)
+    return len(values)
+
+
+async def _insert_row_values(db: AsyncSession, values: list[dict]) -> None:
+    batch_size = max(1, settings.COMPARISON_ROW_INSERT_BATCH_SIZE)
+    for start in range(0, len(values), batch_size):
+        await db.execute(insert(ComparisonRow), values[start : start + batch_size])
+
+
+# Колонки, которые формирует сравнение. Остальные (user_result,
+# user_tz_mark, confirmed_passport_matches) — состояние пользователя, и
+# повторное сравнение их не трогает.
+_COMPARISON_COLUMNS = (
+    "product_name",
+    "is_target_model",
+    "characteristic",
+    "tz_value",
+    "passport_value",
+    "tz_quote",
+    "passport_quote",
+    "tz_evidence",
+    "passport_evidence",
+    "passport_value_candidates",
+    "llm_result",
+    "note",
+    "position",
+)
+
+
+def _normalize_characteristic(name: str | None) -> str:
+    text = (name or "").strip().lower().replace("ё", "е")
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _row_keys(rows: list[tuple[str | None, str | None]]) -> list[tuple[str, str, int]]:
+    """Стабильные ключи строк: изделие + нормализованная характеристика. Если
+    одна характеристика изделия встречается несколько раз, к ключу
+    добавляется номер вхождения по порядку."""
+    seen: dict[tuple[str, str], int] = {}
+    keys = []
+    for product_name, characteristic in rows:
+        base = (product_name or "", _normalize_characteristic(characteristic))
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        keys.append((*base, occurrence))
+    return keys
+
+
+def _row_order(row) -> tuple:
+    # Строки без position (записанные до появления колонки) — после
+    # остальных, в порядке вставки, насколько его можно восстановить.
+    return (row.position is None, row.position or 0, row.created_at, str(row.id))
+
+
+def _plan_row_merge(existing_rows: list, new_values: list[dict]) -> tuple[
+    list[dict], dict[tuple[str, ...], list[dict]], list[UUID], int
+]:
+    """Сопоставляет строки анализа с новым результатом по ключу (изделие,
+    нормализованная характеристика, номер вхождения). Вхождения нумеруются
+    по месту строки в результате, а не по id: id случайный, и при повторах
+    характеристики отметки пользователя уехали бы на соседнюю строку.
+    Возвращает (новые строки, обновления по наборам колонок, id исчезнувших
+    строк, число сопоставленных)."""
+    existing_rows = sorted(existing_rows, key=_row_order)
+    existing_by_key = dict(
+        zip(
+            _row_keys([(row.product_name, row.characteristic) for row in existing_rows]),
+            existing_rows,
+        )
+    )
+    new_values = sorted(new_values, key=lambda values: values["position"])
+
+    to_insert: list[dict] = []
+    # Обновления группируются по набору изменившихся колонок: executemany
+    # требует одинаковых параметров у всех строк пачки.
+    updates: dict[tuple[str, ...], list[dict]] = {}
+    matched_ids = set()
+    new_keys = _row_keys([(values["product_name"], values["characteristic"]) for values in new_values])
+    for key, values in zip(new_keys, new_values):
+        existing = existing_by_key.get(key)
+        if existing is None:
+            to_insert.append(values)
+            continue
+        matched_ids.add(existing.id)
+        changed = {
+            column: values[column]
+            for column in _COMPARISON_COLUMNS
+            if getattr(existing, column) != values[column]
+        }
+        if not changed:
+            continue
+        # Подтверждённые вхождения ссылаются на позиции кандидатов — при
+        # новом списке кандидатов выбор оператора теряет смысл.
+        if "passport_value_candidates" in changed:
+            changed["confirmed_passport_matches"] = None
+        updates.setdefault(tuple(sorted(changed)), []).append(
+            {"row_id": existing.id, **{f"new_{column}": value for column, value in changed.items()}}
+        )
+    vanished = [row.id for row in existing_rows if row.id not in matched_ids]
+    return to_insert, updates, vanished, len(matched_ids)
+
+
+async def merge_comparison_rows(
+    db: AsyncSession, analysis_id: UUID, comparisons: list
+) -> dict[str, int]:
+    """Сводит строки анализа к новому результату сравнения, не пересоздавая их.
+
+    Строки сопоставляются по ключу (изделие, нормализованная характеристика):
+    у совпавших обновляются только изменившиеся колонки, новые вставляются,
+    исчезнувшие удаляются. id строк, на которые ссылаются UserEdit и
+    кэш фронтенда, и пользовательские отметки переживают повторное сравнение."""
+    new_values = [
+        _comparison_row_values(analysis_id, item, position)
+        for position, item in enumerate(comparisons)
+        if isinstance(item, dict)
+    ]
+    existing_result = await db.execute(
+        select(
+            ComparisonRow.id,
+            ComparisonRow.created_at,
+            *(getattr(ComparisonRow, column) for column in _COMPARISON_COLUMNS),
+        ).where(ComparisonRow.analysis_id == analysis_id)
+    )
+    to_insert, updates, vanished, matched = _plan_row_merge(existing_result.all(), new_values)
+
+    table = ComparisonRow.__table__
+    for columns, params in updates.items():
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values({column: bindparam(f"new_{column}") for column in columns}),
+            params,
+        )
+    if vanished:
+        await db.execute(delete(ComparisonRow).where(ComparisonRow.id.in_(vanished)))
+    await _insert_row_values(db, to_insert)
+    updated = sum(len(params) for params in updates.values())
+    return {
+        "inserted": len(to_insert),
+        "updated": updated,
+        "deleted": len(vanished),
+        "unchanged": matched - updated,
+    }
+
+
+@router.post("/compare/progress")
+async def compare_progress(payload: dict, db: AsyncSession = Depends(get_db)):
+    try:
+        job_id = UUID(payload.get("job_id"))
+        analysis_id = UUID(payload.get("analysis_id"))
+        completed = int(payload.get("completed_items"))
+        total = int(payload.get("total_items"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    if total <= 0 or completed < 0:
+        raise HTTPException(status_code=400, detail="Invalid progress")
+
+    progress = min(100, completed * 100 // total)
+    # Chunk'и завершаются параллельно, и отчёты могут прийти не по порядку —
+    # прогресс только растёт. Завершённую задачу не трогаем.
+    await db.execute(
+        update(ComparisonJob)
+        .where(ComparisonJob.id == job_id)
+        .where(ComparisonJob.analysis_id == analysis_id)
+        .where(ComparisonJob.status != "succeeded")
+        .values(
+            progress=func.greatest(ComparisonJob.progress, progress),
+            updated_at=datetime.utcnow(),
+        )
+    )
+    # Ревизию не поднимаем: прогресс читается вне снимка viewer-context и
+    # входит в его ETag, а bump на каждый chunk заставлял бы пересобирать
+    # многомегабайтный снимок на каждый опрос во время сравнения.
+    await db.commit()
+    return {"ok": True, "progress": progress}
+
+
+@router.post("/compare/partial")
+async def compare_partial(payload: dict, db: AsyncSession = Depends(get_db)):
+    """Строки готовых chunk'ов, пока сравнение ещё идёт. Каждая порция
+    (``sequence``) принимается один раз; итоговый /compare/callback затем
+    сводит все строки анализа к полному результату.
+
+    Порции пишутся в таблицу, только пока у анализа нет завершённого
+    сравнения. При повторном сравнении в таблице лежат прежние строки с
+    отметками пользователя: вставка дублировала бы их, а сопоставить порцию
+    с ними по ключу нельзя — номер повтора характеристики известен только
+    на полном результате. Такие порции не пишутся: прежние строки видны до
+    итогового callback'а, который сводит их слиянием."""
+    try:
+        job_id = UUID(payload.get("job_id"))
+        analysis_id = UUID(payload.get("analysis_id"))
+        sequence = int(payload.get("sequence"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    comparisons = payload.get("comparisons")
+    if sequence < 0 or not isinstance(comparisons, list):
+        raise HTTPException(status_code=400, detail="Invalid payload")
+
+    # Отметка о порции и строки пишутся в одной транзакции; условие в UPDATE
+    # делает приём атомарным и при параллельной повторной доставке.
+    claimed = await db.execute(
+        update(ComparisonJob)
+        .where(ComparisonJob.id == job_id)
+        .where(ComparisonJob.analysis_id == analysis_id)
+        .where(ComparisonJob.status != "succeeded")
+        .where(~ComparisonJob.applied_sequences.contains([sequence]))
+        .values(
+            applied_sequences=ComparisonJob.applied_sequences.op("||")(
+                func.jsonb_build_array(sequence)
+            ),
+            updated_at=datetime.utcnow(),
+        )
+        .returning(ComparisonJob.result.is_not(None).label("has_result"))
+    )
+    claim = claimed.one_or_none()
+    if claim is None:
+        await db.rollback()
+        return {"ok": True, "applied": False}
+    if claim.has_result:
+        await db.commit()
+        return {"ok": True, "applied": True, "staged": True}
+
+    # Места, уже занятые строками прошлой (упавшей) попытки того же
+    # сравнения, не дублируем — их сведёт итоговый callback.
+    taken = await db.execute(
+        select(ComparisonRow.position)
+        .where(ComparisonRow.analysis_id == analysis_id)
+        .where(ComparisonRow.position.is_not(None))
+    )
+    taken_positions = set(taken.scalars().all())
+    # Порция — не весь результат: место в списке position не заменяет.
+    values = [
+        _comparison_row_values(analysis_id, item, None)
+        for item in comparisons
+        if isinstance(item, dict) and item.get("position") not in taken_positions
+    ]
+    await _insert_row_values(db, values)
+    await revisions.bump(db, analysis_id)
+    await db.commit()
+    return {"ok": True, "applied": True}
+
+
 @router.post("/compare/callback")
 async def compare_callback(payload: dict, db: AsyncSession = Depends(get_db)):
     try:
@@ -34,6 +318,7 @@ async def compare_callback(payload: dict, db: AsyncSession = Depends(get_db)):
         values.update(
             {
                 "result": payload.get("result"),
+                "progress": 100,
                 "completed_at": datetime.utcnow(),
             }
         )
@@ -47,32 +332,14 @@ async def compare_callback(payload: dict, db: AsyncSession = Depends(get_db)):
         .values(**values)
     )
     if status_value == "succeeded":
-        await db.execute(
-            delete(ComparisonRow).where(ComparisonRow.analysis_id == analysis_id)
-        )
         comparisons = payload.get("result", {}).get("comparisons", [])
-        for item in comparisons:
-            tz_value = item.get("tz_value")
-            passport_value = item.get("passport_value")
-            tz_value = str(tz_value) if tz_value is not None else None
-            passport_value = str(passport_value) if passport_value is not None else None
-            row = ComparisonRow(
-                analysis_id=analysis_id,
-                product_name=item.get("product_name"),
-                is_target_model=item.get("is_target_model"),
-                characteristic=item.get("characteristic") or "",
-                tz_value=tz_value,
-                passport_value=passport_value,
-                tz_quote=item.get("tz_quote"),
-                passport_quote=item.get("passport_quote"),
-                tz_evidence=item.get("tz_evidence"),
-                passport_evidence=item.get("passport_evidence"),
-                passport_value_candidates=item.get("passport_value_candidates"),
-                llm_result=item.get("is_match"),
-                user_result=None,
-                note=item.get("note"),
+        if settings.COMPARISON_ROW_MERGE:
+            await merge_comparison_rows(db, analysis_id, comparisons)
+        else:
+            await db.execute(
+                delete(ComparisonRow).where(ComparisonRow.analysis_id == analysis_id)
             )
-            db.add(row)
+            await insert_comparison_rows(db, analysis_id, comparisons)
         await db.execute(
             update(ComparisonJob)
             .where(ComparisonJob.id == job_id)
@@ -89,6 +356,7 @@ async def compare_callback(payload: dict, db: AsyncSession = Depends(get_db)):
             .where(Analysis.id == analysis_id)
             .values(status="failed", updated_at=datetime.utcnow())
         )
+    await revisions.bump(db, analysis_id)
     await db.commit()
 
     if status_value == "succeeded":
@@ -17,6 +17,7 @@ from app.db.models.analysis import (
 )
 from app.db.models.users import User
 from app.db.session import get_db
+from app.services import revisions
 from app.services.manual_evidence import build_manual_evidence
 
 router = APIRouter()
@@ -63,15 +64,18 @@ class ManualPassportMatchPayload(BaseModel):
         return value
 
 
-async def _ensure_row_owned(db: AsyncSession, row_uuid, user: User) -> None:
+async def _ensure_row_owned(db: AsyncSession, row_uuid, user: User):
+    """Проверяет, что строка принадлежит анализу пользователя; возвращает analysis_id."""
     result = await db.execute(
-        select(ComparisonRow.id)
+        select(ComparisonRow.analysis_id)
         .join(Analysis, Analysis.id == ComparisonRow.analysis_id)
         .where(ComparisonRow.id == row_uuid)
         .where(Analysis.user_id == user.id)
     )
-    if result.scalar_one_or_none() is None:
+    analysis_id = result.scalar_one_or_none()
+    if analysis_id is None:
         raise HTTPException(status_code=404, detail="Row not found")
+    return analysis_id
 
 
 @router.post("/comparison-rows/{row_id}/user-result")
@@ -82,7 +86,7 @@ async def set_user_result(
     current_user: User = Depends(get_current_user),
 ):
     row_uuid = parse_uuid(row_id)
-    await _ensure_row_owned(db, row_uuid, current_user)
+    analysis_id = await _ensure_row_owned(db, row_uuid, current_user)
 
     await db.execute(
         update(ComparisonRow).where(ComparisonRow.id == row_uuid).values(user_result=payload.user_result)
@@ -97,6 +101,7 @@ async def set_user_result(
             comment=comment,
         )
     )
+    await revisions.bump(db, analysis_id)
     await db.commit()
     return {"ok": True}
 
@@ -116,7 +121,7 @@ async def set_confirmed_matches(
     поэтому вместе с ним проставляется user_result.
     """
     row_uuid = parse_uuid(row_id)
-    await _ensure_row_owned(db, row_uuid, current_user)
+    analysis_id = await _ensure_row_owned(db, row_uuid, current_user)
 
     # Порядок вхождений не значим, дубликаты — следствие повторных кликов.
     match_ids = sorted({item for item in payload.match_ids if item})
@@ -141,6 +146,7 @@ async def set_confirmed_matches(
                 comment=None,
             )
         )
+    await revisions.bump(db, analysis_id)
     await db.commit()
     return {"ok": True, "match_ids": match_ids}
 
@@ -153,7 +159,7 @@ async def add_comment(
     current_user: User = Depends(get_current_user),
 ):
     row_uuid = parse_uuid(row_id)
-    await _ensure_row_owned(db, row_uuid, current_user)
+    analysis_id = await _ensure_row_owned(db, row_uuid, current_user)
 
     # Если этот /comment — часть того же действия, что и только что прошедший
     # /user-result (свежая запись этого пользователя БЕЗ комментария), дописываем
@@ -178,6 +184,7 @@ async def add_comment(
                 comment=payload.comment,
             )
         )
+    await revisions.bump(db, analysis_id)
     await db.commit()
     return {"ok": True}
 
@@ -196,7 +203,7 @@ async def create_manual_passport_match(
     comparison_row при каждом прогоне, см. compare.py). Идемпотентно: повторный
     вызов на тот же row_id просто перезаписывает passport_value/passport_evidence."""
     row_uuid = parse_uuid(row_id)
-    await _ensure_row_owned(db, row_uuid, current_user)
+    analysis_id = await _ensure_row_owned(db, row_uuid, current_user)
 
     value = payload.value.strip()
     evidence = build_manual_evidence(
@@ -209,11 +216,7 @@ async def create_manual_passport_match(
 
     db.add(
         ManualCharacteristic(
-            analysis_id=(
-                await db.execute(
-                    select(ComparisonRow.analysis_id).where(ComparisonRow.id == row_uuid)
-                )
-            ).scalar_one(),
+            analysis_id=analysis_id,
             document_type="passport",
             linked_characteristic_id=row_id,
             name=value,
@@ -245,6 +248,7 @@ async def create_manual_passport_match(
             comment="Ручное сопоставление в паспорте",
         )
     )
+    await revisions.bump(db, analysis_id)
     await db.commit()
 
     return {
@@ -285,6 +289,7 @@ async def delete_comparison_row(
     )
     stmt = stmt.on_conflict_do_nothing(constraint="uq_hidden_characteristic")
     await db.execute(stmt)
+    await revisions.bump(db, analysis_id)
     await db.commit()
 
     return {"ok": True}
@@ -9,3 +9,27 @@ def parse_uuid(value: str | None, *, detail: str = "Invalid id") -> UUID:
         return UUID(value)
     except (ValueError, TypeError, AttributeError):
         raise HTTPException(status_code=400, detail=detail)
+
+
+def revision_etag(revision: int, *parts: object) -> str:
+    """Strong ETag for a representation derived from an analysis revision."""
+    return '"' + "-".join(str(part) for part in (f"r{revision}", *parts)) + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header value matches the given ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def conditional_headers(etag: str) -> dict[str, str]:
+    # no-cache: the browser keeps the response but revalidates it with
+    # If-None-Match before every use; private: responses are per-user.
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -1,8 +1,8 @@
 ﻿from datetime import datetime
-from uuid import UUID, uuid4
+from uuid import UUID
 
 import httpx
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -16,82 +16,120 @@ from app.db.models.files import File as FileModel
 from app.db.models.users import User
 from app.db.models.extraction_jobs import ExtractionJob
 from app.db.session import get_db
+from app.services import presigned_urls, revisions
 from app.services.extraction_backends import normalize_extraction_backend
 from app.tasks import extract_file
 
 router = APIRouter()
 
+# Заголовки ответа file-service, которые нужны клиенту для докачки по Range.
+_PROXIED_FILE_HEADERS = (
+    "content-disposition",
+    "content-length",
+    "content-range",
+    "accept-ranges",
+    "etag",
+)
+
 
 @router.post("/files/upload")
 async def upload_files(
-    # Пусто/не задано → берём дефолт из settings.EXTRACTION_BACKEND (env), а не
-    # хардкод "openrouter". Так переключение бэкенда через env реально работает.
-    extraction_backend: str | None = Form(None),
-    task_id: str = Form(""),
-    product_model: str = Form(""),
-    tz_file: UploadFile = File(...),
-    passport_file: UploadFile = File(...),
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    selected_backend = normalize_extraction_backend(extraction_backend)
+    """Принимает multipart: tz_file, passport_file, extraction_backend,
+    task_id, product_model.
+
+    Тело не разбирается здесь и не сохраняется на диск: оно потоком уходит в
+    file-service /files/upload-stream, который заливает файлы прямо в S3 и
+    возвращает ключи, SHA-256 и текстовые поля формы. Поэтому анализ и
+    записи файлов создаются до заливки, а параметры анализа и имена файлов
+    дописываются после неё."""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
     analysis = Analysis(
         user_id=current_user.id,
         status="processing_files",
-        extraction_backend=selected_backend,
-        task_id=task_id.strip() or None,
-        product_model=product_model.strip() or None,
+        extraction_backend=normalize_extraction_backend(None),
     )
     db.add(analysis)
     await db.flush()
-    await db.refresh(analysis)
-
-    tz_key = f"tz/{uuid4()}_{tz_file.filename}"
-    passport_key = f"passport/{uuid4()}_{passport_file.filename}"
+    records = {
+        file_type: FileModel(
+            analysis_id=analysis.id,
+            file_type=file_type,
+            original_name="",
+            storage_path="",
+            status="uploading",
+        )
+        for file_type in ("tz", "passport")
+    }
+    db.add_all(records.values())
+    await db.flush()
+    await db.commit()
+    analysis_id = analysis.id
 
-    tz_record = FileModel(
-        analysis_id=analysis.id,
-        file_type="tz",
-        original_name=tz_file.filename or "",
-        storage_path=tz_key,
-        status="uploading",
-    )
-    passport_record = FileModel(
-        analysis_id=analysis.id,
-        file_type="passport",
-        original_name=passport_file.filename or "",
-        storage_path=passport_key,
-        status="uploading",
+    try:
+        async with httpx.AsyncClient(timeout=settings.FILE_UPLOAD_TIMEOUT_SECONDS) as client:
+            response = await client.post(
+                f"{settings.FILE_SERVICE_URL}/files/upload-stream",
+                params={
+                    "analysis_id": str(analysis_id),
+                    "tz_file_id": str(records["tz"].id),
+                    "passport_file_id": str(records["passport"].id),
+                },
+                content=request.stream(),
+                headers={"content-type": content_type},
+            )
+            response.raise_for_status()
+            result = response.json()
+    except Exception as exc:
+        for record in records.values():
+            await _apply_file_status(db, analysis_id, record.id, "failed", {"status": "failed"})
+        raise HTTPException(status_code=502, detail=f"File upload failed: {exc}") from exc
+
+    # Пусто/не задано → дефолт из settings.EXTRACTION_BACKEND (env), а не
+    # хардкод "openrouter". Так переключение бэкенда через env реально работает.
+    fields = result.get("fields") or {}
+    await db.execute(
+        update(Analysis)
+        .where(Analysis.id == analysis_id)
+        .values(
+            extraction_backend=normalize_extraction_backend(fields.get("extraction_backend") or None),
+            task_id=(fields.get("task_id") or "").strip() or None,
+            product_model=(fields.get("product_model") or "").strip() or None,
+        )
     )
-    db.add_all([tz_record, passport_record])
-    await db.flush()
-    await db.refresh(tz_record)
-    await db.refresh(passport_record)
     await db.commit()
 
-    async with httpx.AsyncClient() as client:
-        await tz_file.seek(0)
-        await passport_file.seek(0)
-        files = {
-            "tz_file": (tz_file.filename, tz_file.file, tz_file.content_type),
-            "passport_file": (
-                passport_file.filename,
-                passport_file.file,
-                passport_file.content_type,
-            ),
-        }
-        data = {
-            "analysis_id": str(analysis.id),
-            "tz_file_id": str(tz_record.id),
-            "passport_file_id": str(passport_record.id),
-            "tz_key": tz_key,
-            "passport_key": passport_key,
-        }
-        response = await client.post(
-            f"{settings.FILE_SERVICE_URL}/files/upload-batch", files=files, data=data
+    response_files = {}
+    for file_type, record in records.items():
+        uploaded = result.get(file_type)
+        if not uploaded:
+            await _apply_file_status(db, analysis_id, record.id, "failed", {"status": "failed"})
+            raise HTTPException(status_code=400, detail=f"Missing {file_type}_file")
+        await _apply_file_status(
+            db,
+            analysis_id,
+            record.id,
+            "uploaded",
+            {
+                "status": "uploaded",
+                "original_name": uploaded["name"],
+                "storage_path": uploaded["key"],
+                "storage_url": uploaded.get("url"),
+                "mime_type": uploaded.get("content_type"),
+                "size_bytes": uploaded.get("size_bytes"),
+                "sha256": uploaded.get("sha256"),
+                "uploaded_at": datetime.utcnow(),
+            },
         )
-        response.raise_for_status()
-        return response.json()
+        response_files[file_type] = {"name": uploaded["name"], "key": uploaded["key"]}
+
+    return {"analysis_id": str(analysis_id), **response_files}
 
 
 @router.post("/files/callback")
@@ -117,7 +155,19 @@ async def files_callback(payload: dict, db: AsyncSession = Depends(get_db)):
                 "uploaded_at": datetime.utcnow(),
             }
         )
+    await _apply_file_status(db, analysis_id, file_id, status_value, values)
+    return {"ok": True}
+
 
+async def _apply_file_status(
+    db: AsyncSession,
+    analysis_id: UUID,
+    file_id: UUID,
+    status_value: str,
+    values: dict,
+) -> None:
+    """Записывает итог заливки файла; когда залиты оба файла анализа,
+    запускает извлечение ТЗ."""
     status_before_result = await db.execute(
         select(Analysis.status, Analysis.extraction_backend, Analysis.product_model).where(Analysis.id == analysis_id)
     )
@@ -132,16 +182,17 @@ async def files_callback(payload: dict, db: AsyncSession = Depends(get_db)):
         .where(FileModel.analysis_id == analysis_id)
         .values(**values)
     )
+    await revisions.bump(db, analysis_id)
     await db.commit()
 
     if status_value == "failed":
         await db.execute(
             update(Analysis)
             .where(Analysis.id == analysis_id)
-            .values(status="failed", updated_at=datetime.utcnow())
+            .values(status="failed", updated_at=datetime.utcnow(), revision=Analysis.revision + 1)
         )
         await db.commit()
-        return {"ok": True}
+        return
 
     result = await db.execute(
         select(func.count(FileModel.id)).where(
@@ -153,7 +204,11 @@ async def files_callback(payload: dict, db: AsyncSession = Depends(get_db)):
         await db.execute(
             update(Analysis)
             .where(Analysis.id == analysis_id)
-            .values(status="extracting_data", updated_at=datetime.utcnow())
+            .values(
+                status="extracting_data",
+                updated_at=datetime.utcnow(),
+                revision=Analysis.revision + 1,
+            )
         )
         files_result = await db.execute(
             select(FileModel).where(
@@ -207,12 +262,66 @@ async def files_callback(payload: dict, db: AsyncSession = Depends(get_db)):
                 task_id=job_id,
             )
 
-    return {"ok": True}
+
+async def _proxy_file_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    path: str,
+    params: dict,
+    timeout: float,
+) -> StreamingResponse:
+    """Проксирует потоковый ответ file-service, не дочитывая его целиком.
+
+    Range клиента уходит в file-service (а оттуда в S3 get_object), ответ 206
+    и его заголовки возвращаются как есть — так PDF.js во вьюере начинает
+    рисовать первую страницу, не дожидаясь всего файла."""
+    forward_headers = {}
+    if request.headers.get("range"):
+        forward_headers["range"] = request.headers["range"]
+    client = httpx.AsyncClient(timeout=timeout)
+    try:
+        resp = await client.send(
+            client.build_request(
+                "GET", f"{settings.FILE_SERVICE_URL}{path}", params=params, headers=forward_headers
+            ),
+            stream=True,
+        )
+    except Exception:
+        await client.aclose()
+        raise
+    if resp.is_error:
+        await resp.aread()
+        await resp.aclose()
+        await client.aclose()
+        try:
+            detail = resp.json().get("detail")
+        except ValueError:
+            detail = None
+        raise HTTPException(status_code=resp.status_code, detail=detail or resp.text or "File service error")
+
+    headers = {
+        name: resp.headers[name]
+        for name in _PROXIED_FILE_HEADERS
+        if name in resp.headers
+    }
+
+    async def _close():
+        await resp.aclose()
+        await client.aclose()
+
+    background_tasks.add_task(_close)
+    return StreamingResponse(
+        resp.aiter_raw(),
+        status_code=resp.status_code,
+        media_type=resp.headers.get("content-type", "application/octet-stream"),
+        headers=headers,
+    )
 
 
 @router.get("/files/{file_id}/download")
 async def download_file(
     file_id: str,
+    request: Request,
     background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -230,26 +339,13 @@ async def download_file(
         raise HTTPException(status_code=404, detail="File not found")
 
     params = {"key": file_record.storage_path, "name": file_record.original_name}
-    client = httpx.AsyncClient(timeout=60)
-    resp = await client.get(f"{settings.FILE_SERVICE_URL}/files/download", params=params)
-    resp.raise_for_status()
-    content_type = resp.headers.get("content-type", "application/octet-stream")
-    content_disposition = resp.headers.get("content-disposition")
-    headers = {}
-    if content_disposition:
-        headers["content-disposition"] = content_disposition
-
-    async def _close():
-        await resp.aclose()
-        await client.aclose()
-
-    background_tasks.add_task(_close)
-    return StreamingResponse(resp.aiter_bytes(), media_type=content_type, headers=headers)
+    return await _proxy_file_stream(request, background_tasks, "/files/download", params, timeout=60)
 
 
 @router.get("/files/{file_id}/preview")
 async def preview_file(
     file_id: str,
+    request: Request,
     background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -274,14 +370,7 @@ async def preview_file(
         # с нестандартными кириллическими шрифтами, которые PDF.js не умеет отображать.
         # Получаем свежий presigned URL и передаём в /render-pdf.
         try:
-            presign_client = httpx.AsyncClient(timeout=15)
-            presign_resp = await presign_client.get(
-                f"{settings.FILE_SERVICE_URL}/files/presign",
-                params={"key": file_record.storage_path, "expires_in": 3600},
-            )
-            await presign_client.aclose()
-            presign_resp.raise_for_status()
-            presigned_url = presign_resp.json().get("url", "")
+            presigned_url = await presigned_urls.aget_url(file_record.storage_path) or ""
         except Exception:
             presigned_url = ""
 
@@ -317,18 +406,4 @@ async def preview_file(
     if file_record.mime_type:
         params["content_type"] = file_record.mime_type
 
-    client = httpx.AsyncClient(timeout=120)
-    resp = await client.get(f"{settings.FILE_SERVICE_URL}/files/preview", params=params)
-    resp.raise_for_status()
-    content_type = resp.headers.get("content-type", "application/pdf")
-    content_disposition = resp.headers.get("content-disposition")
-    headers = {}
-    if content_disposition:
-        headers["content-disposition"] = content_disposition
-
-    async def _close():
-        await resp.aclose()
-        await client.aclose()
-
-    background_tasks.add_task(_close)
-    return StreamingResponse(resp.aiter_bytes(), media_type=content_type, headers=headers)
+    return await _proxy_file_stream(request, background_tasks, "/files/preview", params, timeout=120)
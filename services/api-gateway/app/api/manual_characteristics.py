@@ -10,6 +10,7 @@ from app.api.deps import parse_uuid
 from app.db.models.analysis import ManualCharacteristic
 from app.db.models.users import User
 from app.db.session import get_db
+from app.services import revisions
 from app.services.manual_evidence import build_manual_evidence, manual_references_payload
 
 router = APIRouter()
@@ -119,6 +120,7 @@ async def create_manual_characteristic(
         comment=None,
         db=db,
     )
+    await revisions.bump(db, analysis_uuid)
     await db.commit()
 
     return {
@@ -0,0 +1,135 @@
+"""Сжатие ответов api-gateway с выбором кодировки по Accept-Encoding.
+
+Starlette GZipMiddleware умеет только gzip, а браузеры принимают и br, и
+zstd, которые на JSON с координатами OCR жмут заметно лучше и быстрее.
+Здесь кодировка выбирается в порядке zstd → br → gzip из тех, что принимает
+клиент (с учётом q=0).
+
+Сжимаются только ответы, отданные одним куском (обычные JSON-ответы
+роутов) и не короче RESPONSE_COMPRESSION_MIN_BYTES: на маленьких ответах
+сжатие дороже, чем экономия. Потоковые ответы (файлы, превью, Range)
+проходят без изменений — PDF уже сжат, а Range-запросам нужна исходная
+длина. Большие тела сжимаются в пуле потоков, чтобы не держать event loop.
+
+ETag сжатого ответа становится слабым (W/"..."), как это делает nginx: байты
+ответа зависят от кодировки. etag_matches сравнивает без учёта W/, поэтому
+If-None-Match продолжает давать 304.
+"""
+
+import gzip
+
+import anyio
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Уровни подобраны под время ответа, а не под максимальное сжатие.
+_GZIP_LEVEL = 5
+_BROTLI_QUALITY = 4
+_ZSTD_LEVEL = 3
+# Тела больше этого размера сжимаются вне event loop.
+_THREAD_THRESHOLD_BYTES = 256 * 1024
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def _compress_zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(body)
+
+
+def _compress_br(body: bytes) -> bytes:
+    return brotli.compress(body, quality=_BROTLI_QUALITY)
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=_GZIP_LEVEL)
+
+
+COMPRESSORS = {
+    "zstd": _compress_zstd,
+    "br": _compress_br,
+    "gzip": _compress_gzip,
+}
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    if not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in COMPRESSORS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.RESPONSE_COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                message.get("more_body", False)
+                or len(body) < settings.RESPONSE_COMPRESSION_MIN_BYTES
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compress = COMPRESSORS[encoding]
+            if len(body) > _THREAD_THRESHOLD_BYTES:
+                compressed = await anyio.to_thread.run_sync(compress, body)
+            else:
+                compressed = compress(body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
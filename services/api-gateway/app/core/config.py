@@ -27,6 +27,12 @@ class Settings(BaseSettings):
     SESSION_EXPIRE_MINUTES: int = 8 * 60
     SESSION_COOKIE_NAME: str = "ivolga_session"
     CSRF_COOKIE_NAME: str = "ivolga_csrf"
+    # Сколько секунд найденная по cookie сессия живёт в памяти процесса
+    # (см. app/services/session_cache.py). 0 — без кэша.
+    AUTH_SESSION_CACHE_TTL_SECONDS: int = 30
+    AUTH_SESSION_CACHE_MAX_ENTRIES: int = 10000
+    # Как часто накопленные last_seen_at сессий пишутся в базу.
+    SESSION_LAST_SEEN_FLUSH_SECONDS: int = 60
     COOKIE_SECURE: bool = False
     COOKIE_SAMESITE: str = "lax"
     COOKIE_DOMAIN: str | None = None
@@ -41,6 +47,17 @@ class Settings(BaseSettings):
     KNOWLEDGE_BASE_TIMEOUT_SECONDS: int = 5
     DOMAIN_ANALYZE_URL: str = "http://domain-analyze:8000"
     FILE_SERVICE_URL: str = "http://file-service:8000"
+    # Presigned URL файлов (app/services/presigned_urls.py): подпись на
+    # PRESIGNED_URL_TTL_SECONDS, повторно URL отдаётся, пока до её истечения
+    # больше PRESIGNED_URL_MIN_REMAINING_SECONDS — не меньше самого долгого
+    # извлечения (EXTRACTION_TIMEOUT_SECONDS).
+    PRESIGNED_URL_TTL_SECONDS: int = 7200
+    PRESIGNED_URL_MIN_REMAINING_SECONDS: int = 2700
+    PRESIGNED_URL_CACHE_MAX_ENTRIES: int = 10000
+    PRESIGN_TIMEOUT_SECONDS: float = 15.0
+    # Загрузка документов транслируется в file-service потоком, пока клиент
+    # её передаёт, поэтому таймаут рассчитан на медленный канал пользователя.
+    FILE_UPLOAD_TIMEOUT_SECONDS: int = 600
     S3_ENDPOINT: str = "https://storage.yandexcloud.net"
     BUCKET_NAME: str = ""
     EXTRACTION_TIMEOUT_SECONDS: int = 2400
@@ -48,6 +65,17 @@ class Settings(BaseSettings):
     CELERY_RESULT_BACKEND: str = "rpc://"
     EXTRACTION_DEBUG_DIR: str = "/tmp"
     COMP_DATA_DIR: str = "/comp_data"
+    # Строк ComparisonRow в одном INSERT executemany (compare_callback).
+    # Ограничивает размер одного запроса при тысячах строк с крупным JSONB.
+    COMPARISON_ROW_INSERT_BATCH_SIZE: int = 500
+    # Повторное сравнение сводит строки с существующими по ключу (изделие +
+    # характеристика) вместо удаления и пересоздания: id строк и отметки
+    # пользователя сохраняются. False — прежнее поведение.
+    COMPARISON_ROW_MERGE: bool = True
+    # Сжатие ответов (zstd/br/gzip по Accept-Encoding, см. app/core/compression.py).
+    # Ответы короче порога отдаются как есть.
+    RESPONSE_COMPRESSION_ENABLED: bool = True
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
 
 
 settings = Settings()
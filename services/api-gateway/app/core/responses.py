@@ -0,0 +1,16 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON-ответ через orjson.
+
+    OCR word-индексы и результаты извлечения — это мегабайты JSONB с
+    координатами на каждое слово; стандартный json.dumps кодирует их в разы
+    медленнее. NaN/Infinity orjson отдаёт как null — то есть валидный JSON, в
+    отличие от json.dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
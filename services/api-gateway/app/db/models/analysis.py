@@ -21,6 +21,9 @@ class Analysis(Base):
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), nullable=False)
     completed_at = Column(DateTime, nullable=True)
+    # Растёт при каждой правке данных анализа; из неё строятся ETag
+    # GET-эндпоинтов анализа (см. app/services/revisions.py).
+    revision = Column(Integer, nullable=False, server_default=text("0"))
 
 
 class ComparisonRow(Base):
@@ -70,6 +73,11 @@ class ComparisonRow(Base):
     # отредактированный текст (custom_text). Перезаписывает позицию/подпись метки,
     # которая изначально пришла из геометрии. Оригинальный tz_evidence не теряется.
     user_tz_mark = Column(JSONB, nullable=True)
+    # Место строки в результате сравнения (порядок строк domain-analyze).
+    # По нему упорядочена таблица во вьювере и нумеруются повторы одной
+    # характеристики при слиянии повторного сравнения. NULL — строки,
+    # записанные до появления колонки.
+    position = Column(Integer, nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
 
@@ -152,8 +160,9 @@ class ManualCharacteristic(Base):
 
 class HiddenCharacteristic(Base):
     """Характеристика, которую пользователь удалил из таблицы сравнения.
-    ComparisonRow целиком пересоздаётся при каждом повторном прогоне сравнения
-    (см. compare_callback в compare.py), поэтому "удаление" не может быть
+    Строка, исчезнувшая из результата повторного прогона сравнения, удаляется,
+    а при COMPARISON_ROW_MERGE=False ComparisonRow целиком пересоздаются (см.
+    compare_callback в compare.py), поэтому "удаление" не может быть
     флагом на самой строке — вместо этого храним стабильный список скрытых
     имён характеристик отдельно и применяем его как фильтр поверх свежих
     ComparisonRow при каждой выдаче viewer-context (тот же паттерн, что и
@@ -175,6 +184,22 @@ class HiddenCharacteristic(Base):
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
 
+class ViewerContextSnapshot(Base):
+    """Готовая тяжёлая часть ответа viewer-context (документы с
+    характеристиками и строки сравнения с фидбэком), чтобы опрос вьювера не
+    пересобирал её из ExtractionResult/ComparisonRow/UserEdit на каждый
+    запрос. Снимок действителен, пока его revision совпадает с
+    Analysis.revision (см. app/services/revisions.py)."""
+
+    __tablename__ = "viewer_context_snapshot"
+    __table_args__ = {"schema": "analysis"}
+
+    analysis_id = Column(UUID(as_uuid=True), primary_key=True)
+    revision = Column(Integer, nullable=False)
+    payload = Column(JSONB, nullable=True)
+    built_at = Column(DateTime, nullable=True)
+
+
 __all__ = [
     "Analysis",
     "ComparisonRow",
@@ -182,4 +207,5 @@ __all__ = [
     "TzCharacteristicReview",
     "ManualCharacteristic",
     "HiddenCharacteristic",
+    "ViewerContextSnapshot",
 ]
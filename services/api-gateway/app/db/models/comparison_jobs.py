@@ -22,6 +22,12 @@ class ComparisonJob(Base):
     attempts = Column(Integer, nullable=False, server_default=text("0"))
     last_error = Column(Text, nullable=True)
     result = Column(JSONB, nullable=True)
+    # Процент готовых строк сравнения, присылает domain-analyze по мере
+    # завершения chunk'ов (POST /compare/progress).
+    progress = Column(Integer, nullable=False, server_default=text("0"))
+    # Номера уже принятых частичных результатов (POST /compare/partial):
+    # повторная доставка той же порции строк игнорируется.
+    applied_sequences = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), nullable=False)
     completed_at = Column(DateTime, nullable=True)
@@ -22,6 +22,9 @@ class File(Base):
     size_bytes = Column(BigInteger)
     status = Column(String, nullable=False, server_default=text("'uploading'"))
     uploaded_at = Column(DateTime, nullable=True)
+    # SHA-256 содержимого, посчитанный file-service при заливке; одинаковые
+    # файлы ссылаются на один объект в S3.
+    sha256 = Column(String(64), nullable=True)
 
 
 __all__ = ["File"]
@@ -1,9 +1,22 @@
+import orjson
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=settings.SQL_ECHO)
+
+def _json_dumps(value) -> str:
+    # JSONB-колонки (evidence, candidates) бывают по сотне килобайт на строку;
+    # orjson сериализует их в разы быстрее стандартного json.
+    return orjson.dumps(value).decode("utf-8")
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=settings.SQL_ECHO,
+    json_serializer=_json_dumps,
+    json_deserializer=orjson.loads,
+)
 
 AsyncSessionLocal = sessionmaker(
     engine,
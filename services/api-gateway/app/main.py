@@ -1,3 +1,6 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
@@ -6,16 +9,34 @@ from app.logging_setup import configure_logging
 configure_logging("api-gateway")
 
 from app.api.analyses import router as analyses_router
-from app.api.auth import get_current_user_optional, router as auth_router, validate_csrf
+from app.api.auth import resolve_auth_session, router as auth_router, validate_csrf
 from app.api.compare import router as compare_router
 from app.api.comparison_rows import router as comparison_rows_router
 from app.api.files import router as files_router
 from app.api.health import router as health_router
 from app.api.manual_characteristics import router as manual_characteristics_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.responses import ORJSONResponse
 from app.db.session import AsyncSessionLocal
+from app.services import presigned_urls, session_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flusher = asyncio.create_task(session_cache.run_last_seen_flusher())
+    try:
+        yield
+    finally:
+        flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await flusher
+        await session_cache.flush_last_seen()
+        await presigned_urls.aclose()
+
 
-app = FastAPI(title="api-gateway")
+app = FastAPI(title="api-gateway", default_response_class=ORJSONResponse, lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(files_router, tags=["files"])
 app.include_router(analyses_router, prefix="/api", tags=["analyses"])
@@ -33,6 +54,8 @@ ALLOWED_PATHS = {
     "/auth/register",
     "/files/callback",
     "/compare/callback",
+    "/compare/progress",
+    "/compare/partial",
     "/health",
     "/file-service/health",
 }
@@ -41,6 +64,8 @@ CSRF_EXEMPT_PATHS = {
     "/auth/register",
     "/files/callback",
     "/compare/callback",
+    "/compare/progress",
+    "/compare/partial",
     "/health",
     "/file-service/health",
 }
@@ -53,8 +78,11 @@ async def auth_gate(request: Request, call_next):
     if path in ALLOWED_PATHS:
         return await call_next(request)
 
+    # Найденная сессия остаётся в request.state: проверка CSRF и
+    # Depends(get_current_user) в роуте берут её оттуда, не обращаясь к базе.
     async with AsyncSessionLocal() as db:
-        user = await get_current_user_optional(request, db)
+        auth = await resolve_auth_session(request, db)
+        user = auth.user if auth is not None else None
         uses_session_cookie = settings.SESSION_COOKIE_NAME in request.cookies
         if (
             user is not None
@@ -9,6 +9,7 @@ from typing import Any
 import httpx
 
 from app.core.config import settings
+from app.services import presigned_urls
 from app.services.knowledge_base_client import list_canonical_attributes, search_knowledge
 
 logger = logging.getLogger(__name__)
@@ -561,15 +562,10 @@ def build_s3_url(storage_key: str) -> str:
 
 
 def _refresh_presigned_url(storage_path: str) -> str | None:
-    """Запрашивает свежий presigned URL у file-service по storage_path (ключу в S3)."""
+    """Presigned URL по storage_path (ключу в S3): из кэша процесса или
+    свежий от file-service (app/services/presigned_urls.py)."""
     try:
-        with httpx.Client(timeout=10) as client:
-            resp = client.get(
-                f"{settings.FILE_SERVICE_URL}/files/presign",
-                params={"key": storage_path, "expires_in": 7200},
-            )
-            if resp.is_success:
-                return resp.json().get("url")
+        return presigned_urls.get_url(storage_path)
     except Exception as exc:
         logger.warning("Failed to refresh presigned URL for %s: %s", storage_path, exc)
     return None
@@ -597,8 +593,8 @@ def run_extraction_task(
     if not storage_path:
         raise ValueError(f"Missing storage_path for file {file_id}")
 
-    # Всегда генерируем свежий presigned URL через file-service, чтобы избежать
-    # истечения срока действия URL из БД (TTL 1 час)
+    # URL из БД не используется: его TTL (1 час) мог давно истечь. Кэш отдаёт
+    # только URL, подписи которых хватит на всё извлечение.
     file_url = _refresh_presigned_url(storage_path)
     file_url_source = "presigned"
     if not file_url:
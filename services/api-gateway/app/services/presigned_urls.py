@@ -0,0 +1,112 @@
+"""Кэш presigned URL файлов анализа.
+
+Извлечение (extraction_tasks), OCR-индекс и превью PDF каждый раз отдельно
+ходили в file-service /files/presign, каждый со своим httpx-клиентом. Здесь
+URL берутся пакетом через /files/presign-batch и живут в памяти процесса,
+пока до истечения подписи остаётся больше
+PRESIGNED_URL_MIN_REMAINING_SECONDS: этого запаса хватает на самое долгое
+извлечение (EXTRACTION_TIMEOUT_SECONDS), которое скачивает файл по URL.
+
+Синхронный get_urls — для Celery-воркера, асинхронный aget_urls — для API;
+кэш у них общий в пределах процесса. Ошибки file-service пробрасываются:
+что делать без URL, решает вызывающий.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from app.core.config import settings
+
+_entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_lock = threading.Lock()
+_sync_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+
+
+def _cached(keys: list[str]) -> tuple[dict[str, str], list[str]]:
+    now = time.monotonic()
+    found: dict[str, str] = {}
+    missing: list[str] = []
+    with _lock:
+        for key in dict.fromkeys(keys):
+            cached = _entries.get(key)
+            if cached is not None and cached[1] > now:
+                _entries.move_to_end(key)
+                found[key] = cached[0]
+            else:
+                missing.append(key)
+    return found, missing
+
+
+def _store(urls: dict[str, str], requested_at: float) -> None:
+    # Отсчёт от момента запроса, а не ответа: подпись могла быть сделана
+    # раньше, чем ответ дошёл.
+    reusable_until = (
+        requested_at
+        + settings.PRESIGNED_URL_TTL_SECONDS
+        - settings.PRESIGNED_URL_MIN_REMAINING_SECONDS
+    )
+    if reusable_until <= requested_at:
+        return
+    with _lock:
+        for key, url in urls.items():
+            _entries[key] = (url, reusable_until)
+            _entries.move_to_end(key)
+        while len(_entries) > settings.PRESIGNED_URL_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def _batch_request(keys: list[str]) -> dict:
+    return {"keys": keys, "expires_in": settings.PRESIGNED_URL_TTL_SECONDS}
+
+
+def get_urls(keys: list[str]) -> dict[str, str]:
+    global _sync_client
+    found, missing = _cached(keys)
+    if not missing:
+        return found
+    if _sync_client is None:
+        _sync_client = httpx.Client(timeout=settings.PRESIGN_TIMEOUT_SECONDS)
+    requested_at = time.monotonic()
+    resp = _sync_client.post(
+        f"{settings.FILE_SERVICE_URL}/files/presign-batch", json=_batch_request(missing)
+    )
+    resp.raise_for_status()
+    urls = resp.json().get("urls") or {}
+    _store(urls, requested_at)
+    return {**found, **urls}
+
+
+async def aget_urls(keys: list[str]) -> dict[str, str]:
+    global _async_client
+    found, missing = _cached(keys)
+    if not missing:
+        return found
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=settings.PRESIGN_TIMEOUT_SECONDS)
+    requested_at = time.monotonic()
+    resp = await _async_client.post(
+        f"{settings.FILE_SERVICE_URL}/files/presign-batch", json=_batch_request(missing)
+    )
+    resp.raise_for_status()
+    urls = resp.json().get("urls") or {}
+    _store(urls, requested_at)
+    return {**found, **urls}
+
+
+def get_url(key: str) -> str | None:
+    return get_urls([key]).get(key)
+
+
+async def aget_url(key: str) -> str | None:
+    return (await aget_urls([key])).get(key)
+
+
+async def aclose() -> None:
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
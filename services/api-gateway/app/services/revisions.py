@@ -0,0 +1,64 @@
+"""Ревизия анализа и снимок viewer-context.
+
+analysis.revision растёт при каждой правке данных анализа: результаты
+извлечения и сравнения, строки сравнения и фидбэк по ним, ТЗ-ревью, статус.
+По ревизии строятся ETag тяжёлых GET-эндпоинтов анализа (неизменившийся
+ответ отдаётся пустым 304), и по ней же проверяется актуальность снимка
+viewer-context: снимок, собранный при другой ревизии, пересобирается.
+
+Ревизия увеличивается в той же транзакции, что и сама правка. Снимок,
+собранный до параллельной правки, сохраняется со старой ревизией и при
+следующем чтении просто не совпадёт с текущей.
+
+bump_statement() возвращает готовый statement, чтобы его можно было выполнить
+и в async-сессии роутов, и в sync-сессии Celery-задач.
+"""
+
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.analysis import Analysis, ViewerContextSnapshot
+
+
+def bump_statement(analysis_id: UUID | str):
+    return (
+        update(Analysis)
+        .where(Analysis.id == analysis_id)
+        .values(revision=Analysis.revision + 1)
+    )
+
+
+async def bump(db: AsyncSession, analysis_id: UUID | str) -> None:
+    await db.execute(bump_statement(analysis_id))
+
+
+async def store_snapshot(
+    db: AsyncSession,
+    analysis_id: UUID,
+    revision: int,
+    payload: dict,
+) -> None:
+    """Сохраняет снимок viewer-context, собранный при ревизии revision.
+    Более свежий снимок, уже сохранённый параллельным запросом, не
+    перезаписывается."""
+    stmt = insert(ViewerContextSnapshot).values(
+        analysis_id=analysis_id,
+        revision=revision,
+        payload=payload,
+        built_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ViewerContextSnapshot.analysis_id],
+        set_={
+            "revision": stmt.excluded.revision,
+            "payload": stmt.excluded.payload,
+            "built_at": stmt.excluded.built_at,
+        },
+        where=ViewerContextSnapshot.revision < stmt.excluded.revision,
+    )
+    await db.execute(stmt)
+    await db.commit()
@@ -0,0 +1,113 @@
+"""Кэш сессий для auth_gate и отложенная запись last_seen_at.
+
+Каждый запрос к API проходит auth_gate, и раньше сессия по cookie искалась
+в базе до трёх раз за запрос (auth_gate, проверка CSRF, Depends в роуте),
+плюс UPDATE last_seen_at с отдельным commit'ом. Теперь найденная сессия
+живёт в памяти процесса AUTH_SESSION_CACHE_TTL_SECONDS секунд, а
+last_seen_at копится в памяти и пишется в базу одним пакетом раз в
+SESSION_LAST_SEEN_FLUSH_SECONDS.
+
+Выход и смена CSRF-токена сбрасывают запись в процессе, который их
+обработал. Другие процессы gateway увидят отзыв сессии не позже чем через
+TTL — это и есть цена кэша; AUTH_SESSION_CACHE_TTL_SECONDS=0 отключает его.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple
+from uuid import UUID
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.models.users import User, UserSession
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class AuthSession(NamedTuple):
+    session_id: UUID
+    user: User
+    csrf_token_hash: str
+    expires_at: datetime
+
+
+_entries: OrderedDict[str, tuple[AuthSession, float]] = OrderedDict()
+_last_seen: dict[UUID, datetime] = {}
+_lock = threading.Lock()
+
+
+def get(token_hash: str, now: datetime, monotonic_now: float) -> AuthSession | None:
+    with _lock:
+        cached = _entries.get(token_hash)
+        if cached is None:
+            return None
+        auth, cached_at = cached
+        if (
+            monotonic_now - cached_at >= settings.AUTH_SESSION_CACHE_TTL_SECONDS
+            or auth.expires_at <= now
+        ):
+            del _entries[token_hash]
+            return None
+        _entries.move_to_end(token_hash)
+        return auth
+
+
+def put(token_hash: str, auth: AuthSession, monotonic_now: float) -> None:
+    if settings.AUTH_SESSION_CACHE_TTL_SECONDS <= 0:
+        return
+    with _lock:
+        _entries[token_hash] = (auth, monotonic_now)
+        _entries.move_to_end(token_hash)
+        while len(_entries) > settings.AUTH_SESSION_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def invalidate(token_hash: str) -> None:
+    with _lock:
+        _entries.pop(token_hash, None)
+
+
+def touch(session_id: UUID, now: datetime) -> None:
+    """Запоминает активность сессии; в базу она попадёт при ближайшем flush."""
+    with _lock:
+        _last_seen[session_id] = now
+
+
+async def flush_last_seen() -> None:
+    global _last_seen
+    with _lock:
+        pending, _last_seen = _last_seen, {}
+    if not pending:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(UserSession),
+                [
+                    {"id": session_id, "last_seen_at": seen_at}
+                    for session_id, seen_at in pending.items()
+                ],
+            )
+            await db.commit()
+    except Exception:
+        logger.warning(
+            "session_cache: failed to write last_seen_at for %d session(s)",
+            len(pending),
+            exc_info=True,
+            extra={"step": "session_last_seen"},
+        )
+        # Не теряем отметки: более свежие из новых запросов важнее старых.
+        with _lock:
+            for session_id, seen_at in pending.items():
+                _last_seen.setdefault(session_id, seen_at)
+
+
+async def run_last_seen_flusher() -> None:
+    while True:
+        await asyncio.sleep(settings.SESSION_LAST_SEEN_FLUSH_SECONDS)
+        await flush_last_seen()
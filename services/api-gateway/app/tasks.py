@@ -22,6 +22,7 @@ from app.services.extraction_jobs import (
     mark_job_succeeded,
 )
 from app.services.extraction_tasks import run_extraction_task
+from app.services.revisions import bump_statement as bump_revision
 
 logger = logging.getLogger(__name__)
 
@@ -221,6 +222,7 @@ def _run_extract_file(
                 )
             )
             session.execute(stmt)
+            session.execute(bump_revision(analysis_id))
             session.commit()
 
             results = session.execute(
@@ -238,7 +240,10 @@ def _run_extract_file(
 
             if file_type == "tz":
                 session.execute(
-                    text("UPDATE analysis.analysis SET status=:status, updated_at=:updated_at WHERE id=:id"),
+                    text(
+                        "UPDATE analysis.analysis SET status=:status, updated_at=:updated_at, "
+                        "revision = revision + 1 WHERE id=:id"
+                    ),
                     {
                         "status": "tz_review",
                         "updated_at": datetime.utcnow(),
@@ -271,7 +276,10 @@ def _run_extract_file(
 
                 if compare_job_id:
                     session.execute(
-                        text("UPDATE analysis.analysis SET status=:status, updated_at=:updated_at WHERE id=:id"),
+                        text(
+                            "UPDATE analysis.analysis SET status=:status, updated_at=:updated_at, "
+                            "revision = revision + 1 WHERE id=:id"
+                        ),
                         {
                             "status": "analyzing_data",
                             "updated_at": datetime.utcnow(),
@@ -325,7 +333,10 @@ def _run_extract_file(
         if status == "failed":
             with SessionLocal() as session:
                 session.execute(
-                    text("UPDATE analysis.analysis SET status=:status, updated_at=:updated_at WHERE id=:id"),
+                    text(
+                        "UPDATE analysis.analysis SET status=:status, updated_at=:updated_at, "
+                        "revision = revision + 1 WHERE id=:id"
+                    ),
                     {
                         "status": "failed",
                         "updated_at": datetime.utcnow(),
@@ -0,0 +1,51 @@
+"""add indexes for analysis list
+
+GET /analyses собирает список одним запросом: анализы пользователя по
+убыванию (created_at, id) и LATERAL-подзапросы к файлам и задачам
+извлечения по analysis_id. Без этих индексов каждый подзапрос сканировал
+files.file и analysis.extraction_job целиком.
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "a3b4c5d6e7f8"
+down_revision: Union[str, Sequence[str], None] = "f2a3b4c5d6e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_analysis_user_created_at",
+        "analysis",
+        ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        schema="analysis",
+    )
+    op.create_index(
+        "ix_file_analysis_id_file_type",
+        "file",
+        ["analysis_id", "file_type"],
+        schema="files",
+    )
+    op.create_index(
+        "ix_extraction_job_analysis_id_updated_at",
+        "extraction_job",
+        ["analysis_id", sa.text("updated_at DESC")],
+        schema="analysis",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_extraction_job_analysis_id_updated_at",
+        table_name="extraction_job",
+        schema="analysis",
+    )
+    op.drop_index("ix_file_analysis_id_file_type", table_name="file", schema="files")
+    op.drop_index("ix_analysis_user_created_at", table_name="analysis", schema="analysis")
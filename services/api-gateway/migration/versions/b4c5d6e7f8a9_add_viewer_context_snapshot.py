@@ -0,0 +1,36 @@
+"""add viewer_context_snapshot table
+
+Материализованная тяжёлая часть ответа GET /analyses/{id}/viewer-context:
+опрос вьювера читает её одной строкой вместо пересборки из
+extraction_result, comparison_row, user_edit и tz_characteristic_review.
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "b4c5d6e7f8a9"
+down_revision: Union[str, Sequence[str], None] = "a3b4c5d6e7f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "viewer_context_snapshot",
+        sa.Column("analysis_id", postgresql.UUID(), nullable=False),
+        sa.Column("generation", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("built_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("analysis_id"),
+        schema="analysis",
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("viewer_context_snapshot", schema="analysis")
@@ -0,0 +1,48 @@
+"""add revision to analysis
+
+Ревизия анализа растёт при каждой правке его данных и задаёт ETag
+GET-эндпоинтов анализа. Снимок viewer-context теперь помечается ревизией,
+при которой собран, вместо собственного счётчика generation.
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "c5d6e7f8a9b0"
+down_revision: Union[str, Sequence[str], None] = "b4c5d6e7f8a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "analysis",
+        sa.Column("revision", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        schema="analysis",
+    )
+    # Снимки, собранные по старому счётчику, с ревизией не сопоставимы.
+    op.execute("DELETE FROM analysis.viewer_context_snapshot")
+    op.alter_column(
+        "viewer_context_snapshot",
+        "generation",
+        new_column_name="revision",
+        server_default=None,
+        schema="analysis",
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM analysis.viewer_context_snapshot")
+    op.alter_column(
+        "viewer_context_snapshot",
+        "revision",
+        new_column_name="generation",
+        server_default=sa.text("0"),
+        schema="analysis",
+    )
+    op.drop_column("analysis", "revision", schema="analysis")
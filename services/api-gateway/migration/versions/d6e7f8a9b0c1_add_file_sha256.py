@@ -0,0 +1,26 @@
+"""add sha256 to files.file
+
+file-service считает SHA-256 при потоковой заливке в S3 и переиспользует
+уже залитый объект с тем же содержимым.
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "d6e7f8a9b0c1"
+down_revision: Union[str, Sequence[str], None] = "c5d6e7f8a9b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("file", sa.Column("sha256", sa.String(length=64), nullable=True), schema="files")
+
+
+def downgrade() -> None:
+    op.drop_column("file", "sha256", schema="files")
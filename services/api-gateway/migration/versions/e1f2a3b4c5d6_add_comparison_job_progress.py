@@ -0,0 +1,30 @@
+"""add progress to comparison_job
+
+Процент готовых строк сравнения: domain-analyze сообщает его после каждого
+chunk'а, пока задача ещё выполняется.
+
+Revision ID: e1f2a3b4c5d6
+Revises: c4d5e6f7a8b9
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "e1f2a3b4c5d6"
+down_revision: Union[str, Sequence[str], None] = "c4d5e6f7a8b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "comparison_job",
+        sa.Column("progress", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        schema="analysis",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("comparison_job", "progress", schema="analysis")
@@ -0,0 +1,40 @@
+"""add position to comparison_row
+
+Место строки в результате сравнения: id строк — gen_random_uuid(), и
+порядок по id не совпадает с порядком строк, по которому слияние повторного
+сравнения нумерует повторы одной характеристики.
+
+Revision ID: e7f8a9b0c1d2
+Revises: d6e7f8a9b0c1
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "e7f8a9b0c1d2"
+down_revision: Union[str, Sequence[str], None] = "d6e7f8a9b0c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "comparison_row",
+        sa.Column("position", sa.Integer(), nullable=True),
+        schema="analysis",
+    )
+    op.create_index(
+        "ix_comparison_row_analysis_position",
+        "comparison_row",
+        ["analysis_id", "position"],
+        schema="analysis",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_comparison_row_analysis_position", table_name="comparison_row", schema="analysis"
+    )
+    op.drop_column("comparison_row", "position", schema="analysis")
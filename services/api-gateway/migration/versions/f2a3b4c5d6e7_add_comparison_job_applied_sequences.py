@@ -0,0 +1,37 @@
+"""add applied_sequences to comparison_job
+
+Номера частичных результатов сравнения, уже записанных в comparison_row:
+domain-analyze присылает строки каждого готового chunk'а отдельно, и
+повторная доставка той же порции не должна дублировать строки.
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "f2a3b4c5d6e7"
+down_revision: Union[str, Sequence[str], None] = "e1f2a3b4c5d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "comparison_job",
+        sa.Column(
+            "applied_sequences",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default=sa.text("'[]'::jsonb"),
+            nullable=False,
+        ),
+        schema="analysis",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("comparison_job", "applied_sequences", schema="analysis")
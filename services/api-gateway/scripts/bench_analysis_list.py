@@ -0,0 +1,160 @@
+"""Замер сборки списка анализов: запрос на каждый анализ (как GET /analyses
+работал раньше) против одного запроса build_analysis_items.
+
+Запуск из контейнера api-gateway, где доступна база:
+
+    python scripts/bench_analysis_list.py [--analyses 10000] [--page 50] [--repeat 3]
+
+Пользователь, анализы, файлы и задачи извлечения создаются в транзакции,
+которая откатывается, — данные в базе не остаются. Каждый десятый анализ
+завершён с ошибкой извлечения, чтобы замерялась и выборка ошибок.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.api.analyses import build_analysis_items  # noqa: E402
+from app.db.models.analysis import Analysis  # noqa: E402
+from app.db.models.comparison_jobs import ComparisonJob  # noqa: E402
+from app.db.models.extraction_jobs import ExtractionJob  # noqa: E402
+from app.db.models.files import File as FileModel  # noqa: E402
+from app.db.models.users import User  # noqa: E402
+from app.db.session import AsyncSessionLocal, engine  # noqa: E402
+
+_BATCH_SIZE = 1000
+
+
+async def _insert_batched(db, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), _BATCH_SIZE):
+        await db.execute(insert(model), rows[start:start + _BATCH_SIZE])
+
+
+async def _seed(db, count: int) -> User:
+    user = User(login=f"bench-{uuid.uuid4()}", password_hash="-")
+    db.add(user)
+    await db.flush()
+    started = datetime.utcnow()
+    analyses, files, jobs = [], [], []
+    for index in range(count):
+        analysis_id = uuid.uuid4()
+        failed = index % 10 == 0
+        analyses.append({
+            "id": analysis_id,
+            "user_id": user.id,
+            "status": "failed" if failed else "ready",
+            "created_at": started - timedelta(seconds=index),
+            "updated_at": started - timedelta(seconds=index),
+        })
+        for file_type in ("tz", "passport"):
+            file_id = uuid.uuid4()
+            files.append({
+                "id": file_id,
+                "analysis_id": analysis_id,
+                "file_type": file_type,
+                "original_name": f"{file_type}-{index}.pdf",
+                "storage_path": f"bench/{file_id}.pdf",
+                "status": "uploaded",
+            })
+            jobs.append({
+                "analysis_id": analysis_id,
+                "file_id": file_id,
+                "file_type": file_type,
+                "status": "failed" if failed and file_type == "tz" else "succeeded",
+                "last_error": "timeout" if failed and file_type == "tz" else None,
+            })
+    await _insert_batched(db, Analysis, analyses)
+    await _insert_batched(db, FileModel, files)
+    await _insert_batched(db, ExtractionJob, jobs)
+    return user
+
+
+async def _per_analysis(db, user: User) -> int:
+    """Прежняя схема: список анализов, затем файлы и ошибки по каждому."""
+    analyses = (
+        await db.execute(
+            select(Analysis.id, Analysis.status)
+            .where(Analysis.user_id == user.id)
+            .order_by(Analysis.created_at.desc())
+        )
+    ).all()
+    for analysis_id, status in analyses:
+        await db.execute(
+            select(FileModel.id, FileModel.file_type, FileModel.original_name, FileModel.status)
+            .where(FileModel.analysis_id == analysis_id)
+        )
+        if status != "failed":
+            continue
+        error = (
+            await db.execute(
+                select(ExtractionJob.file_type, ExtractionJob.last_error)
+                .where(
+                    ExtractionJob.analysis_id == analysis_id,
+                    ExtractionJob.last_error.is_not(None),
+                )
+                .order_by(ExtractionJob.updated_at.desc())
+                .limit(1)
+            )
+        ).first()
+        if error is None:
+            await db.execute(
+                select(ComparisonJob.last_error).where(ComparisonJob.analysis_id == analysis_id)
+            )
+    return len(analyses)
+
+
+async def _single_query(db, user: User) -> int:
+    items, _ = await build_analysis_items(db, user)
+    return len(items)
+
+
+async def _first_page(db, user: User, page: int) -> int:
+    items, _ = await build_analysis_items(db, user, limit=page)
+    return len(items)
+
+
+async def _measure(reader, db, user: User, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await reader(db, user)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyses", type=int, default=10000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        async with AsyncSessionLocal() as db:
+            user = await _seed(db, args.analyses)
+            per_analysis = await _measure(_per_analysis, db, user, args.repeat)
+            single = await _measure(_single_query, db, user, args.repeat)
+            page = await _measure(
+                lambda db, user: _first_page(db, user, args.page), db, user, args.repeat
+            )
+            await db.rollback()
+    finally:
+        await engine.dispose()
+
+    print(f"{'mode':>16} {'time, s':>10}")
+    print(f"{'per-analysis':>16} {per_analysis:>10.3f}")
+    print(f"{'single query':>16} {single:>10.3f}")
+    print(f"{'page of ' + str(args.page):>16} {page:>10.4f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
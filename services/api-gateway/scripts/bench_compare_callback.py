@@ -0,0 +1,122 @@
+"""Замер записи строк сравнения: ORM (как compare_callback писал раньше) против
+пакетного INSERT (insert_comparison_rows).
+
+Запуск из контейнера api-gateway, где доступна база:
+
+    python scripts/bench_compare_callback.py [--sizes 50 500 5000] [--repeat 3]
+
+Каждый прогон выполняется в транзакции, которая откатывается, — данные в базе
+не остаются. Строки получают случайный analysis_id и крупные evidence,
+похожие по объёму на реальные (bbox, spans, несколько кандидатов паспорта).
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api.compare import insert_comparison_rows  # noqa: E402
+from app.db.models.analysis import ComparisonRow  # noqa: E402
+from app.db.session import AsyncSessionLocal, engine  # noqa: E402
+
+
+def _evidence(index: int, side: str) -> dict:
+    return {
+        "document": side,
+        "page": index % 40 + 1,
+        "quote": f"Характеристика {index}: значение {index * 1.5} единиц " * 4,
+        "bbox": {"x0": 0.12, "y0": 0.34, "x1": 0.56, "y1": 0.78},
+        "source_spans": [
+            {
+                "page": index % 40 + 1,
+                "text": f"фрагмент {span} строки {index} " * 6,
+                "bbox": {"x0": 0.1 * span, "y0": 0.2, "x1": 0.3, "y1": 0.4},
+                "matched_terms": ["значение", "единиц", str(index)],
+            }
+            for span in range(4)
+        ],
+    }
+
+
+def _comparison(index: int) -> dict:
+    return {
+        "product_name": f"Изделие {index % 5}",
+        "is_target_model": index % 5 == 0,
+        "characteristic": f"Характеристика {index}",
+        "tz_value": f"не менее {index}",
+        "passport_value": str(index + 1),
+        "tz_quote": f"не менее {index}",
+        "passport_quote": str(index + 1),
+        "tz_evidence": _evidence(index, "tz"),
+        "passport_evidence": _evidence(index, "passport"),
+        "passport_value_candidates": [
+            {"value": str(index + candidate), "evidence": _evidence(index, "passport")}
+            for candidate in range(3)
+        ],
+        "is_match": index % 3 != 0,
+        "note": None,
+    }
+
+
+async def _orm_insert(db, analysis_id: uuid.UUID, comparisons: list[dict]) -> None:
+    for item in comparisons:
+        db.add(
+            ComparisonRow(
+                analysis_id=analysis_id,
+                product_name=item.get("product_name"),
+                is_target_model=item.get("is_target_model"),
+                characteristic=item.get("characteristic") or "",
+                tz_value=item.get("tz_value"),
+                passport_value=item.get("passport_value"),
+                tz_quote=item.get("tz_quote"),
+                passport_quote=item.get("passport_quote"),
+                tz_evidence=item.get("tz_evidence"),
+                passport_evidence=item.get("passport_evidence"),
+                passport_value_candidates=item.get("passport_value_candidates"),
+                llm_result=item.get("is_match"),
+                user_result=None,
+                note=item.get("note"),
+            )
+        )
+    await db.flush()
+
+
+async def _bulk_insert(db, analysis_id: uuid.UUID, comparisons: list[dict]) -> None:
+    await insert_comparison_rows(db, analysis_id, comparisons)
+
+
+async def _measure(writer, comparisons: list[dict], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await writer(db, uuid.uuid4(), comparisons)
+            timings.append(time.perf_counter() - started)
+            await db.rollback()
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'orm, s':>10} {'bulk, s':>10} {'speedup':>8}")
+    try:
+        for size in args.sizes:
+            comparisons = [_comparison(index) for index in range(size)]
+            orm = statistics.median(await _measure(_orm_insert, comparisons, args.repeat))
+            bulk = statistics.median(await _measure(_bulk_insert, comparisons, args.repeat))
+            print(f"{size:>6} {orm:>10.3f} {bulk:>10.3f} {orm / bulk:>7.1f}x")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Замер отдачи OCR word-индекса: json.dumps против orjson и размер/время
+сжатия gzip, br и zstd (см. app/core/responses.py, app/core/compression.py).
+
+Индекс берётся записанный — из файла или из базы:
+
+    python scripts/bench_payload_encoding.py --input passport_ocr_index.json
+    python scripts/bench_payload_encoding.py --analysis-id <uuid> --file-type passport
+
+Время передачи оценивается для нескольких пропускных способностей канала
+(--bandwidth, Мбит/с): сериализация + сжатие + передача сжатых байт.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from uuid import UUID
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.compression import COMPRESSORS  # noqa: E402
+from app.core.responses import ORJSONResponse  # noqa: E402
+
+
+async def _load_from_db(analysis_id: UUID, file_type: str):
+    from sqlalchemy import select
+
+    from app.db.models.extraction_results import ExtractionResult
+    from app.db.session import AsyncSessionLocal, engine
+
+    try:
+        async with AsyncSessionLocal() as db:
+            payload = (
+                await db.execute(
+                    select(ExtractionResult.payload)
+                    .where(ExtractionResult.analysis_id == analysis_id)
+                    .where(ExtractionResult.file_type == f"{file_type}_ocr_index")
+                )
+            ).scalar_one_or_none()
+    finally:
+        await engine.dispose()
+    if payload is None:
+        raise SystemExit("OCR index not found: open the document in the viewer first")
+    return payload
+
+
+def _median_time(func, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", type=Path)
+    source.add_argument("--analysis-id", type=UUID)
+    parser.add_argument("--file-type", choices=["tz", "passport"], default="passport")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--bandwidth", type=float, nargs="+", default=[10.0, 100.0])
+    args = parser.parse_args()
+
+    if args.input is not None:
+        payload = json.loads(args.input.read_text(encoding="utf-8"))
+    else:
+        payload = asyncio.run(_load_from_db(args.analysis_id, args.file_type))
+
+    # Так кодировал JSONResponse: json.dumps(ensure_ascii=False, separators=(",", ":")).
+    stdlib_time, body = _median_time(
+        lambda: json.dumps(
+            payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8"),
+        args.repeat,
+    )
+    orjson_time, body = _median_time(lambda: ORJSONResponse(payload).body, args.repeat)
+
+    print(f"payload: {len(body) / 1024:.0f} KiB")
+    print(f"{'encoder':>10} {'time, ms':>10}")
+    print(f"{'json':>10} {stdlib_time * 1000:>10.1f}")
+    print(f"{'orjson':>10} {orjson_time * 1000:>10.1f}  ({stdlib_time / orjson_time:.1f}x)")
+    print()
+
+    rows = [("identity", 0.0, len(body))]
+    for encoding, compress in COMPRESSORS.items():
+        seconds, compressed = _median_time(lambda: compress(body), args.repeat)
+        rows.append((encoding, seconds, len(compressed)))
+
+    header = f"{'encoding':>10} {'size, KiB':>10} {'ratio':>6} {'cpu, ms':>8}"
+    for mbit in args.bandwidth:
+        header += f" {f'@{mbit:g}Mbit, ms':>14}"
+    print(header)
+    for encoding, seconds, size in rows:
+        line = f"{encoding:>10} {size / 1024:>10.0f} {len(body) / size:>6.1f} {seconds * 1000:>8.1f}"
+        for mbit in args.bandwidth:
+            total = orjson_time + seconds + size * 8 / (mbit * 1_000_000)
+            line += f" {total * 1000:>14.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
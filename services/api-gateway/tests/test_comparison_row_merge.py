@@ -0,0 +1,100 @@
+"""Слияние повторного сравнения со строками анализа (app/api/compare.py)."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+from app.api.compare import _COMPARISON_COLUMNS, _comparison_row_values, _plan_row_merge
+
+ANALYSIS_ID = uuid4()
+CREATED_AT = datetime(2026, 1, 1)
+
+
+def _comparison(characteristic: str, passport_value: str, is_match: bool, **extra) -> dict:
+    return {
+        "product_name": "Насос",
+        "characteristic": characteristic,
+        "tz_value": "не менее 10",
+        "passport_value": passport_value,
+        "is_match": is_match,
+        **extra,
+    }
+
+
+def _existing(row_id: UUID, values: dict) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=row_id,
+        created_at=CREATED_AT,
+        **{column: values[column] for column in _COMPARISON_COLUMNS},
+    )
+
+
+def test_repeated_characteristic_keeps_rows_by_position_not_by_id():
+    # Одна характеристика дважды (две рабочие точки). id строк случайные —
+    # здесь они намеренно упорядочены обратно их месту в таблице.
+    first_id = UUID("ffffffff-0000-0000-0000-000000000000")
+    second_id = UUID("00000000-0000-0000-0000-000000000001")
+    previous = [
+        _comparison("Подача", "12", True),
+        _comparison("Подача", "8", False),
+        _comparison("Напор", "30", True),
+    ]
+    existing = [
+        _existing(row_id, _comparison_row_values(ANALYSIS_ID, item, position))
+        for row_id, (position, item) in zip(
+            [first_id, second_id, uuid4()], enumerate(previous)
+        )
+    ]
+    # Повторное сравнение: у второй точки изменилось значение паспорта.
+    rerun = [
+        _comparison("Подача", "12", True),
+        _comparison("Подача", "9", False),
+        _comparison("Напор", "30", True),
+    ]
+    new_values = [
+        _comparison_row_values(ANALYSIS_ID, item, position) for position, item in enumerate(rerun)
+    ]
+
+    to_insert, updates, vanished, matched = _plan_row_merge(list(reversed(existing)), new_values)
+
+    assert to_insert == []
+    assert vanished == []
+    assert matched == 3
+    assert list(updates) == [("passport_value",)]
+    assert updates[("passport_value",)] == [{"row_id": second_id, "new_passport_value": "9"}]
+
+
+def test_worker_position_wins_over_delivery_order():
+    # Строки пришли не в порядке таблицы — место задаёт position от воркера.
+    comparisons = [
+        _comparison("Подача", "8", False, position=1),
+        _comparison("Подача", "12", True, position=0),
+    ]
+    existing = [
+        _existing(uuid4(), _comparison_row_values(ANALYSIS_ID, item, position))
+        for position, item in enumerate(
+            [_comparison("Подача", "12", True), _comparison("Подача", "8", False)]
+        )
+    ]
+    new_values = [
+        _comparison_row_values(ANALYSIS_ID, item, position)
+        for position, item in enumerate(comparisons)
+    ]
+
+    to_insert, updates, vanished, matched = _plan_row_merge(existing, new_values)
+
+    assert (to_insert, updates, vanished, matched) == ([], {}, [], 2)
+
+
+def test_rows_without_position_are_matched_after_positioned_ones():
+    legacy = _existing(uuid4(), {
+        **_comparison_row_values(ANALYSIS_ID, _comparison("Напор", "30", True), 0),
+        "position": None,
+    })
+    new_values = [_comparison_row_values(ANALYSIS_ID, _comparison("Напор", "30", True), 0)]
+
+    to_insert, updates, vanished, matched = _plan_row_merge([legacy], new_values)
+
+    # Строка та же — проставляется только её место.
+    assert (to_insert, vanished, matched) == ([], [], 1)
+    assert updates == {("position",): [{"row_id": legacy.id, "new_position": 0}]}
@@ -1,10 +1,18 @@
 from celery import Celery
+import logging
+
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 
 from app.logging_setup import configure_logging
 
 configure_logging("domain-analyze-worker")
 
 from app.core.config import settings
+from app.db.migrations import create_schema
+from app.db.session import engine
+from app.services.http_clients import close_clients, init_clients
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "domain_analyze",
@@ -35,3 +43,27 @@ celery_app.conf.update(
         },
     },
 )
+
+
+@worker_init.connect
+def _create_db_schema(**_kwargs) -> None:
+    # Без базы воркер всё равно может сравнивать: circuit breaker в этом
+    # случае просто считается закрытым (см. app/services/provider_health.py).
+    try:
+        create_schema()
+    except Exception:
+        logger.warning("domain-analyze: failed to create database schema", exc_info=True)
+
+
+# Пулы HTTP-соединений создаются в каждом дочернем процессе воркера, а не в
+# родителе: соединения, открытые до fork, нельзя делить между процессами.
+@worker_process_init.connect
+def _init_http_clients(**_kwargs) -> None:
+    # То же для пула соединений с базой, открытых родителем в create_schema.
+    engine.dispose(close=False)
+    init_clients()
+
+
+@worker_process_shutdown.connect
+def _close_http_clients(**_kwargs) -> None:
+    close_clients()
@@ -0,0 +1,8 @@
+from __future__ import annotations
+
+from app.db.models import Base
+from app.db.session import engine
+
+
+def create_schema() -> None:
+    Base.metadata.create_all(bind=engine)
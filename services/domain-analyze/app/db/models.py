@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Integer, String, Text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class ProviderCircuit(Base):
+    """Состояние circuit breaker'а LLM-провайдера, общее для всех процессов
+    воркера (см. app/services/provider_health.py)."""
+
+    __tablename__ = "llm_provider_circuits"
+
+    provider: Mapped[str] = mapped_column(String(64), primary_key=True)
+    consecutive_failures: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Пока не наступило — провайдер считается недоступным (circuit open).
+    opened_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class ChunkCheckpoint(Base):
+    """Результат одного chunk'а сравнения в рамках задачи compare_documents.
+    Повтор задачи Celery не отправляет в LLM строки, уже сохранённые здесь
+    (см. app/services/checkpoints.py)."""
+
+    __tablename__ = "compare_chunk_checkpoints"
+
+    job_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    chunk_index: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Отпечаток строки (_item_fingerprint) -> сравнение, которое вернула модель.
+    verdicts: Mapped[dict] = mapped_column(JSON, nullable=False)
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class ItemVerdict(Base):
+    """Вердикт модели по строке сравнения для инкрементального сравнения:
+    повторный запуск отправляет в LLM только строки, которых здесь нет
+    (см. app/services/verdict_memo.py)."""
+
+    __tablename__ = "compare_item_verdicts"
+
+    # Версия промпта сравнения (sha256 от промпта и его схемы): смена промпта
+    # обесценивает всё, что модель отвечала по старому.
+    prompt_version: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(128), primary_key=True)
+    # Отпечаток строки (_item_fingerprint).
+    fingerprint: Mapped[str] = mapped_column(String(64), primary_key=True)
+    verdict: Mapped[dict] = mapped_column(JSON, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
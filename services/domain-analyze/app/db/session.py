@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+
+
+def _create_engine() -> Engine:
+    # Воркеру нужно немного соединений: к базе обращаются только служебные
+    # шаги вокруг запросов к LLM, а не сами chunk'и сравнения.
+    return create_engine(
+        settings.DOMAIN_ANALYZE_DB_URL,
+        future=True,
+        pool_pre_ping=True,
+        pool_size=settings.DOMAIN_ANALYZE_DB_POOL_SIZE,
+        max_overflow=settings.DOMAIN_ANALYZE_DB_POOL_SIZE,
+        pool_timeout=settings.DOMAIN_ANALYZE_DB_CONNECT_TIMEOUT_SECONDS,
+        # Без таймаутов недоступная база подвешивала каждый chunk на время
+        # TCP-таймаута, вместо того чтобы сравнение продолжилось без неё.
+        connect_args={
+            "connect_timeout": settings.DOMAIN_ANALYZE_DB_CONNECT_TIMEOUT_SECONDS,
+            "options": f"-c statement_timeout={settings.DOMAIN_ANALYZE_DB_STATEMENT_TIMEOUT_MS}",
+        },
+    )
+
+
+engine = _create_engine()
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+
+def ping_db() -> None:
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
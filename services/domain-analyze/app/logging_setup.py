@@ -22,6 +22,9 @@ import time
 from typing import Any
 
 _CONTEXT_FIELDS = ("analysis_id", "job_id", "step")
+# Необязательные поля отдельных шагов: попадают в JSON-лог, только если шаг
+# их передал (в консольный формат не входят, там их дублирует текст).
+_OPTIONAL_FIELDS = ("cache_hit",)
 
 
 class JsonFormatter(logging.Formatter):
@@ -34,7 +37,7 @@ class JsonFormatter(logging.Formatter):
             "logger": record.name,
             "message": record.getMessage(),
         }
-        for field in _CONTEXT_FIELDS:
+        for field in _CONTEXT_FIELDS + _OPTIONAL_FIELDS:
             value = getattr(record, field, None)
             if value is not None:
                 payload[field] = value
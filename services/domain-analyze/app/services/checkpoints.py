@@ -0,0 +1,101 @@
+"""Чекпоинты chunk'ов сравнения.
+
+compare_documents повторяется Celery при любой ошибке (до 5 раз), и раньше
+каждый повтор заново отправлял в LLM все chunk'и — даже если упал только
+шестой из них или доставка callback'а. Теперь вердикты каждого завершённого
+chunk'а сохраняются в Postgres под (job_id, chunk_index), а повтор той же
+задачи берёт их оттуда и отправляет в модель только оставшиеся строки.
+
+Строки сопоставляются по отпечатку (_item_fingerprint), а не по номеру
+chunk'а: планировщик при повторе может нарезать chunk'и иначе. Номера новых
+chunk'ов продолжают уже сохранённые.
+
+Ошибки базы не должны ронять сравнение: без базы повтор просто пересчитывает
+всё, как до появления чекпоинтов.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from sqlalchemy import delete, select
+
+from app.db.models import ChunkCheckpoint
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class Restored(NamedTuple):
+    verdicts: dict[str, dict[str, Any]]
+    summaries: list[str]
+    next_chunk_index: int
+
+
+def load(job_id: str) -> Restored:
+    try:
+        with SessionLocal() as db:
+            rows = db.scalars(
+                select(ChunkCheckpoint)
+                .where(ChunkCheckpoint.job_id == job_id)
+                .order_by(ChunkCheckpoint.chunk_index)
+            ).all()
+    except Exception:
+        logger.warning(
+            "checkpoints: failed to load checkpoints for job %s, starting from scratch",
+            job_id,
+            exc_info=True,
+            extra={"job_id": job_id, "step": "compare_checkpoint"},
+        )
+        return Restored({}, [], 0)
+    verdicts: dict[str, dict[str, Any]] = {}
+    summaries: list[str] = []
+    for row in rows:
+        if isinstance(row.verdicts, dict):
+            verdicts.update(row.verdicts)
+        if row.summary:
+            summaries.append(row.summary)
+    next_chunk_index = rows[-1].chunk_index + 1 if rows else 0
+    return Restored(verdicts, summaries, next_chunk_index)
+
+
+def save(
+    job_id: str,
+    chunk_index: int,
+    verdicts: dict[str, dict[str, Any]],
+    summary: str | None,
+) -> None:
+    try:
+        with SessionLocal() as db:
+            db.merge(
+                ChunkCheckpoint(
+                    job_id=job_id,
+                    chunk_index=chunk_index,
+                    verdicts=verdicts,
+                    summary=summary,
+                    created_at=datetime.now(timezone.utc),
+                )
+            )
+            db.commit()
+    except Exception:
+        logger.warning(
+            "checkpoints: failed to save chunk %d of job %s", chunk_index, job_id,
+            exc_info=True,
+            extra={"job_id": job_id, "step": "compare_checkpoint"},
+        )
+
+
+def clear(job_id: str) -> None:
+    """Удаляет чекпоинты задачи: результат доставлен или повторов больше не будет."""
+    try:
+        with SessionLocal() as db:
+            db.execute(delete(ChunkCheckpoint).where(ChunkCheckpoint.job_id == job_id))
+            db.commit()
+    except Exception:
+        logger.warning(
+            "checkpoints: failed to clear checkpoints of job %s", job_id,
+            exc_info=True,
+            extra={"job_id": job_id, "step": "compare_checkpoint"},
+        )
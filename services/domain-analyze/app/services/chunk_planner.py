@@ -0,0 +1,159 @@
+"""Разбиение строк сравнения на chunk'и по бюджету токенов.
+
+Фиксированный COMPARE_CHUNK_SIZE считал строки, а не объём: строка с длинным
+списком кандидатов паспорта и ссылок «весит» в десятки раз больше короткой,
+поэтому chunk'и получались то крошечными, то настолько тяжёлыми, что модель не
+укладывалась в таймаут. Здесь строки упаковываются до бюджета входных токенов
+провайдера и до числа строк, ответ на которые помещается в бюджет выходных
+токенов; COMPARE_CHUNK_SIZE остаётся жёстким верхним пределом.
+
+Оценки уточняются по факту: после каждого ответа модели (те же usage и время,
+что пишутся в лог шагом compare_chunk_response) обновляются скользящие
+средние — насколько грубая оценка входа расходится с prompt_tokens, сколько
+выходных токенов уходит на одну строку и сколько секунд стоит выходной токен.
+По последнему выходной бюджет урезается так, чтобы ожидаемое время ответа
+укладывалось в COMPARE_CHUNK_TARGET_SECONDS.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections.abc import Hashable, Sequence
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Вес нового наблюдения в скользящем среднем.
+_EWMA_ALPHA = 0.3
+
+
+def estimate_tokens(value: Any) -> int:
+    """Грубая оценка числа токенов по длине JSON. Кириллица токенизируется
+    плотнее латиницы, поэтому делитель задаётся настройкой, а расхождение с
+    реальным prompt_tokens компенсирует поправочный коэффициент провайдера."""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return max(1, int(len(text) / settings.COMPARE_CHARS_PER_TOKEN))
+
+
+class _ProviderStats:
+    def __init__(self) -> None:
+        self.input_ratio = 1.0
+        self.output_tokens_per_item = float(settings.COMPARE_OUTPUT_TOKENS_PER_ITEM)
+        self.seconds_per_output_token: float | None = None
+
+
+_stats: dict[str, _ProviderStats] = {}
+_lock = threading.Lock()
+
+
+def _stats_for(provider_name: str) -> _ProviderStats:
+    stats = _stats.get(provider_name)
+    if stats is None:
+        stats = _stats.setdefault(provider_name, _ProviderStats())
+    return stats
+
+
+def _ewma(previous: float | None, observed: float) -> float:
+    if previous is None:
+        return observed
+    return (1 - _EWMA_ALPHA) * previous + _EWMA_ALPHA * observed
+
+
+def record_observation(
+    provider_name: str,
+    *,
+    item_count: int,
+    estimated_input_tokens: int,
+    usage: Any,
+    elapsed_seconds: float,
+) -> None:
+    """Учитывает фактический ответ модели на chunk из ``item_count`` строк."""
+    if not isinstance(usage, dict) or item_count <= 0:
+        return
+    prompt_tokens = usage.get("prompt_tokens")
+    completion_tokens = usage.get("completion_tokens")
+    with _lock:
+        stats = _stats_for(provider_name)
+        if isinstance(prompt_tokens, (int, float)) and prompt_tokens > 0 and estimated_input_tokens > 0:
+            stats.input_ratio = _ewma(stats.input_ratio, prompt_tokens / estimated_input_tokens)
+        if isinstance(completion_tokens, (int, float)) and completion_tokens > 0:
+            stats.output_tokens_per_item = _ewma(
+                stats.output_tokens_per_item, completion_tokens / item_count
+            )
+            if elapsed_seconds > 0:
+                stats.seconds_per_output_token = _ewma(
+                    stats.seconds_per_output_token, elapsed_seconds / completion_tokens
+                )
+
+
+def _limits(provider_name: str, output_budget: int) -> tuple[float, int]:
+    """(поправка к оценке входа, максимум строк в chunk'е)."""
+    with _lock:
+        stats = _stats_for(provider_name)
+        input_ratio = stats.input_ratio
+        per_item = max(1.0, stats.output_tokens_per_item)
+        seconds_per_token = stats.seconds_per_output_token
+    effective_output = float(output_budget)
+    if seconds_per_token:
+        effective_output = min(
+            effective_output, settings.COMPARE_CHUNK_TARGET_SECONDS / seconds_per_token
+        )
+    max_items = max(1, int(effective_output / per_item))
+    if settings.COMPARE_CHUNK_SIZE > 0:
+        max_items = min(max_items, settings.COMPARE_CHUNK_SIZE)
+    return input_ratio, max_items
+
+
+def plan_chunks(
+    indices: Sequence[int],
+    weights: Sequence[int],
+    groups: Sequence[Hashable],
+    *,
+    provider_name: str,
+    input_budget: int,
+    output_budget: int,
+) -> list[list[int]]:
+    """Раскладывает ``indices`` (в исходном порядке) по chunk'ам.
+
+    ``weights`` — оценка входных токенов каждой строки, ``groups`` — изделие
+    строки. Если chunk переполняется, граница по возможности сдвигается на
+    начало текущего изделия, чтобы строки одного изделия шли вместе; изделие
+    крупнее половины chunk'а всё же режется."""
+    input_ratio, max_items = _limits(provider_name, output_budget)
+    chunks: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0.0
+
+    def _flush(next_group: Hashable) -> None:
+        nonlocal current, current_tokens
+        cut = len(current)
+        last_group = groups[current[-1]]
+        # Следующая строка и так начинает новое изделие — режем по концу.
+        if next_group == last_group:
+            while cut > 0 and groups[current[cut - 1]] == last_group:
+                cut -= 1
+            if cut < len(current) // 2 or cut == 0:
+                cut = len(current)
+        chunks.append(current[:cut])
+        current = current[cut:]
+        current_tokens = sum(weights[index] * input_ratio for index in current)
+
+    for index in indices:
+        weight = weights[index] * input_ratio
+        while current and (current_tokens + weight > input_budget or len(current) >= max_items):
+            _flush(groups[index])
+        current.append(index)
+        current_tokens += weight
+    if current:
+        chunks.append(current)
+
+    logger.info(
+        "chunk_planner: %d item(s) -> %d chunk(s), max_items=%d input_budget=%d input_ratio=%.2f",
+        len(indices), len(chunks), max_items, input_budget, input_ratio,
+        extra={"step": "compare_json_chunks"},
+    )
+    return chunks
@@ -1,21 +1,36 @@
+import hashlib
 import json
 import logging
 import re
+import socket
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from collections.abc import Callable
+from functools import partial
 from typing import Any, NamedTuple
 
 import httpx
 
 from app.core.config import settings
-from app.services.knowledge_base_client import list_canonical_attributes, search_knowledge
+from app.services import checkpoints, llm_cache, provider_health, verdict_memo
+from app.services.chunk_planner import estimate_tokens, plan_chunks, record_observation
+from app.services.http_clients import get_client
+from app.services.json_stream import ComparisonStreamParser
+from app.services import reference_cache
+from app.services.llm_dispatch import provider_slot, run_ordered, throttle
+from app.services.value_rules import decide as decide_by_rules, unit_from_name
 
 logger = logging.getLogger(__name__)
 
 
 class CompareParseError(RuntimeError):
-    def __init__(self, message: str, raw: str) -> None:
+    def __init__(self, message: str, raw: str, provider: "_LlmProvider | None" = None) -> None:
         super().__init__(message)
         self.raw = raw
+        # Провайдер, чей ответ не разобрался: при хедже и failover'е это не
+        # обязательно основной, и чинить JSON должен тот, кто ответил.
+        self.provider = provider
 
 
 def _extract_json(text: str) -> dict:
@@ -34,10 +49,27 @@ def _extract_json(text: str) -> dict:
 
 
 def _get_prompt() -> dict:
-    with httpx.Client(timeout=settings.REQUEST_TIMEOUT_SECONDS) as client:
-        resp = client.get(f"{settings.PROMPT_REGISTRY_URL}/prompts/comparison")
-        resp.raise_for_status()
-        return resp.json()
+    return reference_cache.get_prompt("comparison")
+
+
+class _RunContext(NamedTuple):
+    """Справочные данные одного запуска compare_json: загружаются один раз и
+    передаются во все chunk'и, а не запрашиваются заново на каждый."""
+
+    prompt: dict
+    canonical_attributes: list[dict[str, Any]]
+    kb_version: str | None
+
+
+def _load_run_context() -> _RunContext:
+    prompt = _get_prompt()
+    kb_version = reference_cache.knowledge_version()
+    try:
+        attributes = reference_cache.canonical_attributes(kb_version)
+    except Exception:
+        logger.warning("Failed to fetch canonical attributes from knowledge-base", exc_info=True)
+        attributes = []
+    return _RunContext(prompt=prompt, canonical_attributes=attributes, kb_version=kb_version)
 
 
 def _unwrap_value(value: Any) -> Any:
@@ -945,17 +977,16 @@ def _note_contradicts_value(note: Any, passport_value: Any, tz_value: Any) -> bo
     return passport_present and tz_present
 
 
-def _chunk(items: list[dict], size: int) -> list[list[dict]]:
-    if size <= 0:
-        return [items]
-    return [items[i : i + size] for i in range(0, len(items), size)]
-
-
 class _LlmProvider(NamedTuple):
     name: str
     base_url: str
     api_key: str
     model: str
+    # Сколько chunk'ов одного сравнения можно держать в полёте одновременно.
+    concurrency: int
+    # Бюджеты токенов одного chunk'а, см. app/services/chunk_planner.py.
+    input_token_budget: int
+    output_token_budget: int
 
 
 # Оба этих backend'а структурируют текст моделью Yandex, поэтому и сравнение
@@ -965,6 +996,39 @@ class _LlmProvider(NamedTuple):
 _YANDEX_BACKENDS = frozenset({"yandex_vision_ocr", "paddleocr_vl"})
 
 
+def _yandex_provider() -> _LlmProvider:
+    return _LlmProvider(
+        name="yandex_ai_studio",
+        base_url=settings.YANDEX_BASE_URL,
+        api_key=settings.YANDEX_API_KEY,
+        # AI Studio требует полный идентификатор вида
+        # gpt://<folder>/<model>, короткое имя не принимается.
+        model=f"gpt://{settings.YANDEX_FOLDER_ID}/{settings.YANDEX_COMPARE_MODEL}",
+        concurrency=settings.YANDEX_COMPARE_CONCURRENCY,
+        input_token_budget=settings.YANDEX_COMPARE_INPUT_TOKEN_BUDGET,
+        output_token_budget=settings.YANDEX_COMPARE_OUTPUT_TOKEN_BUDGET,
+    )
+
+
+def _aitunnel_provider() -> _LlmProvider:
+    return _LlmProvider(
+        name="ai_tunnel",
+        base_url=settings.OPENROUTER_BASE_URL,
+        api_key=settings.OPENROUTER_API_KEY,
+        model=settings.AITUNNEL_COMPARE_MODEL or settings.OPENROUTER_MODEL,
+        concurrency=settings.AITUNNEL_COMPARE_CONCURRENCY,
+        input_token_budget=settings.AITUNNEL_COMPARE_INPUT_TOKEN_BUDGET,
+        output_token_budget=settings.AITUNNEL_COMPARE_OUTPUT_TOKEN_BUDGET,
+    )
+
+
+def _alternate_provider(provider: _LlmProvider) -> _LlmProvider | None:
+    """Второй провайдер для хеджирования и failover'а — если для него есть ключ."""
+    if provider.name == "yandex_ai_studio":
+        return _aitunnel_provider() if settings.OPENROUTER_API_KEY else None
+    return _yandex_provider() if settings.YANDEX_API_KEY else None
+
+
 def _resolve_llm_provider(extraction_backend: str | None) -> _LlmProvider:
     backend = (extraction_backend or "").strip().lower()
     if backend in _YANDEX_BACKENDS:
@@ -978,29 +1042,225 @@ def _resolve_llm_provider(extraction_backend: str | None) -> _LlmProvider:
                 extra={"step": "compare_provider_fallback"},
             )
         else:
-            return _LlmProvider(
-                name="yandex_ai_studio",
-                base_url=settings.YANDEX_BASE_URL,
-                api_key=settings.YANDEX_API_KEY,
-                # AI Studio требует полный идентификатор вида
-                # gpt://<folder>/<model>, короткое имя не принимается.
-                model=f"gpt://{settings.YANDEX_FOLDER_ID}/{settings.YANDEX_COMPARE_MODEL}",
-            )
-    return _LlmProvider(
-        name="ai_tunnel",
-        base_url=settings.OPENROUTER_BASE_URL,
-        api_key=settings.OPENROUTER_API_KEY,
-        model=settings.AITUNNEL_COMPARE_MODEL or settings.OPENROUTER_MODEL,
+            return _yandex_provider()
+    return _aitunnel_provider()
+
+
+class _StreamInterrupted(Exception):
+    """Поток ответа оборвался (idle-timeout или сетевая ошибка). Несёт то, что
+    модель успела прислать, чтобы не перезапрашивать весь chunk."""
+
+    def __init__(self, comparisons: list[dict], content: str, cause: Exception) -> None:
+        super().__init__(str(cause))
+        self.comparisons = comparisons
+        self.content = content
+        self.cause = cause
+
+
+class _ChunkCancelled(Exception):
+    """Запрос chunk'а отменён: хеджирующий дубликат уже вернул ответ."""
+
+
+class _Cancellation:
+    """Отмена проигравшей попытки хеджа — только её запроса.
+
+    Флаг проверяется между SSE-событиями: читающий поток выходит из with и
+    сам закрывает свой ответ. Если ответ идёт по HTTP/1.1, соединение
+    принадлежит только ему, и cancel() дополнительно обрывает сокет — поток,
+    который ждёт следующего события (модель ещё не начала отвечать), сразу
+    получает ошибку чтения. По HTTP/2 соединение общее для всех chunk'ов
+    провайдера: shutdown оборвал бы чужие потоки, а response.close() из
+    другого потока httpcore не поддерживает, поэтому там поток завершается
+    на следующем событии или по idle-таймауту. Обычный (не потоковый)
+    запрос прервать нельзя — он дорабатывает в фоне, а его ответ
+    отбрасывается."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response: httpx.Response | None = None
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, response: httpx.Response) -> None:
+        with self._lock:
+            if self._event.is_set():
+                raise _ChunkCancelled()
+            self._response = response
+
+    def detach(self) -> None:
+        with self._lock:
+            self._response = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            response, self._response = self._response, None
+        if response is None or response.http_version != "HTTP/1.1":
+            return
+        # close() из другого потока не будит заблокированный recv — будит
+        # shutdown сокета. Сам ответ закрывает читающий поток при выходе из
+        # with, соединение в пул не возвращается.
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _post_chat_completion(
+    provider: _LlmProvider, headers: dict[str, str], payload: dict[str, Any]
+) -> tuple[str, Any]:
+    client = get_client(provider.base_url)
+    resp = client.post(
+        f"{provider.base_url}/chat/completions",
+        headers=headers,
+        json=payload,
+        timeout=settings.REQUEST_TIMEOUT_SECONDS,
     )
+    resp.raise_for_status()
+    data = resp.json()
+    content = (
+        data.get("choices", [{}])[0]
+        .get("message", {})
+        .get("content", "")
+    )
+    return content, data.get("usage")
+
+
+def _stream_chat_completion(
+    provider: _LlmProvider,
+    headers: dict[str, str],
+    payload: dict[str, Any],
+    cancel: _Cancellation | None = None,
+) -> tuple[str, Any]:
+    """Запрос со stream=true: текст собирается из SSE-событий, а элементы
+    comparisons разбираются по мере поступления. Таймаут — на простой между
+    событиями, а не на весь ответ: длинный, но живой ответ не обрывается."""
+    parser = ComparisonStreamParser()
+    usage: Any = None
+    # httpx применяет read-таймаут к ожиданию каждого следующего куска
+    # данных — это и есть idle-timeout потока.
+    timeout = httpx.Timeout(settings.COMPARE_STREAM_IDLE_TIMEOUT_SECONDS)
+    client = get_client(provider.base_url)
+    try:
+        with client.stream(
+            "POST",
+            f"{provider.base_url}/chat/completions",
+            headers=headers,
+            json={**payload, "stream": True, "stream_options": {"include_usage": True}},
+            timeout=timeout,
+        ) as resp:
+            if cancel is not None:
+                cancel.attach(resp)
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if cancel is not None and cancel.is_set():
+                    raise _ChunkCancelled()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                if event.get("usage"):
+                    usage = event["usage"]
+                choices = event.get("choices") or []
+                if not choices:
+                    continue
+                delta = (choices[0].get("delta") or {}).get("content")
+                if isinstance(delta, str) and delta:
+                    parser.feed(delta)
+    except _ChunkCancelled:
+        raise
+    except Exception as exc:
+        # Ошибка чтения после cancel() — это закрытый нами ответ, а не сбой
+        # провайдера.
+        if cancel is not None and cancel.is_set():
+            raise _ChunkCancelled() from exc
+        if isinstance(exc, httpx.TransportError):
+            raise _StreamInterrupted(parser.comparisons, parser.text, exc) from exc
+        raise
+    finally:
+        if cancel is not None:
+            cancel.detach()
+    return parser.text, usage
+
+
+def _resume_interrupted_chunk(
+    items: list[dict],
+    context: _RunContext,
+    provider: _LlmProvider,
+    exc: _StreamInterrupted,
+    resume_attempt: int,
+    cancel: _Cancellation | None = None,
+) -> dict:
+    """Оставляет полученные до обрыва сравнения и перезапрашивает только
+    хвост chunk'а. Если не пришло ничего или попытки исчерпаны — исходная
+    ошибка уходит наверх, как и без потоковой выдачи."""
+    received = exc.comparisons[: len(items)]
+    if not received or resume_attempt >= settings.COMPARE_STREAM_MAX_RESUMES:
+        raise exc.cause
+    tail = items[len(received):]
+    logger.warning(
+        "compare_chunk: stream interrupted after %d/%d comparisons (%s), re-requesting %d",
+        len(received), len(items), exc.cause, len(tail),
+        extra={"step": "compare_chunk_stream_resume"},
+    )
+    if not tail:
+        return {"comparisons": received, "summary": ""}
+    try:
+        tail_result = _compare_chunk(
+            tail, context, provider, resume_attempt=resume_attempt + 1, cancel=cancel
+        )
+    except CompareParseError as parse_exc:
+        try:
+            tail_result = _repair_json(
+                parse_exc.raw, context.prompt.get("schema", {}), provider
+            )
+        except Exception:
+            logger.error(
+                "compare_chunk: repair of the re-requested tail failed; %d items "
+                "will be replaced with empty comparisons",
+                len(tail),
+                exc_info=True,
+                extra={"step": "compare_json_chunk_repair_failed"},
+            )
+            tail_result = {"comparisons": [], "summary": ""}
+    tail_comparisons = tail_result.get("comparisons")
+    if not isinstance(tail_comparisons, list):
+        tail_comparisons = []
+    # Хвост запрашивался отдельно, и его id снова начинаются с нуля —
+    # сдвигаем их к позициям в исходном chunk'е.
+    for comparison in tail_comparisons:
+        if isinstance(comparison, dict) and _is_wire_id(comparison.get("id")):
+            comparison["id"] += len(received)
+    return {
+        "comparisons": received + tail_comparisons[: len(tail)],
+        "summary": tail_result.get("summary") or "",
+    }
 
 
-def _compare_chunk(items: list[dict], extraction_backend: str | None = None) -> dict:
+def _compare_chunk(
+    items: list[dict],
+    context: _RunContext,
+    provider: _LlmProvider,
+    *,
+    resume_attempt: int = 0,
+    cancel: _Cancellation | None = None,
+) -> dict:
     if not items:
         return {"comparisons": [], "summary": ""}
-    prompt_payload = _get_prompt()
-    prompt_text = prompt_payload.get("prompt", "")
-    schema = prompt_payload.get("schema", {})
-    kb_appendix = _build_kb_prompt_appendix(items)
+    prompt_text = context.prompt.get("prompt", "")
+    schema = context.prompt.get("schema", {})
+    kb_appendix = _build_kb_prompt_appendix(items, context)
 
     system_message = (
         f"{prompt_text}\n\nReturn JSON that matches this schema:\n"
@@ -1008,11 +1268,10 @@ def _compare_chunk(items: list[dict], extraction_backend: str | None = None) ->
         f"{kb_appendix}"
     )
     user_message = json.dumps(
-        {"comparison_items": items},
+        {"comparison_items": [_wire_item(index, item) for index, item in enumerate(items)]},
         ensure_ascii=False,
     )
 
-    provider = _resolve_llm_provider(extraction_backend)
     headers = {
         "Authorization": f"Bearer {provider.api_key}",
         "Content-Type": "application/json",
@@ -1028,48 +1287,72 @@ def _compare_chunk(items: list[dict], extraction_backend: str | None = None) ->
     }
 
     started_at = time.monotonic()
+    cache_key = llm_cache.cache_key(provider.model, system_message, user_message)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        content = str(cached.get("content") or "")
+        logger.info(
+            "compare_chunk: cache hit for %d items (%s) usage=%s content_len=%d",
+            len(items), provider.name, cached.get("usage"), len(content),
+            extra={"step": "compare_chunk_response", "cache_hit": True},
+        )
+        return _extract_json(content)
+
     logger.info(
         "compare_chunk: sending %d items to %s (%s)",
         len(items), provider.model, provider.name,
         extra={"step": "compare_chunk_request"},
     )
-    with httpx.Client(timeout=settings.REQUEST_TIMEOUT_SECONDS) as client:
-        resp = client.post(
-            f"{provider.base_url}/chat/completions",
-            headers=headers,
-            json=payload,
+    if cancel is not None and cancel.is_set():
+        raise _ChunkCancelled()
+    try:
+        if settings.COMPARE_STREAMING:
+            content, usage = _stream_chat_completion(provider, headers, payload, cancel)
+        else:
+            content, usage = _post_chat_completion(provider, headers, payload)
+    except _ChunkCancelled:
+        raise
+    except _StreamInterrupted as exc:
+        provider_health.record_failure(provider.name)
+        return _resume_interrupted_chunk(
+            items, context, provider, exc, resume_attempt, cancel
         )
-        resp.raise_for_status()
-        data = resp.json()
+    except Exception:
+        provider_health.record_failure(provider.name)
+        raise
+    provider_health.record_success(provider.name)
 
     elapsed = time.monotonic() - started_at
-    content = (
-        data.get("choices", [{}])[0]
-        .get("message", {})
-        .get("content", "")
-    )
+    provider_health.record_latency(provider.name, elapsed)
     logger.info(
         "compare_chunk: response received in %.2fs usage=%s content_len=%d",
-        elapsed, data.get("usage"), len(content),
-        extra={"step": "compare_chunk_response"},
+        elapsed, usage, len(content),
+        extra={"step": "compare_chunk_response", "cache_hit": False},
+    )
+    record_observation(
+        provider.name,
+        item_count=len(items),
+        estimated_input_tokens=estimate_tokens(system_message + user_message),
+        usage=usage,
+        elapsed_seconds=elapsed,
     )
     try:
-        return _extract_json(content)
+        parsed = _extract_json(content)
     except json.JSONDecodeError as exc:
         logger.warning(
             "compare_chunk: failed to parse LLM response as JSON: %s", exc,
             extra={"step": "compare_chunk_parse_error"},
         )
-        raise CompareParseError(str(exc), content)
+        raise CompareParseError(str(exc), content, provider)
+    # Кэшируем только разобранный ответ: битый JSON при повторе должен снова
+    # уйти в модель, а не воспроизводиться из кэша.
+    llm_cache.put(cache_key, {"content": content, "usage": usage})
+    return parsed
 
 
-def _build_kb_prompt_appendix(items: list[dict[str, Any]]) -> str:
+def _build_kb_prompt_appendix(items: list[dict[str, Any]], context: _RunContext) -> str:
     sections: list[str] = []
-    try:
-        attributes = list_canonical_attributes()
-    except Exception:
-        logger.warning("Failed to fetch canonical attributes from knowledge-base", exc_info=True)
-        attributes = []
+    attributes = context.canonical_attributes
     if attributes:
         lines = ["\nКанонические атрибуты из Knowledge Base:"]
         for item in attributes[:100]:
@@ -1091,7 +1374,9 @@ def _build_kb_prompt_appendix(items: list[dict[str, Any]]) -> str:
     retrieval_query = " ; ".join(query_terms[:12])
     if retrieval_query:
         try:
-            retrieval = search_knowledge(retrieval_query, limit=5)
+            retrieval = reference_cache.search(
+                retrieval_query, limit=5, version=context.kb_version
+            )
         except Exception:
             logger.warning("Failed to search knowledge-base for %r", retrieval_query, exc_info=True)
             retrieval = []
@@ -1109,7 +1394,7 @@ def _build_kb_prompt_appendix(items: list[dict[str, Any]]) -> str:
     return "\n\nИспользуй следующую Knowledge Base как источник истины для нормализации терминов и объяснимого сравнения:\n" + "\n\n".join(sections)
 
 
-def _repair_json(raw_text: str, schema: dict, extraction_backend: str | None = None) -> dict:
+def _repair_json(raw_text: str, schema: dict, provider: _LlmProvider) -> dict:
     logger.info(
         "repair_json: attempting to repair unparsable LLM response (%d chars)", len(raw_text),
         extra={"step": "compare_repair_json"},
@@ -1122,7 +1407,6 @@ def _repair_json(raw_text: str, schema: dict, extraction_backend: str | None = N
         {"schema": schema, "raw": raw_text},
         ensure_ascii=False,
     )
-    provider = _resolve_llm_provider(extraction_backend)
     headers = {
         "Authorization": f"Bearer {provider.api_key}",
         "Content-Type": "application/json",
@@ -1136,25 +1420,454 @@ def _repair_json(raw_text: str, schema: dict, extraction_backend: str | None = N
         "temperature": 0.0,
         "response_format": {"type": "json_object"},
     }
-    with httpx.Client(timeout=settings.REQUEST_TIMEOUT_SECONDS) as client:
-        resp = client.post(
-            f"{provider.base_url}/chat/completions",
-            headers=headers,
-            json=payload,
+    cache_key = llm_cache.cache_key(provider.model, system_message, user_message)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        logger.info(
+            "repair_json: cache hit (%s)", provider.name,
+            extra={"step": "compare_repair_json", "cache_hit": True},
         )
-        resp.raise_for_status()
-        data = resp.json()
+        return _extract_json(str(cached.get("content") or ""))
+    client = get_client(provider.base_url)
+    resp = client.post(
+        f"{provider.base_url}/chat/completions",
+        headers=headers,
+        json=payload,
+        timeout=settings.REQUEST_TIMEOUT_SECONDS,
+    )
+    resp.raise_for_status()
+    data = resp.json()
     content = (
         data.get("choices", [{}])[0]
         .get("message", {})
         .get("content", "")
     )
-    return _extract_json(content)
+    parsed = _extract_json(content)
+    llm_cache.put(cache_key, {"content": content, "usage": data.get("usage")})
+    return parsed
+
+
+def _wire_item(index: int, item: dict[str, Any]) -> dict[str, Any]:
+    """Компактная проекция строки сравнения для промпта.
+
+    Модели для вердикта нужны только характеристика и значения: ссылки,
+    bbox, spans и evidence кандидатов раздували запрос в разы, не влияя на
+    ответ. Они остаются в исходном item и возвращаются в результат позже,
+    в _attach_evidence_to_comparison. ``id`` — позиция в chunk'е: по нему
+    ответ сопоставляется со строками, даже если модель переставила их."""
+    wire: dict[str, Any] = {
+        "id": index,
+        "product_name": item.get("product_name"),
+        "characteristic": item.get("characteristic"),
+        "tz_value": item.get("tz_value"),
+        "passport_value": item.get("passport_value"),
+    }
+    candidate_values = _dedupe_strings(
+        [
+            str(candidate.get("value"))
+            for candidate in item.get("passport_value_candidates") or []
+            if isinstance(candidate, dict) and candidate.get("value") is not None
+        ]
+    )
+    # Одно значение уже передано в passport_value — список нужен, только
+    # когда документ называет характеристику несколько раз по-разному.
+    if len(candidate_values) > 1:
+        wire["passport_value_candidates"] = candidate_values
+    return wire
+
+
+def _is_wire_id(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _align_comparisons(comparisons: list[Any], size: int) -> list[dict | None]:
+    """Раскладывает ответ модели по позициям строк chunk'а.
+
+    Если каждое сравнение несёт свой id из _wire_item (уникальный и в
+    пределах chunk'а), позиция берётся из него; иначе — по порядку, как
+    раньше. None — на эту строку модель ничего не вернула."""
+    ids = [
+        comparison.get("id") if isinstance(comparison, dict) else None
+        for comparison in comparisons
+    ]
+    by_id = (
+        bool(comparisons)
+        and all(_is_wire_id(value) and 0 <= value < size for value in ids)
+        and len(set(ids)) == len(ids)
+    )
+    aligned: list[dict | None] = [None] * size
+    for position, comparison in enumerate(comparisons):
+        if not isinstance(comparison, dict):
+            continue
+        target = comparison.pop("id") if by_id else position
+        if target < size:
+            comparison.pop("id", None)
+            aligned[target] = comparison
+    return aligned
+
+
+def _compare_chunk_attempt(
+    items: list[dict],
+    context: _RunContext,
+    provider: _LlmProvider,
+    cancel: _Cancellation,
+    *,
+    throttled: bool,
+) -> dict:
+    if not throttled:
+        return _compare_chunk(items, context, provider, cancel=cancel)
+    # Запрос вне run_ordered (хедж или failover) другому провайдеру: его
+    # rate limit и лимит параллельных запросов соблюдаются здесь.
+    with provider_slot(provider.name, provider.concurrency):
+        throttle(provider.name)
+        return _compare_chunk(items, context, provider, cancel=cancel)
+
+
+def _compare_chunk_hedged(
+    items: list[dict], context: _RunContext, primary: _LlmProvider
+) -> dict:
+    """Chunk с failover'ом и хеджированием между провайдерами.
+
+    Если circuit основного провайдера открыт, chunk сразу уходит второму.
+    Если основной отвечает дольше своего p90, тот же chunk дублируется
+    второму провайдеру: побеждает первый разобранный ответ, потоковый ответ
+    проигравшего закрывается (см. _Cancellation). Если основной упал, не
+    успев дождаться хеджа, chunk повторяется у второго провайдера. Запросы
+    второму провайдеру проходят его rate limit и лимит параллельности.
+    Без второго провайдера — как раньше."""
+    alternate = _alternate_provider(primary)
+    # Слот run_ordered и его rate limit относятся к основному провайдеру —
+    # при failover'е второму нужен свой.
+    failover = False
+    if alternate is not None and not provider_health.allow_request(primary.name):
+        if provider_health.allow_request(alternate.name):
+            logger.warning(
+                "compare_chunk: %s circuit is open, sending %d items to %s",
+                primary.name, len(items), alternate.name,
+                extra={"step": "compare_chunk_failover"},
+            )
+            primary, alternate = alternate, None
+            failover = True
+
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compare-hedge")
+    attempts: dict[Future, tuple[_LlmProvider, _Cancellation]] = {}
+
+    def _launch(provider: _LlmProvider, *, throttled: bool) -> Future:
+        cancel = _Cancellation()
+        future = pool.submit(
+            _compare_chunk_attempt, items, context, provider, cancel, throttled=throttled
+        )
+        attempts[future] = (provider, cancel)
+        return future
+
+    try:
+        # Основной запрос уже прошёл rate limit в run_ordered.
+        pending = {_launch(primary, throttled=failover)}
+        hedge_after = provider_health.hedge_delay(primary.name)
+        if alternate is not None and settings.COMPARE_HEDGING_ENABLED:
+            done, pending = wait(pending, timeout=hedge_after)
+            if not done and provider_health.allow_request(alternate.name):
+                logger.info(
+                    "compare_chunk: %s has not answered in %.1fs (p%d), hedging %d items to %s",
+                    primary.name, hedge_after, round(settings.COMPARE_HEDGE_PERCENTILE * 100),
+                    len(items), alternate.name,
+                    extra={"step": "compare_chunk_hedge"},
+                )
+                pending.add(_launch(alternate, throttled=True))
+                alternate = None
+            pending |= done
+
+        first_error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = attempts[future][0]
+                error = future.exception()
+                if error is None:
+                    for other, (other_provider, other_cancel) in attempts.items():
+                        if other is not future and not other.done():
+                            other_cancel.cancel()
+                            logger.info(
+                                "compare_chunk: %s answered first, cancelling %s",
+                                provider.name, other_provider.name,
+                                extra={"step": "compare_chunk_hedge"},
+                            )
+                    return future.result()
+                # Неразобранный ответ предпочтительнее ошибки провайдера: его
+                # ещё можно починить (_compare_chunk_or_repair).
+                if first_error is None or (
+                    isinstance(error, CompareParseError)
+                    and not isinstance(first_error, CompareParseError)
+                ):
+                    first_error = error
+                # Ошибка провайдера (не разбора JSON) — повторяем chunk у
+                # второго, если хедж ещё не отправлялся.
+                if alternate is not None and not isinstance(error, CompareParseError):
+                    if provider_health.allow_request(alternate.name):
+                        logger.warning(
+                            "compare_chunk: %s failed (%s), retrying %d items on %s",
+                            provider.name, error, len(items), alternate.name,
+                            extra={"step": "compare_chunk_failover"},
+                        )
+                        pending.add(_launch(alternate, throttled=True))
+                    alternate = None
+        raise first_error
+    finally:
+        # Незавершённые попытки (например, при исключении в этом потоке) тоже
+        # закрываются, а не дорабатывают в фоне.
+        for future, (_, cancel) in attempts.items():
+            if not future.done():
+                cancel.cancel()
+        pool.shutdown(wait=False)
+
+
+def _compare_chunk_or_repair(
+    chunk_items: list[dict],
+    chunk_index: int,
+    chunk_count: int,
+    context: _RunContext,
+    provider: _LlmProvider,
+) -> dict:
+    try:
+        return _compare_chunk_hedged(chunk_items, context, provider)
+    except CompareParseError as exc:
+        logger.warning(
+            "compare_json: chunk %d/%d failed to parse, attempting repair: %s",
+            chunk_index + 1, chunk_count, exc,
+            extra={"step": "compare_json_chunk_repair"},
+        )
+        try:
+            return _repair_json(
+                exc.raw, context.prompt.get("schema", {}), exc.provider or provider
+            )
+        except Exception:
+            logger.error(
+                "compare_json: chunk %d/%d repair also failed; %d items in this chunk "
+                "will be replaced with empty comparisons",
+                chunk_index + 1, chunk_count, len(chunk_items),
+                exc_info=True,
+                extra={"step": "compare_json_chunk_repair_failed"},
+            )
+            return {"comparisons": [], "summary": ""}
+
+
+# Поля строки сравнения, которые формирует сама модель. Всё остальное
+# (значения, изделие, evidence) восстанавливается из исходного item, поэтому
+# для повторного использования вердикта достаточно хранить только их.
+_VERDICT_FIELDS = ("tz_quote", "passport_quote", "is_match", "note")
+
+
+def _item_fingerprint(item: dict[str, Any]) -> str:
+    """Стабильный отпечаток строки сравнения: изделие, нормализованный ключ
+    характеристики, значение ТЗ и значения кандидатов паспорта. Ссылки и bbox
+    в отпечаток не входят — на вердикт модели они не влияют, а пересчитываются
+    при каждом извлечении."""
+    candidates = item.get("passport_value_candidates") or []
+    payload = {
+        "product_name": item.get("product_name"),
+        "characteristic": _normalize_char_name(item.get("characteristic")),
+        "tz_value": item.get("tz_value"),
+        "passport_value": item.get("passport_value"),
+        "passport_candidates": [
+            candidate.get("value") for candidate in candidates if isinstance(candidate, dict)
+        ],
+    }
+    return hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _verdict_memo_version(context: _RunContext) -> str | None:
+    """Версия промпта для запомненных вердиктов: смена промпта или его схемы
+    должна обесценить всё, что модель отвечала по старому промпту. None —
+    инкрементальный режим выключен."""
+    if not settings.COMPARE_INCREMENTAL:
+        return None
+    return verdict_memo.prompt_version(context.prompt)
+
+
+def _canonical_units(attributes: list[dict[str, Any]]) -> dict[str, str]:
+    """Единица измерения канонического атрибута Knowledge Base по любому его
+    названию (имя, normalized_name, синонимы) — ключи в виде
+    _normalize_char_name, как у строк сравнения."""
+    units: dict[str, str] = {}
+    for attribute in attributes:
+        unit = attribute.get("unit")
+        if not isinstance(unit, str) or not unit.strip():
+            continue
+        names = [attribute.get("name"), attribute.get("normalized_name")]
+        names.extend(attribute.get("synonyms") or [])
+        for name in names:
+            if isinstance(name, str) and name.strip():
+                units.setdefault(_normalize_char_name(name), unit.strip())
+    return units
+
+
+def _rule_verdict(item: dict[str, Any], canonical_units: dict[str, str]) -> dict | None:
+    """Вердикт детерминированных правил (app/services/value_rules.py) в формате
+    ответа модели или None, если строку должна решать LLM."""
+    characteristic = item.get("characteristic")
+    canonical_unit = canonical_units.get(_normalize_char_name(characteristic))
+    candidates = [
+        candidate
+        for candidate in item.get("passport_value_candidates") or []
+        if isinstance(candidate, dict) and candidate.get("value") is not None
+    ]
+    passport_values = [candidate.get("value") for candidate in candidates]
+    if not passport_values and item.get("passport_value") is not None:
+        passport_values = [item.get("passport_value")]
+    verdict = decide_by_rules(
+        item.get("tz_value"),
+        passport_values,
+        tz_default_unit=unit_from_name(characteristic) or canonical_unit,
+        passport_default_unit=(
+            unit_from_name(candidates[0].get("name")) if candidates else None
+        ) or unit_from_name(characteristic) or canonical_unit,
+    )
+    if verdict is None or verdict.confidence < settings.COMPARE_RULES_MIN_CONFIDENCE:
+        return None
+    return {
+        "tz_quote": None,
+        "passport_quote": None,
+        "is_match": verdict.is_match,
+        "note": verdict.note,
+        "rule_confidence": verdict.confidence,
+    }
+
+
+def _notify(hook: Callable[..., None] | None, step: str, *args: Any) -> None:
+    """Вызывает хук прогресса. Хуки только информируют UI, поэтому их сбой не
+    должен ронять сравнение — итоговый callback всё равно доставит результат."""
+    if hook is None:
+        return
+    try:
+        hook(*args)
+    except Exception:
+        logger.warning(
+            "compare_json: %s hook failed", step, exc_info=True, extra={"step": step},
+        )
+
+
+class _Progress:
+    """Счётчик готовых строк сравнения; о каждом продвижении сообщает
+    ``on_progress(completed, total)``. Chunk'и завершаются в разных потоках."""
+
+    def __init__(
+        self, total: int, on_progress: Callable[[int, int], None] | None
+    ) -> None:
+        self.total = total
+        self.completed = 0
+        self._on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def advance(self, count: int) -> None:
+        with self._lock:
+            self.completed = min(self.total, self.completed + count)
+            completed = self.completed
+        _notify(self._on_progress, "compare_json_progress", completed, self.total)
+
+
+def _run_chunk(
+    chunk_items: list[dict],
+    chunk_fingerprints: list[str],
+    chunk_positions: list[int],
+    chunk_index: int,
+    chunk_count: int,
+    context: _RunContext,
+    provider: _LlmProvider,
+    job_id: str | None,
+    progress: _Progress,
+    on_rows: Callable[[int, list[dict]], None] | None,
+) -> tuple[list[dict | None], str | None]:
+    """Сравнивает chunk, сразу сохраняет чекпоинт и отдаёт готовые строки в
+    ``on_rows``. Возвращает (сравнения по позициям строк chunk'а, summary)."""
+    result = _compare_chunk_or_repair(
+        chunk_items, chunk_index, chunk_count, context, provider
+    )
+    comparisons = result.get("comparisons", [])
+    if not isinstance(comparisons, list):
+        comparisons = []
+    aligned = _align_comparisons(comparisons, len(chunk_items))
+    summary = result.get("summary")
+    summary = summary.strip() if isinstance(summary, str) and summary.strip() else None
+    if job_id is not None:
+        # Как и в memo, сохраняем только то, что модель действительно вернула.
+        checkpoints.save(
+            job_id,
+            chunk_index,
+            {
+                fingerprint: {field: comparison.get(field) for field in _VERDICT_FIELDS}
+                for fingerprint, comparison in zip(chunk_fingerprints, aligned)
+                if comparison is not None
+            },
+            summary,
+        )
+    if on_rows is not None:
+        # Номер 0 занят строками, решёнными без LLM (см. compare_json).
+        _notify(on_rows, "compare_json_partial", chunk_index + 1, [
+            _finalize_comparison(item, dict(comparison), fingerprint, position)
+            for item, fingerprint, position, comparison in zip(
+                chunk_items, chunk_fingerprints, chunk_positions, aligned
+            )
+            if comparison is not None
+        ])
+    progress.advance(len(chunk_items))
+    return aligned, summary
+
+
+def _finalize_comparison(
+    item: dict[str, Any], comparison: dict[str, Any], fingerprint: str, position: int
+) -> dict[str, Any]:
+    # Всегда восстанавливаем поля из оригинала — LLM не должна их переименовывать
+    comparison["characteristic"] = item.get("characteristic") or (
+        f"{item.get('product_name')} — {item.get('characteristic')}"
+    )
+    comparison["tz_value"] = item.get("tz_value")
+    comparison["passport_value"] = item.get("passport_value")
+    # Изделие паспорта и признак «это модель, которую запросил
+    # пользователь» — берём из исходного item, LLM их не формирует.
+    # По ним UI группирует строки и по умолчанию показывает только
+    # целевую модель (плюс «Общее»).
+    comparison["product_name"] = item.get("product_name")
+    comparison["is_target_model"] = item.get("is_target_model", True)
+    comparison["item_fingerprint"] = fingerprint
+    # Место строки в результате: частичные порции приходят в gateway в
+    # порядке готовности chunk'ов, а таблица и сопоставление повторяющихся
+    # характеристик при слиянии опираются на исходный порядок строк.
+    comparison["position"] = position
+    # Если значения однозначно совпадают, всегда ставим is_match=True,
+    # независимо от того, что вернула LLM
+    if _values_clearly_match(item.get("tz_value"), item.get("passport_value")):
+        comparison["is_match"] = True
+    # LLM иногда пишет note вида «характеристика отсутствует в паспорте»,
+    # хотя passport_value/tz_value в этой же строке непустые (взяты из
+    # извлечения документа, а не от LLM) — такой note противоречит данным
+    # и вводит пользователя в заблуждение, поэтому убираем его.
+    if _note_contradicts_value(
+        comparison.get("note"), item.get("passport_value"), item.get("tz_value")
+    ):
+        comparison["note"] = None
+    return _attach_evidence_to_comparison(item, comparison)
 
 
 def compare_json(
-    tz_data: dict, passport_data: dict, extraction_backend: str | None = None
+    tz_data: dict,
+    passport_data: dict,
+    extraction_backend: str | None = None,
+    *,
+    job_id: str | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
+    on_rows: Callable[[int, list[dict]], None] | None = None,
 ) -> dict:
+    """Сравнивает характеристики ТЗ и паспорта.
+
+    ``job_id`` включает чекпоинты chunk'ов (app/services/checkpoints.py):
+    повтор той же задачи не переспрашивает модель о строках, уже сравнённых
+    прошлой попыткой. ``on_progress(completed, total)`` вызывается по мере
+    готовности строк, ``on_rows(sequence, comparisons)`` — с готовыми строками:
+    номер 0 — строки, решённые без LLM (memo, правила), дальше —
+    номер chunk'а + 1. Номера стабильны между повторами задачи, поэтому
+    получатель может по ним отбрасывать уже принятые порции."""
     started_at = time.monotonic()
     items = _build_comparison_items(tz_data, passport_data)
     logger.info(
@@ -1172,100 +1885,153 @@ def compare_json(
             "comparisons": [],
         }
 
-    chunk_size = settings.COMPARE_CHUNK_SIZE
-    chunks = _chunk(items, chunk_size)
+    provider = _resolve_llm_provider(extraction_backend)
+    context = _load_run_context()
+    fingerprints = [_item_fingerprint(item) for item in items]
+
+    restored = checkpoints.load(job_id) if job_id is not None else None
+    checkpoint_verdicts: dict[int, dict] = {}
+    if restored is not None and restored.verdicts:
+        for index, fingerprint in enumerate(fingerprints):
+            verdict = restored.verdicts.get(fingerprint)
+            if verdict is not None:
+                checkpoint_verdicts[index] = verdict
+        logger.info(
+            "compare_json: resuming from %d checkpointed item(s)", len(checkpoint_verdicts),
+            extra={"step": "compare_checkpoint"},
+        )
+
+    memo_version = _verdict_memo_version(context)
+    memo_verdicts: dict[int, dict] = {}
+    if memo_version is not None:
+        remembered = verdict_memo.load(
+            provider.model,
+            memo_version,
+            [
+                fingerprint for index, fingerprint in enumerate(fingerprints)
+                if index not in checkpoint_verdicts
+            ],
+        )
+        for index, fingerprint in enumerate(fingerprints):
+            verdict = remembered.get(fingerprint)
+            if verdict is not None and index not in checkpoint_verdicts:
+                memo_verdicts[index] = verdict
+    pending = [
+        index for index in range(len(items))
+        if index not in memo_verdicts and index not in checkpoint_verdicts
+    ]
+    if memo_verdicts:
+        logger.info(
+            "compare_json: reusing %d memoized verdict(s), %d item(s) left",
+            len(memo_verdicts), len(pending),
+            extra={"step": "compare_json_memo"},
+        )
+
+    rule_verdicts: dict[int, dict] = {}
+    if settings.COMPARE_RULES_ENABLED and pending:
+        canonical_units = _canonical_units(context.canonical_attributes)
+        for index in pending:
+            verdict = _rule_verdict(items[index], canonical_units)
+            if verdict is not None:
+                rule_verdicts[index] = verdict
+        pending = [index for index in pending if index not in rule_verdicts]
+        logger.info(
+            "compare_json: rules decided %d item(s) locally, %d item(s) go to the LLM",
+            len(rule_verdicts), len(pending),
+            extra={"step": "compare_json_rules"},
+        )
+
+    chunks = plan_chunks(
+        pending,
+        [estimate_tokens(_wire_item(0, item)) for item in items],
+        [item.get("product_name") for item in items],
+        provider_name=provider.name,
+        input_budget=provider.input_token_budget,
+        output_budget=provider.output_token_budget,
+    )
     logger.info(
-        "compare_json: split into %d chunk(s) of size<=%d", len(chunks), chunk_size,
+        "compare_json: split into %d chunk(s), up to %d in parallel via %s",
+        len(chunks), provider.concurrency, provider.name,
         extra={"step": "compare_json_chunks"},
     )
 
-    all_comparisons: list[dict] = []
-    summaries: list[str] = []
-    debug_chunk: dict | None = None
-
-    for chunk_index, chunk_items in enumerate(chunks):
-        if not chunk_items:
-            continue
-        try:
-            result = _compare_chunk(chunk_items, extraction_backend)
-        except CompareParseError as exc:
-            logger.warning(
-                "compare_json: chunk %d/%d failed to parse, attempting repair: %s",
-                chunk_index + 1, len(chunks), exc,
-                extra={"step": "compare_json_chunk_repair"},
+    progress = _Progress(len(items), on_progress)
+    # Строки из чекпоинтов уже отданы прошлой попыткой под номерами своих
+    # chunk'ов — повторно их не шлём.
+    precomputed = {**memo_verdicts, **rule_verdicts}
+    if on_rows is not None and precomputed:
+        _notify(on_rows, "compare_json_partial", 0, [
+            _finalize_comparison(
+                items[index], dict(precomputed[index]), fingerprints[index], index
             )
-            try:
-                result = _repair_json(
-                    exc.raw, _get_prompt().get("schema", {}), extraction_backend
-                )
-            except Exception:
-                logger.error(
-                    "compare_json: chunk %d/%d repair also failed; %d items in this chunk "
-                    "will be replaced with empty comparisons",
-                    chunk_index + 1, len(chunks), len(chunk_items),
-                    exc_info=True,
-                    extra={"step": "compare_json_chunk_repair_failed"},
-                )
-                result = {"comparisons": [], "summary": ""}
-
-        comparisons = result.get("comparisons", [])
-        if not isinstance(comparisons, list):
-            comparisons = []
-
-        if len(comparisons) < len(chunk_items):
-            for missing_item in chunk_items[len(comparisons) :]:
-                comparisons.append(
-                    {
-                        "characteristic": missing_item.get("characteristic", ""),
-                        "tz_value": missing_item.get("tz_value"),
-                        "passport_value": missing_item.get("passport_value"),
-                        "tz_quote": None,
-                        "passport_quote": None,
-                        "is_match": False,
-                        "note": "Сравнение не было возвращено моделью.",
-                    }
-                )
-        if len(comparisons) > len(chunk_items):
-            comparisons = comparisons[: len(chunk_items)]
-
-        for idx, item in enumerate(chunk_items):
-            # Всегда восстанавливаем поля из оригинала — LLM не должна их переименовывать
-            comparisons[idx]["characteristic"] = item.get("characteristic") or (
-                f"{item.get('product_name')} — {item.get('characteristic')}"
+            for index in sorted(precomputed)
+        ])
+    progress.advance(len(items) - len(pending))
+    # Номера chunk'ов повтора продолжают сохранённые прошлой попыткой.
+    first_chunk_index = restored.next_chunk_index if restored is not None else 0
+    results = run_ordered(
+        [
+            partial(
+                _run_chunk,
+                [items[index] for index in chunk_indices],
+                [fingerprints[index] for index in chunk_indices],
+                chunk_indices,
+                first_chunk_index + chunk_index, first_chunk_index + len(chunks),
+                context, provider, job_id, progress, on_rows,
             )
-            comparisons[idx]["tz_value"] = item.get("tz_value")
-            comparisons[idx]["passport_value"] = item.get("passport_value")
-            # Изделие паспорта и признак «это модель, которую запросил
-            # пользователь» — берём из исходного item, LLM их не формирует.
-            # По ним UI группирует строки и по умолчанию показывает только
-            # целевую модель (плюс «Общее»).
-            comparisons[idx]["product_name"] = item.get("product_name")
-            comparisons[idx]["is_target_model"] = item.get("is_target_model", True)
-            # Если значения однозначно совпадают, всегда ставим is_match=True,
-            # независимо от того, что вернула LLM
-            if _values_clearly_match(item.get("tz_value"), item.get("passport_value")):
-                comparisons[idx]["is_match"] = True
-            # LLM иногда пишет note вида «характеристика отсутствует в паспорте»,
-            # хотя passport_value/tz_value в этой же строке непустые (взяты из
-            # извлечения документа, а не от LLM) — такой note противоречит данным
-            # и вводит пользователя в заблуждение, поэтому убираем его.
-            if _note_contradicts_value(
-                comparisons[idx].get("note"), item.get("passport_value"), item.get("tz_value")
-            ):
-                comparisons[idx]["note"] = None
-            comparisons[idx] = _attach_evidence_to_comparison(item, comparisons[idx])
-        all_comparisons.extend(comparisons)
-        if debug_chunk is None:
-            debug_chunk = {
-                "input_items": chunk_items,
-                "comparisons": comparisons,
-            }
-        delay_seconds = settings.COMPARE_CHUNK_DELAY_SECONDS
-        if delay_seconds and delay_seconds > 0:
-            time.sleep(delay_seconds)
-        summary = result.get("summary")
-        if isinstance(summary, str) and summary.strip():
-            summaries.append(summary.strip())
+            for chunk_index, chunk_indices in enumerate(chunks)
+        ],
+        provider_name=provider.name,
+        max_workers=provider.concurrency,
+    )
+
+    raw_comparisons: dict[int, dict] = {
+        index: dict(verdict)
+        for index, verdict in {**memo_verdicts, **checkpoint_verdicts}.items()
+    }
+    raw_comparisons.update(rule_verdicts)
+    summaries: list[str] = list(restored.summaries) if restored is not None else []
+
+    # Слияние — строго в исходном порядке chunk'ов: run_ordered возвращает
+    # результаты по позициям, как бы ни завершались запросы.
+    new_verdicts: dict[str, dict] = {}
+    for chunk_indices, (aligned, summary) in zip(chunks, results):
+        for position, index in enumerate(chunk_indices):
+            comparison = aligned[position]
+            if comparison is None:
+                missing_item = items[index]
+                raw_comparisons[index] = {
+                    "characteristic": missing_item.get("characteristic", ""),
+                    "tz_value": missing_item.get("tz_value"),
+                    "passport_value": missing_item.get("passport_value"),
+                    "tz_quote": None,
+                    "passport_quote": None,
+                    "is_match": False,
+                    "note": "Сравнение не было возвращено моделью.",
+                }
+                continue
+            raw_comparisons[index] = comparison
+            # Запоминаем только то, что модель действительно вернула: заглушку
+            # «не было возвращено» надо при следующем запуске спросить заново.
+            if memo_version is not None:
+                new_verdicts[fingerprints[index]] = {
+                    field: comparison.get(field) for field in _VERDICT_FIELDS
+                }
+        if summary:
+            summaries.append(summary)
+    if memo_version is not None:
+        verdict_memo.save(provider.model, memo_version, new_verdicts)
+
+    all_comparisons = [
+        _finalize_comparison(item, raw_comparisons[index], fingerprints[index], index)
+        for index, item in enumerate(items)
+    ]
+    debug_chunk: dict | None = None
+    if chunks:
+        debug_chunk = {
+            "input_items": [items[index] for index in chunks[0]],
+            "comparisons": [all_comparisons[index] for index in chunks[0]],
+        }
 
     match_value = all(
         item.get("is_match") is True for item in all_comparisons
@@ -1280,8 +2046,10 @@ def compare_json(
     if debug_chunk is not None:
         result_payload["debug_chunk"] = debug_chunk
     logger.info(
-        "compare_json finished in %.2fs: comparisons=%d mismatches=%d match=%s",
+        "compare_json finished in %.2fs: comparisons=%d mismatches=%d match=%s "
+        "memoized=%d by_rules=%d checkpointed=%d",
         time.monotonic() - started_at, len(all_comparisons), len(mismatches), match_value,
+        len(memo_verdicts), len(rule_verdicts), len(checkpoint_verdicts),
         extra={"step": "compare_json_finished"},
     )
     return result_payload
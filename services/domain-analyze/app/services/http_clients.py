@@ -0,0 +1,133 @@
+"""Общие HTTP-клиенты процесса с keep-alive пулами соединений.
+
+Раньше каждый chunk сравнения, каждый запрос промпта и каждый запрос к
+Knowledge Base открывали свой httpx.Client — а значит, новое TCP (и TLS для
+LLM-провайдера) соединение на каждый вызов. Здесь один клиент на базовый URL
+живёт весь процесс воркера: соединения переиспользуются, к провайдерам LLM по
+HTTPS идём по HTTP/2, если он поддерживается.
+
+httpx.Client потокобезопасен, поэтому один клиент обслуживает и параллельные
+chunk'и из llm_dispatch. Воркер Celery создаёт клиентов при старте процесса
+(init_clients) и закрывает при остановке (close_clients); в остальных
+процессах клиент создаётся лениво при первом обращении.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolStats:
+    """Сколько запросов ушло через клиент и сколько из них открыли новое
+    соединение: разница — переиспользованные keep-alive соединения."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        # trace-расширение httpcore сообщает о каждом шаге запроса, в т.ч. об
+        # установке нового TCP-соединения — по нему и считаем reuse.
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event_name: str, info: dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+    def snapshot(self) -> tuple[int, int]:
+        with self._lock:
+            return self.requests, self.new_connections
+
+
+_clients: dict[str, httpx.Client] = {}
+_stats: dict[str, _PoolStats] = {}
+_lock = threading.Lock()
+
+
+def _client_key(base_url: str) -> str:
+    return base_url.rstrip("/")
+
+
+def get_client(base_url: str) -> httpx.Client:
+    """Клиент для ``base_url``. Таймаут задаётся на каждом запросе: к одному
+    сервису ходят с разными ожиданиями (prompt-registry vs chunk сравнения)."""
+    key = _client_key(base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            stats = _PoolStats()
+            client = httpx.Client(
+                base_url=key,
+                http2=settings.HTTP2_ENABLED and key.startswith("https://"),
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=settings.REQUEST_TIMEOUT_SECONDS,
+                event_hooks={"request": [stats.on_request]},
+            )
+            _clients[key] = client
+            _stats[key] = stats
+        return client
+
+
+def _known_base_urls() -> list[str]:
+    urls = [
+        settings.PROMPT_REGISTRY_URL,
+        settings.KNOWLEDGE_BASE_URL,
+        settings.API_GATEWAY_URL,
+        settings.OPENROUTER_BASE_URL,
+    ]
+    if settings.YANDEX_API_KEY:
+        urls.append(settings.YANDEX_BASE_URL)
+    return [url for url in urls if url]
+
+
+def init_clients() -> None:
+    for base_url in _known_base_urls():
+        get_client(base_url)
+    logger.info(
+        "http_clients: initialised %d pooled client(s)", len(_clients),
+        extra={"step": "http_clients_init"},
+    )
+
+
+def log_pool_stats() -> None:
+    for key, stats in list(_stats.items()):
+        requests, new_connections = stats.snapshot()
+        if not requests:
+            continue
+        logger.info(
+            "http_clients: %s requests=%d new_connections=%d reused=%d",
+            key, requests, new_connections, max(0, requests - new_connections),
+            extra={"step": "http_clients_stats"},
+        )
+
+
+def close_clients() -> None:
+    log_pool_stats()
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _stats.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            logger.warning("http_clients: failed to close client", exc_info=True)
@@ -0,0 +1,84 @@
+"""Инкрементальный разбор ответа сравнения, приходящего потоком.
+
+Ответ модели — объект вида {"match": ..., "summary": ..., "comparisons": [...]}.
+При потоковой выдаче он приходит кусками по несколько символов; парсер
+дописывает их в буфер и отдаёт каждый элемент массива comparisons, как только
+его объект закрылся. Если поток оборвался, уже полученные элементы остаются —
+перезапрашивать нужно только хвост chunk'а.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+_ARRAY_KEY_RE = re.compile(r'"comparisons"\s*:\s*\[')
+
+
+class ComparisonStreamParser:
+    def __init__(self) -> None:
+        self._buffer = ""
+        # Позиция, с которой продолжать сканирование, и состояние сканера.
+        self._pos = 0
+        self._array_found = False
+        self._array_closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start: int | None = None
+        self.comparisons: list[dict[str, Any]] = []
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, chunk: str) -> list[dict[str, Any]]:
+        """Добавляет очередной кусок текста и возвращает элементы comparisons,
+        завершённые этим куском."""
+        self._buffer += chunk
+        if self._array_closed:
+            return []
+        if not self._array_found:
+            match = _ARRAY_KEY_RE.search(self._buffer)
+            if match is None:
+                return []
+            self._array_found = True
+            self._pos = match.end()
+
+        completed: list[dict[str, Any]] = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        item = json.loads(buffer[self._object_start : pos + 1])
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self._object_start = None
+            elif char == "]" and self._depth == 0:
+                self._array_closed = True
+                pos += 1
+                break
+            pos += 1
+        self._pos = pos
+        self.comparisons.extend(completed)
+        return completed
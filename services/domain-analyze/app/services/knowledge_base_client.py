@@ -2,14 +2,16 @@ from __future__ import annotations
 
 from typing import Any
 
-import httpx
-
 from app.core.config import settings
+from app.services.http_clients import get_client
 
 
 def _get(path: str, *, params: dict[str, Any] | None = None) -> Any:
-    with httpx.Client(timeout=settings.KNOWLEDGE_BASE_TIMEOUT_SECONDS) as client:
-        response = client.get(f"{settings.KNOWLEDGE_BASE_URL.rstrip('/')}{path}", params=params)
+    response = get_client(settings.KNOWLEDGE_BASE_URL).get(
+        f"{settings.KNOWLEDGE_BASE_URL.rstrip('/')}{path}",
+        params=params,
+        timeout=settings.KNOWLEDGE_BASE_TIMEOUT_SECONDS,
+    )
     response.raise_for_status()
     return response.json()
 
@@ -27,3 +29,9 @@ def search_knowledge(query: str, *, limit: int = 5) -> list[dict[str, Any]]:
     if isinstance(payload, dict) and isinstance(payload.get("results"), list):
         return payload["results"]
     return []
+
+
+def get_knowledge_version() -> str | None:
+    payload = _get("/version", params={"project_key": "technical_compliance"})
+    version = payload.get("version") if isinstance(payload, dict) else None
+    return version if isinstance(version, str) and version else None
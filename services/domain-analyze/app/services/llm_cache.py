@@ -0,0 +1,173 @@
+"""Дисковый кэш ответов LLM для сравнения.
+
+Повторное сравнение (autoretry Celery, перезапуск после правки ревью ТЗ)
+отправляло в модель те же comparison_items и заново платило за каждый chunk
+минуты ожидания и токены. Ответ на один и тот же запрос детерминирован
+(temperature=0), поэтому его можно переиспользовать.
+
+Ключ — sha256 от (модель провайдера, system prompt вместе с приложением из
+Knowledge Base, user payload): любое изменение промпта, KB или входных данных
+даёт новый ключ, инвалидировать вручную ничего не нужно. Записи живут
+COMPARE_CACHE_TTL_SECONDS; при превышении COMPARE_CACHE_MAX_BYTES удаляются
+самые старые. Очистка обходит весь каталог, поэтому запускается не на каждую
+запись, а раз в COMPARE_CACHE_EVICT_INTERVAL_SECONDS или после
+COMPARE_CACHE_EVICT_WRITE_BYTES записанных процессом байт: кэш может
+ненадолго превысить лимит на эту величину. Каталог лежит на volume и общий для всех процессов воркера —
+запись идёт через временный файл и os.replace, поэтому читатель никогда не
+видит недописанный файл.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_evict_lock = threading.Lock()
+_state_lock = threading.Lock()
+# Момент последнего обхода (time.monotonic) и байты, записанные после него.
+# Счётчики на процесс: каталог общий, но каждому процессу достаточно следить
+# за своими записями.
+_last_evict_at: float | None = None
+_written_since_evict = 0
+
+
+def _cache_dir() -> Path | None:
+    if not settings.COMPARE_CACHE_ENABLED or not settings.COMPARE_CACHE_DIR:
+        return None
+    return Path(settings.COMPARE_CACHE_DIR)
+
+
+def cache_key(model: str, system_message: str, user_message: str) -> str:
+    digest = hashlib.sha256()
+    for part in (model, system_message, user_message):
+        encoded = part.encode("utf-8")
+        # Длина перед каждой частью — чтобы границы полей не «переезжали»
+        # и разные тройки не давали одинаковый поток байт.
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def _entry_path(root: Path, key: str) -> Path:
+    return root / key[:2] / f"{key}.json"
+
+
+def get(key: str) -> dict[str, Any] | None:
+    """Возвращает сохранённый ответ или None, если записи нет или она устарела."""
+    root = _cache_dir()
+    if root is None:
+        return None
+    path = _entry_path(root, key)
+    try:
+        with path.open("r", encoding="utf-8") as fh:
+            entry = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning("llm_cache: unreadable entry %s, ignoring", path, exc_info=True)
+        return None
+    created_at = entry.get("created_at") if isinstance(entry, dict) else None
+    if not isinstance(created_at, (int, float)) or (
+        time.time() - created_at > settings.COMPARE_CACHE_TTL_SECONDS
+    ):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        return None
+    value = entry.get("value")
+    return value if isinstance(value, dict) else None
+
+
+def put(key: str, value: dict[str, Any]) -> None:
+    """Сохраняет ответ. Ошибки записи не критичны для сравнения — только логируются."""
+    root = _cache_dir()
+    if root is None:
+        return
+    path = _entry_path(root, key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"created_at": time.time(), "value": value}, fh, ensure_ascii=False)
+                written = fh.tell()
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        logger.warning("llm_cache: failed to store entry %s", path, exc_info=True)
+        return
+    if _evict_due(written):
+        _evict(root)
+
+
+def _evict_due(written: int) -> bool:
+    """Учитывает запись и решает, пора ли обходить каталог. Первая запись
+    процесса обход запускает — кэш мог вырасти, пока процесс не работал."""
+    global _last_evict_at, _written_since_evict
+    now = time.monotonic()
+    with _state_lock:
+        _written_since_evict += written
+        if (
+            _last_evict_at is not None
+            and now - _last_evict_at < settings.COMPARE_CACHE_EVICT_INTERVAL_SECONDS
+            and _written_since_evict < settings.COMPARE_CACHE_EVICT_WRITE_BYTES
+        ):
+            return False
+        _last_evict_at = now
+        _written_since_evict = 0
+    return True
+
+
+def _evict(root: Path) -> None:
+    """Удаляет просроченные записи и, если кэш всё ещё больше лимита, — самые
+    старые, пока он не уложится в COMPARE_CACHE_MAX_BYTES."""
+    if not _evict_lock.acquire(blocking=False):
+        # Другой поток уже чистит кэш — второй проход ничего не добавит.
+        return
+    try:
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        total = 0
+        for path in root.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > settings.COMPARE_CACHE_TTL_SECONDS:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= settings.COMPARE_CACHE_MAX_BYTES:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= settings.COMPARE_CACHE_MAX_BYTES:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+    finally:
+        _evict_lock.release()
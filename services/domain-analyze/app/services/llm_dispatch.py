@@ -0,0 +1,153 @@
+"""Параллельная отправка chunk'ов сравнения в LLM.
+
+Раньше chunk'и шли строго по очереди с фиксированной паузой между ними: при
+ответе модели 36-172 сек паспорт на 300 характеристик сравнивался больше
+десяти минут. Здесь — ограниченный пул потоков (лимит параллельных запросов
+задаётся на провайдера) и token bucket вместо паузы: он выдерживает тот же
+средний темп запросов, но не заставляет ждать, пока предыдущий chunk ответит.
+
+Результаты возвращаются в исходном порядке chunk'ов — позиционное слияние в
+compare_json и debug_chunk на это опираются.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: не больше ``capacity`` запросов подряд,
+    дальше — один запрос раз в ``interval_seconds``."""
+
+    def __init__(self, interval_seconds: float, capacity: int) -> None:
+        self._interval = max(0.0, float(interval_seconds))
+        self._capacity = max(1, int(capacity))
+        self._tokens = float(self._capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Забирает один токен, при необходимости дожидаясь его. Возвращает,
+        сколько секунд пришлось ждать."""
+        if self._interval <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    float(self._capacity),
+                    self._tokens + (now - self._updated_at) / self._interval,
+                )
+                self._updated_at = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) * self._interval
+            time.sleep(delay)
+            waited += delay
+
+
+# Bucket общий для всех сравнений в процессе воркера: лимит провайдера
+# относится к ключу API, а не к отдельному анализу.
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket_for(provider_name: str) -> TokenBucket:
+    with _buckets_lock:
+        bucket = _buckets.get(provider_name)
+        if bucket is None:
+            bucket = TokenBucket(
+                settings.COMPARE_CHUNK_DELAY_SECONDS,
+                settings.COMPARE_RATE_LIMIT_BURST,
+            )
+            _buckets[provider_name] = bucket
+        return bucket
+
+
+def throttle(provider_name: str) -> float:
+    """Ждёт очередного токена в bucket'е провайдера. Нужен и вне run_ordered:
+    хеджирующий запрос уходит другому провайдеру и тратит его лимит."""
+    waited = _bucket_for(provider_name).acquire()
+    if waited > 0:
+        logger.debug(
+            "llm_dispatch: waited %.2fs for %s rate limit", waited, provider_name,
+            extra={"step": "compare_chunk_rate_limit"},
+        )
+    return waited
+
+
+_slots: dict[str, threading.BoundedSemaphore] = {}
+
+
+@contextmanager
+def provider_slot(provider_name: str, limit: int) -> Iterator[None]:
+    """Ограничивает число одновременных запросов провайдеру вне run_ordered
+    (хедж и failover) его лимитом параллельности: пул run_ordered считает
+    только запросы своего провайдера."""
+    with _buckets_lock:
+        slot = _slots.get(provider_name)
+        if slot is None:
+            slot = _slots.setdefault(provider_name, threading.BoundedSemaphore(max(1, int(limit))))
+    with slot:
+        yield
+
+
+class _Stopped(Exception):
+    """Вызов не начат: run_ordered уже завершился ошибкой другого вызова."""
+
+
+def run_ordered(
+    calls: Sequence[Callable[[], T]],
+    *,
+    provider_name: str,
+    max_workers: int,
+) -> list[T]:
+    """Выполняет ``calls`` не более чем в ``max_workers`` потоков, соблюдая
+    rate limit провайдера, и возвращает результаты в порядке ``calls``.
+
+    Первое же исключение пробрасывается вызывающему сразу, не дожидаясь
+    остальных: ещё не начатые вызовы отменяются, уже отправленные запросы
+    дорабатывают в фоне, и их результат отбрасывается."""
+    stopped = threading.Event()
+
+    def _run(call: Callable[[], T]) -> T:
+        throttle(provider_name)
+        # Пока вызов ждал токена, другой мог упасть — запрос уже не нужен.
+        if stopped.is_set():
+            raise _Stopped()
+        return call()
+
+    workers = max(1, min(int(max_workers), len(calls)))
+    if workers == 1:
+        return [_run(call) for call in calls]
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"compare-{provider_name}")
+    futures = [pool.submit(_run, call) for call in calls]
+    try:
+        wait(futures, return_when=FIRST_EXCEPTION)
+        # Если к этому моменту упало несколько вызовов, наверх уходит ошибка
+        # самого раннего из них.
+        for future in futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        results = [future.result() for future in futures]
+    except BaseException:
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return results
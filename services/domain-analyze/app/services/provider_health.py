@@ -0,0 +1,184 @@
+"""Здоровье LLM-провайдеров: circuit breaker и задержки ответов.
+
+Circuit breaker общий для всех процессов воркера и хранится в Postgres
+(таблица llm_provider_circuits): если провайдер подряд
+CIRCUIT_FAILURE_THRESHOLD раз ответил ошибкой, на CIRCUIT_OPEN_SECONDS он
+исключается, и chunk'и сразу уходят второму провайдеру — вместо того чтобы
+каждый процесс заново ждал таймаут. Потом пропускается ровно один пробный
+запрос (его забирает тот процесс, чей UPDATE сработал первым): успех
+закрывает circuit, ошибка снова открывает его.
+
+Недоступность самой базы не должна останавливать сравнение, поэтому при
+ошибке базы breaker считается закрытым, и следующие
+DOMAIN_ANALYZE_DB_RETRY_SECONDS процесс к ней не обращается: иначе каждый
+chunk ждал бы таймаута соединения по нескольку раз.
+
+Задержки считаются в памяти процесса — по окну последних
+COMPARE_HEDGE_WINDOW ответов провайдера; по их перцентилю compare_service
+решает, когда отправлять хеджирующий запрос.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, case, literal, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.models import ProviderCircuit
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# До какого момента (time.monotonic) база считается недоступной.
+_db_unavailable_until = 0.0
+
+
+def _db_available() -> bool:
+    return time.monotonic() >= _db_unavailable_until
+
+
+def _db_failed() -> None:
+    global _db_unavailable_until
+    _db_unavailable_until = time.monotonic() + settings.DOMAIN_ANALYZE_DB_RETRY_SECONDS
+
+
+def allow_request(provider_name: str) -> bool:
+    """Можно ли сейчас отправлять запрос провайдеру."""
+    if not _db_available():
+        return True
+    now = _now()
+    try:
+        with SessionLocal() as db:
+            circuit = db.get(ProviderCircuit, provider_name)
+            if circuit is None or circuit.opened_until is None:
+                return True
+            if circuit.opened_until > now:
+                return False
+            # Half-open: пробный запрос достаётся одному процессу, остальные
+            # видят продлённый opened_until и ждут его результата.
+            claimed = db.execute(
+                update(ProviderCircuit)
+                .where(
+                    ProviderCircuit.provider == provider_name,
+                    ProviderCircuit.opened_until <= now,
+                )
+                .values(
+                    opened_until=now + timedelta(seconds=settings.CIRCUIT_OPEN_SECONDS),
+                    updated_at=now,
+                )
+            ).rowcount
+            db.commit()
+    except Exception:
+        _db_failed()
+        logger.warning(
+            "provider_health: circuit state unavailable for %s, allowing request",
+            provider_name,
+            exc_info=True,
+            extra={"step": "provider_circuit"},
+        )
+        return True
+    if claimed:
+        logger.info(
+            "provider_health: %s circuit half-open, sending a probe request",
+            provider_name,
+            extra={"step": "provider_circuit"},
+        )
+    return bool(claimed)
+
+
+def record_success(provider_name: str) -> None:
+    _save(provider_name, success=True)
+
+
+def record_failure(provider_name: str) -> None:
+    _save(provider_name, success=False)
+
+
+def _save(provider_name: str, *, success: bool) -> None:
+    if not _db_available():
+        return
+    now = _now()
+    if success:
+        values = {"consecutive_failures": 0, "opened_until": None, "updated_at": now}
+        statement = insert(ProviderCircuit).values(provider=provider_name, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProviderCircuit.provider], set_=values
+        )
+    else:
+        failures = ProviderCircuit.consecutive_failures + 1
+        statement = insert(ProviderCircuit).values(
+            provider=provider_name, consecutive_failures=1, opened_until=None, updated_at=now
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProviderCircuit.provider],
+            set_={
+                "consecutive_failures": failures,
+                "opened_until": case(
+                    (
+                        failures >= settings.CIRCUIT_FAILURE_THRESHOLD,
+                        literal(
+                            now + timedelta(seconds=settings.CIRCUIT_OPEN_SECONDS),
+                            DateTime(timezone=True),
+                        ),
+                    ),
+                    else_=None,
+                ),
+                "updated_at": now,
+            },
+        ).returning(ProviderCircuit.consecutive_failures)
+    try:
+        with SessionLocal() as db:
+            result = db.execute(statement)
+            failures_now = None if success else result.scalar()
+            db.commit()
+    except Exception:
+        _db_failed()
+        logger.warning(
+            "provider_health: failed to record %s for %s",
+            "success" if success else "failure", provider_name,
+            exc_info=True,
+            extra={"step": "provider_circuit"},
+        )
+        return
+    if failures_now is not None and failures_now >= settings.CIRCUIT_FAILURE_THRESHOLD:
+        logger.warning(
+            "provider_health: %s failed %d time(s) in a row, circuit open for %ds",
+            provider_name, failures_now, settings.CIRCUIT_OPEN_SECONDS,
+            extra={"step": "provider_circuit"},
+        )
+
+
+_latencies: dict[str, deque[float]] = {}
+_latencies_lock = threading.Lock()
+
+
+def record_latency(provider_name: str, seconds: float) -> None:
+    with _latencies_lock:
+        window = _latencies.get(provider_name)
+        if window is None:
+            window = _latencies.setdefault(
+                provider_name, deque(maxlen=max(1, settings.COMPARE_HEDGE_WINDOW))
+            )
+        window.append(seconds)
+
+
+def hedge_delay(provider_name: str) -> float:
+    """Через сколько секунд ожидания ответа стоит хеджировать запрос."""
+    with _latencies_lock:
+        samples = sorted(_latencies.get(provider_name) or ())
+    if len(samples) < settings.COMPARE_HEDGE_MIN_SAMPLES:
+        return settings.COMPARE_HEDGE_DEFAULT_DELAY_SECONDS
+    rank = math.ceil(settings.COMPARE_HEDGE_PERCENTILE * len(samples)) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
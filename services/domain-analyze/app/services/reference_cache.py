@@ -0,0 +1,144 @@
+"""Кэш справочных данных воркера: промпт сравнения и Knowledge Base.
+
+Раньше каждый chunk сравнения заново запрашивал промпт у prompt-registry,
+канонические атрибуты и поиск у Knowledge Base, хотя за время анализа (и
+между анализами) они почти никогда не меняются. Здесь они живут в памяти
+процесса воркера:
+
+- промпт — PROMPT_CACHE_TTL_SECONDS, после чего перепроверяется запросом с
+  If-None-Match: неизменившийся промпт prompt-registry отдаёт пустым 304;
+- данные Knowledge Base привязаны к её версии (GET /version), которая сама
+  перепроверяется раз в KB_VERSION_TTL_SECONDS. Правка атрибутов или
+  источников меняет версию, и кэш по старой версии перестаёт использоваться.
+
+Если prompt-registry недоступен, отдаётся последний известный промпт. Если
+Knowledge Base не отдаёт версию (старый деплой, сбой), данные берутся
+напрямую, без кэша — как до его появления.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+from app.services.http_clients import get_client
+from app.services.knowledge_base_client import (
+    get_knowledge_version,
+    list_canonical_attributes,
+    search_knowledge,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _PromptEntry:
+    def __init__(self, payload: dict, etag: str | None, checked_at: float) -> None:
+        self.payload = payload
+        self.etag = etag
+        self.checked_at = checked_at
+
+
+_prompts: dict[str, _PromptEntry] = {}
+_kb_version: tuple[str | None, float] | None = None
+_attributes: tuple[str, list[dict[str, Any]]] | None = None
+_search: OrderedDict[tuple[str, str, int], list[dict[str, Any]]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_prompt(file_type: str) -> dict:
+    now = time.monotonic()
+    with _lock:
+        entry = _prompts.get(file_type)
+    if entry is not None and now - entry.checked_at < settings.PROMPT_CACHE_TTL_SECONDS:
+        return entry.payload
+
+    headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+    try:
+        resp = get_client(settings.PROMPT_REGISTRY_URL).get(
+            f"{settings.PROMPT_REGISTRY_URL}/prompts/{file_type}",
+            headers=headers,
+            timeout=settings.REQUEST_TIMEOUT_SECONDS,
+        )
+        if resp.status_code == 304 and entry is not None:
+            with _lock:
+                entry.checked_at = now
+            return entry.payload
+        resp.raise_for_status()
+        payload = resp.json()
+    except Exception:
+        if entry is None:
+            raise
+        logger.warning(
+            "reference_cache: prompt-registry unavailable, using cached %r prompt",
+            file_type,
+            exc_info=True,
+            extra={"step": "reference_cache_prompt"},
+        )
+        return entry.payload
+
+    with _lock:
+        _prompts[file_type] = _PromptEntry(payload, resp.headers.get("ETag"), now)
+    logger.info(
+        "reference_cache: %r prompt %s",
+        file_type, "loaded" if entry is None else "changed, reloaded",
+        extra={"step": "reference_cache_prompt", "cache_hit": False},
+    )
+    return payload
+
+
+def knowledge_version() -> str | None:
+    """Текущая версия данных Knowledge Base или None, если её не узнать."""
+    global _kb_version
+    now = time.monotonic()
+    with _lock:
+        cached = _kb_version
+    if cached is not None and now - cached[1] < settings.KB_VERSION_TTL_SECONDS:
+        return cached[0]
+    try:
+        version = get_knowledge_version()
+    except Exception:
+        logger.warning(
+            "reference_cache: failed to fetch knowledge-base version, caching disabled",
+            exc_info=True,
+            extra={"step": "reference_cache_kb"},
+        )
+        version = None
+    with _lock:
+        _kb_version = (version, now)
+    return version
+
+
+def canonical_attributes(version: str | None) -> list[dict[str, Any]]:
+    global _attributes
+    if version is None:
+        return list_canonical_attributes()
+    with _lock:
+        cached = _attributes
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    attributes = list_canonical_attributes()
+    with _lock:
+        _attributes = (version, attributes)
+    return attributes
+
+
+def search(query: str, *, limit: int, version: str | None) -> list[dict[str, Any]]:
+    if version is None or settings.KB_SEARCH_CACHE_SIZE <= 0:
+        return search_knowledge(query, limit=limit)
+    key = (version, query, limit)
+    with _lock:
+        results = _search.get(key)
+        if results is not None:
+            _search.move_to_end(key)
+            return results
+    results = search_knowledge(query, limit=limit)
+    with _lock:
+        _search[key] = results
+        _search.move_to_end(key)
+        while len(_search) > settings.KB_SEARCH_CACHE_SIZE:
+            _search.popitem(last=False)
+    return results
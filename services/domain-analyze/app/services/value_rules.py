@@ -0,0 +1,307 @@
+"""Детерминированное сопоставление значений ТЗ и паспорта до обращения к LLM.
+
+Заметная часть строк сравнения решается без модели: «не менее 10 м» против
+«12 м», «380 В» против «0,38 кВ», «50±5 Гц» против «50 Гц». Раньше такие строки
+всё равно уходили в LLM и лишь потом _values_clearly_match поправлял явные
+совпадения. Здесь строка разбирается на число/диапазон и единицу измерения; если
+обе стороны разобрались однозначно и единицы сводятся к одной величине, вердикт
+выносится локально с оценкой уверенности. Всё, что разобрать не удалось
+(текст, несколько противоречивых кандидатов, разные величины, единица только
+с одной стороны), возвращает None и идёт в модель как раньше.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, NamedTuple
+
+
+class RuleVerdict(NamedTuple):
+    is_match: bool
+    confidence: float
+    note: str
+
+
+class ParsedValue(NamedTuple):
+    # Границы допустимого (для требования) или фактического (для паспорта)
+    # значения в базовых единицах величины. None — граница не задана.
+    low: float | None
+    high: float | None
+    # Величина ("length", "power", ...) или None, если единица не указана.
+    dimension: str | None
+    # True — значение задано точным числом, а не диапазоном/ограничением.
+    exact: bool
+
+
+# Единица → (величина, множитель к базовой единице). Ключи — в нормализованном
+# виде (_normalize_unit): нижний регистр, без пробелов и точек, ³ → 3.
+_UNITS: dict[str, tuple[str, float]] = {
+    "мм": ("length", 0.001),
+    "см": ("length", 0.01),
+    "м": ("length", 1.0),
+    "км": ("length", 1000.0),
+    "mm": ("length", 0.001),
+    "m": ("length", 1.0),
+    "г": ("mass", 0.001),
+    "кг": ("mass", 1.0),
+    "т": ("mass", 1000.0),
+    "kg": ("mass", 1.0),
+    "вт": ("power", 1.0),
+    "квт": ("power", 1000.0),
+    "мвт": ("power", 1_000_000.0),
+    "w": ("power", 1.0),
+    "kw": ("power", 1000.0),
+    "в": ("voltage", 1.0),
+    "кв": ("voltage", 1000.0),
+    "v": ("voltage", 1.0),
+    "а": ("current", 1.0),
+    "ма": ("current", 0.001),
+    "a": ("current", 1.0),
+    "па": ("pressure", 1.0),
+    "кпа": ("pressure", 1000.0),
+    "мпа": ("pressure", 1_000_000.0),
+    "бар": ("pressure", 100_000.0),
+    "bar": ("pressure", 100_000.0),
+    "атм": ("pressure", 101_325.0),
+    "кгс/см2": ("pressure", 98_066.5),
+    "м3/ч": ("flow", 1.0 / 3600.0),
+    "м3/с": ("flow", 1.0),
+    "л/с": ("flow", 0.001),
+    "л/мин": ("flow", 0.001 / 60.0),
+    "л/ч": ("flow", 0.001 / 3600.0),
+    "гц": ("frequency", 1.0),
+    "кгц": ("frequency", 1000.0),
+    "hz": ("frequency", 1.0),
+    "об/мин": ("rotation", 1.0),
+    "мин-1": ("rotation", 1.0),
+    "rpm": ("rotation", 1.0),
+    "°c": ("temperature", 1.0),
+    "°с": ("temperature", 1.0),
+    "с": ("time", 1.0),
+    "сек": ("time", 1.0),
+    "мин": ("time", 60.0),
+    "ч": ("time", 3600.0),
+    "%": ("percent", 1.0),
+    "л": ("volume", 0.001),
+    "м3": ("volume", 1.0),
+    "дб": ("noise", 1.0),
+    "дба": ("noise", 1.0),
+}
+
+_GE_WORDS = ("не менее", "не ниже", "не меньше", "минимум", "мин", "min", "≥", ">=", "от")
+_LE_WORDS = ("не более", "не выше", "не больше", "максимум", "макс", "max", "≤", "<=", "до")
+
+_NUM = r"[-+]?\d+(?:\.\d+)?"
+# Единица начинается не с цифры, но может её содержать («м3/ч», «мин-1»);
+# всё, что не нашлось в _UNITS, отсеивается уже при разборе единицы.
+_UNIT = r"(?:[^\d\s±][^±]*?)?"
+_SINGLE_RE = re.compile(rf"^(?P<num>{_NUM})\s*(?P<unit>{_UNIT})$")
+_TOLERANCE_RE = re.compile(
+    rf"^(?P<num>{_NUM})\s*(?P<unit1>{_UNIT})\s*±\s*(?P<tol>{_NUM})\s*(?P<unit2>{_UNIT})$"
+)
+# Дефис считается разделителем диапазона только между цифрами («1-3 бар») или
+# с пробелом перед ним («1 м - 3 м»): иначе он часть единицы — «1500 мин-1»
+# (мин⁻¹ после _normalize_text) не диапазон «1500 мин … 1».
+_RANGE_RE = re.compile(
+    rf"^(?:от\s*)?(?P<low>{_NUM})\s*(?P<unit1>{_UNIT})"
+    rf"(?:(?<=\d)-\s*|\s+-\s*|\s*(?:\.\.\.?|…|до)\s*)"
+    rf"(?P<high>{_NUM})\s*(?P<unit2>{_UNIT})$"
+)
+
+
+def _normalize_text(value: Any) -> str:
+    text = str(value).strip().lower().replace("ё", "е")
+    text = text.replace(" ", " ").replace("–", "-").replace("—", "-")
+    text = text.replace("³", "3").replace("²", "2").replace("⁻¹", "-1")
+    # Десятичная запятая → точка, но только между цифрами: «10,5» — число,
+    # «10, 20» — перечисление, которое разбирать не нужно.
+    text = re.sub(r"(?<=\d),(?=\d)", ".", text)
+    # Разделители разрядов: «1 500» → «1500».
+    text = re.sub(r"(?<=\d) (?=\d{3}\b)", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _normalize_unit(unit: str) -> str:
+    if not unit:
+        return ""
+    normalized = re.sub(r"[\s.]+", "", _normalize_text(unit))
+    return normalized.replace("/час", "/ч")
+
+
+def _resolve_unit(unit: str, default_unit: str | None) -> tuple[str | None, float] | None:
+    """Единица → (величина, множитель). None — единица указана, но неизвестна
+    (строку нельзя решать правилами). (None, 1.0) — единицы нет вовсе."""
+    normalized = _normalize_unit(unit)
+    if not normalized and default_unit:
+        normalized = _normalize_unit(default_unit)
+    if not normalized:
+        return (None, 1.0)
+    resolved = _UNITS.get(normalized)
+    if resolved is None:
+        return None
+    return resolved
+
+
+def _strip_qualifier(text: str) -> tuple[str | None, str]:
+    for words, kind in ((_GE_WORDS, "ge"), (_LE_WORDS, "le")):
+        for word in words:
+            if text.startswith(word) and (
+                not word[-1].isalpha() or len(text) == len(word) or not text[len(word)].isalpha()
+            ):
+                return kind, text[len(word):].strip()
+    return None, text
+
+
+def parse_value(value: Any, default_unit: str | None = None) -> ParsedValue | None:
+    """Разбирает значение вида «12», «не менее 10 м», «50±5 Гц», «от 1 до 3 бар».
+
+    ``default_unit`` — единица из названия характеристики («Мощность, кВт») или
+    из канонического атрибута Knowledge Base: таблицы паспорта часто пишут
+    единицу только в заголовке. None — значение не число или разобрать его
+    однозначно нельзя."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        if not math.isfinite(float(value)):
+            return None
+        resolved = _resolve_unit("", default_unit)
+        if resolved is None:
+            return None
+        dimension, factor = resolved
+        number = float(value) * factor
+        return ParsedValue(number, number, dimension, True)
+
+    text = _normalize_text(value)
+    if not text:
+        return None
+
+    match = _RANGE_RE.match(text)
+    if match and not text.startswith("-"):
+        unit = match.group("unit2") or match.group("unit1")
+        resolved = _resolve_unit(unit, default_unit)
+        # Диапазоном признаётся, только если единица известна и границы
+        # упорядочены.
+        if resolved is not None:
+            dimension, factor = resolved
+            low = float(match.group("low")) * factor
+            high = float(match.group("high")) * factor
+            if low <= high:
+                return ParsedValue(low, high, dimension, False)
+
+    match = _TOLERANCE_RE.match(text)
+    if match:
+        resolved = _resolve_unit(match.group("unit2") or match.group("unit1"), default_unit)
+        if resolved is None:
+            return None
+        dimension, factor = resolved
+        center = float(match.group("num")) * factor
+        tolerance = abs(float(match.group("tol"))) * factor
+        return ParsedValue(center - tolerance, center + tolerance, dimension, False)
+
+    qualifier, rest = _strip_qualifier(text)
+    match = _SINGLE_RE.match(rest)
+    if not match:
+        return None
+    resolved = _resolve_unit(match.group("unit"), default_unit)
+    if resolved is None:
+        return None
+    dimension, factor = resolved
+    number = float(match.group("num")) * factor
+    if qualifier == "ge":
+        return ParsedValue(number, None, dimension, False)
+    if qualifier == "le":
+        return ParsedValue(None, number, dimension, False)
+    return ParsedValue(number, number, dimension, True)
+
+
+def _close(a: float, b: float) -> bool:
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+
+# Насколько значение паспорта должно выйти за границу требования, чтобы
+# несоответствие считалось однозначным. Ближе к границе расхождение может быть
+# следствием округления при пересчёте единиц (10 м³/ч ≈ 2,78 л/с) — такие
+# строки решает модель.
+_DISJOINT_MARGIN = 0.01
+
+
+def _beyond(value: float, bound: float) -> bool:
+    return abs(value - bound) > _DISJOINT_MARGIN * max(abs(value), abs(bound), 1e-12)
+
+
+def _within(requirement: ParsedValue, actual: ParsedValue) -> bool:
+    """Фактическое значение (точка или диапазон) целиком лежит в требовании."""
+    if requirement.low is not None:
+        if actual.low is None or (actual.low < requirement.low and not _close(actual.low, requirement.low)):
+            return False
+    if requirement.high is not None:
+        if actual.high is None or (actual.high > requirement.high and not _close(actual.high, requirement.high)):
+            return False
+    return True
+
+
+def _disjoint(requirement: ParsedValue, actual: ParsedValue) -> bool:
+    """Фактическое значение целиком и с запасом вне требования —
+    несоответствие однозначно."""
+    if requirement.low is not None and actual.high is not None:
+        if actual.high < requirement.low and _beyond(actual.high, requirement.low):
+            return True
+    if requirement.high is not None and actual.low is not None:
+        if actual.low > requirement.high and _beyond(actual.low, requirement.high):
+            return True
+    return False
+
+
+def unit_from_name(name: Any) -> str | None:
+    """Единица из хвоста названия характеристики: «Подача, м³/ч» → «м³/ч»."""
+    if not isinstance(name, str) or "," not in name:
+        return None
+    tail = name.rsplit(",", 1)[1].strip()
+    return tail or None
+
+
+def decide(
+    tz_value: Any,
+    passport_values: list[Any],
+    *,
+    tz_default_unit: str | None = None,
+    passport_default_unit: str | None = None,
+) -> RuleVerdict | None:
+    """Вердикт по значению ТЗ (требование) и значениям паспорта (все кандидаты).
+
+    None — строку должна решать модель: значение не разобралось, кандидаты
+    паспорта противоречат друг другу, величины различаются, единица указана
+    только с одной стороны или результат пограничный (диапазон паспорта
+    частично выходит за требование)."""
+    if tz_value is None or not passport_values:
+        return None
+    requirement = parse_value(tz_value, tz_default_unit)
+    if requirement is None:
+        return None
+    parsed_candidates = [parse_value(value, passport_default_unit) for value in passport_values]
+    if any(candidate is None for candidate in parsed_candidates):
+        return None
+    actual = parsed_candidates[0]
+    # Несколько упоминаний с разными значениями — выбор между ними требует
+    # контекста (рабочая точка, исполнение), это работа модели.
+    if any(candidate != actual for candidate in parsed_candidates[1:]):
+        return None
+    # Единица известна только с одной стороны («10» и «10 кВт»): число без
+    # единицы нельзя сравнивать с пересчитанным в базовую единицу — 10 против
+    # 10000 Вт. Такие строки, как и разные величины, решает модель.
+    if requirement.dimension != actual.dimension:
+        return None
+
+    if requirement.exact and not actual.exact:
+        return None
+    if _within(requirement, actual):
+        kind = "точное совпадение" if requirement.exact else "значение паспорта в пределах требования ТЗ"
+        return RuleVerdict(True, 0.97, f"Проверено правилом: {kind}.")
+    if _disjoint(requirement, actual):
+        return RuleVerdict(
+            False,
+            0.93,
+            "Проверено правилом: значение паспорта не удовлетворяет требованию ТЗ.",
+        )
+    return None
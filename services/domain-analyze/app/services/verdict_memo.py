@@ -0,0 +1,105 @@
+"""Запомненные вердикты строк сравнения (инкрементальное сравнение).
+
+Когда пользователь отмечает ещё одну характеристику ТЗ и перезапускает
+сравнение, большинство строк не меняется. Вердикт модели по каждой строке
+хранится в Postgres (таблица compare_item_verdicts) под (версия промпта,
+модель, отпечаток строки), и повторный запуск отправляет в LLM только новые
+и изменившиеся строки. Раньше вердикты жили в дисковом кэше ответов
+(llm_cache), который чистится по TTL и размеру и виден только процессам с
+тем же volume, — после очистки «только изменённые строки» молча
+превращались в полный прогон.
+
+Ошибки базы не должны ронять сравнение: без базы все строки уходят в
+модель, как до появления инкрементального режима, и это пишется в лог.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.models import ItemVerdict
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Отпечатков в одном SELECT ... IN / INSERT: сотни строк анализа — это
+# несколько запросов, а не сотни.
+_BATCH_SIZE = 500
+
+
+def prompt_version(prompt: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(prompt, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def load(model: str, version: str, fingerprints: list[str]) -> dict[str, dict[str, Any]]:
+    """Вердикты по отпечаткам; строк без вердикта в ответе нет."""
+    unique = list(dict.fromkeys(fingerprints))
+    verdicts: dict[str, dict[str, Any]] = {}
+    try:
+        with SessionLocal() as db:
+            for start in range(0, len(unique), _BATCH_SIZE):
+                rows = db.execute(
+                    select(ItemVerdict.fingerprint, ItemVerdict.verdict).where(
+                        ItemVerdict.prompt_version == version,
+                        ItemVerdict.model == model,
+                        ItemVerdict.fingerprint.in_(unique[start : start + _BATCH_SIZE]),
+                    )
+                ).all()
+                verdicts.update(
+                    (fingerprint, verdict) for fingerprint, verdict in rows if isinstance(verdict, dict)
+                )
+    except Exception:
+        logger.warning(
+            "verdict_memo: failed to load verdicts, comparing all %d item(s)", len(unique),
+            exc_info=True,
+            extra={"step": "compare_json_memo"},
+        )
+        return {}
+    return verdicts
+
+
+def save(model: str, version: str, verdicts: dict[str, dict[str, Any]]) -> None:
+    if not verdicts:
+        return
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "prompt_version": version,
+            "model": model,
+            "fingerprint": fingerprint,
+            "verdict": verdict,
+            "updated_at": now,
+        }
+        for fingerprint, verdict in verdicts.items()
+    ]
+    try:
+        with SessionLocal() as db:
+            for start in range(0, len(rows), _BATCH_SIZE):
+                statement = insert(ItemVerdict).values(rows[start : start + _BATCH_SIZE])
+                db.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[
+                            ItemVerdict.prompt_version, ItemVerdict.model, ItemVerdict.fingerprint
+                        ],
+                        set_={
+                            "verdict": statement.excluded.verdict,
+                            "updated_at": statement.excluded.updated_at,
+                        },
+                    )
+                )
+            db.commit()
+    except Exception:
+        logger.warning(
+            "verdict_memo: failed to save %d verdict(s)", len(rows),
+            exc_info=True,
+            extra={"step": "compare_json_memo"},
+        )
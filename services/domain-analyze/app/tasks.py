@@ -1,23 +1,56 @@
 import logging
 import time
 import traceback
-
-import httpx
+from functools import partial
 
 from app.celery_app import celery_app
 from app.core.config import settings
+from app.services import checkpoints
 from app.services.compare_service import CompareParseError, compare_json
+from app.services.http_clients import get_client, log_pool_stats
 
 logger = logging.getLogger(__name__)
 
 
+def _report_progress(job_id: str, analysis_id: str, completed: int, total: int) -> None:
+    get_client(settings.API_GATEWAY_URL).post(
+        f"{settings.API_GATEWAY_URL}/compare/progress",
+        json={
+            "job_id": job_id,
+            "analysis_id": analysis_id,
+            "completed_items": completed,
+            "total_items": total,
+        },
+        timeout=settings.PROGRESS_CALLBACK_TIMEOUT_SECONDS,
+    ).raise_for_status()
+
+
+def _deliver_rows(job_id: str, analysis_id: str, sequence: int, comparisons: list[dict]) -> None:
+    """Частичный результат: строки, готовые до завершения всего сравнения.
+    Gateway принимает порцию с данным ``sequence`` один раз."""
+    if not comparisons:
+        return
+    get_client(settings.API_GATEWAY_URL).post(
+        f"{settings.API_GATEWAY_URL}/compare/partial",
+        json={
+            "job_id": job_id,
+            "analysis_id": analysis_id,
+            "sequence": sequence,
+            "comparisons": comparisons,
+        },
+        timeout=settings.PARTIAL_CALLBACK_TIMEOUT_SECONDS,
+    ).raise_for_status()
+
+
 @celery_app.task(
     bind=True,
     name="domain_analyze.compare_documents",
     queue="domain_analyze",
     autoretry_for=(Exception,),
     retry_backoff=True,
-    retry_kwargs={"max_retries": 5},
+    # max_retries именно атрибутом задачи: по self.max_retries ниже решается,
+    # что повторов больше не будет (retry_kwargs его не меняет).
+    max_retries=5,
 )
 def compare_documents(
     self,
@@ -39,7 +72,14 @@ def compare_documents(
     )
     payload: dict | None = None
     try:
-        result = compare_json(tz_data, passport_data, extraction_backend)
+        result = compare_json(
+            tz_data,
+            passport_data,
+            extraction_backend,
+            job_id=job_id,
+            on_progress=partial(_report_progress, job_id, analysis_id),
+            on_rows=partial(_deliver_rows, job_id, analysis_id),
+        )
         payload = {
             "job_id": job_id,
             "analysis_id": analysis_id,
@@ -80,8 +120,11 @@ def compare_documents(
     finally:
         if payload is not None:
             try:
-                with httpx.Client(timeout=settings.REQUEST_TIMEOUT_SECONDS) as client:
-                    client.post(f"{settings.API_GATEWAY_URL}/compare/callback", json=payload)
+                get_client(settings.API_GATEWAY_URL).post(
+                    f"{settings.API_GATEWAY_URL}/compare/callback",
+                    json=payload,
+                    timeout=settings.REQUEST_TIMEOUT_SECONDS,
+                )
             except Exception:
                 logger.exception(
                     "compare_documents: failed to deliver callback to api-gateway "
@@ -90,3 +133,9 @@ def compare_documents(
                     extra={**log_extra, "step": "compare_documents_callback_failed"},
                 )
                 raise
+            finally:
+                log_pool_stats()
+            # Результат доставлен (или повторов больше не будет) — чекпоинты
+            # этой задачи больше не понадобятся.
+            if payload.get("status") == "succeeded" or self.request.retries >= self.max_retries:
+                checkpoints.clear(job_id)
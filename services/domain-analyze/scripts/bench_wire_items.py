@@ -0,0 +1,160 @@
+"""Замер входа сравнения: полные строки (как compare_json отправлял их раньше)
+против компактной проекции _wire_item.
+
+Строки берутся синтетические — с references, bbox и кандидатами паспорта,
+по объёму похожие на реальные, — либо из сохранённого ответа compare_json
+(debug_chunk.input_items или весь payload с ним):
+
+    python scripts/bench_wire_items.py [--sizes 20 60 120] [--repeat 5]
+    python scripts/bench_wire_items.py --input compare_result.json
+
+--live дополнительно отправляет каждый вариант провайдеру сравнения
+(ключи из env/.env, промпт из prompt-registry) и показывает prompt_tokens
+из usage и время ответа.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.chunk_planner import estimate_tokens  # noqa: E402
+from app.services.compare_service import (  # noqa: E402
+    _post_chat_completion,
+    _resolve_llm_provider,
+    _wire_item,
+)
+
+
+def _reference(index: int, page: int, text: str) -> dict:
+    return {
+        "page": page,
+        "bbox": {"left": 0.12, "top": 0.31 + (index % 20) * 0.02, "right": 0.88, "bottom": 0.33 + (index % 20) * 0.02},
+        "anchor_text": text,
+        "quote_text": text,
+        "locator_text": f"Страница {page}: {text}",
+        "matched_text": text,
+        "confidence": 0.92,
+    }
+
+
+def _item(index: int) -> dict:
+    characteristic = f"Характеристика {index}, м³/ч"
+    tz_text = f"| {characteristic} | не менее {index} | согласно п. {index % 12 + 1}.{index % 7 + 1} |"
+    candidates = [
+        {
+            "name": characteristic,
+            "value": str(index + variant),
+            "references": [_reference(index, index % 40 + 1, f"{characteristic}: {index + variant}")],
+        }
+        for variant in range(1 + index % 3)
+    ]
+    return {
+        "product_name": f"Насос {index % 4}",
+        "characteristic": characteristic,
+        "tz_value": f"не менее {index}",
+        "passport_value": candidates[0]["value"],
+        "tz_references": [_reference(index, index % 12 + 1, tz_text) for _ in range(2)],
+        "passport_references": candidates[0]["references"],
+        "passport_value_candidates": candidates,
+        "is_target_model": index % 4 == 0,
+    }
+
+
+def _load_items(path: str) -> list[dict]:
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(payload, dict):
+        payload = (payload.get("debug_chunk") or payload).get("input_items") or []
+    return [item for item in payload if isinstance(item, dict)]
+
+
+def _full_message(items: list[dict]) -> str:
+    return json.dumps({"comparison_items": items}, ensure_ascii=False)
+
+
+def _wire_message(items: list[dict]) -> str:
+    return json.dumps(
+        {"comparison_items": [_wire_item(index, item) for index, item in enumerate(items)]},
+        ensure_ascii=False,
+    )
+
+
+def _median_seconds(build, items: list[dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build(items)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def _live(items: list[dict], backend: str | None, repeat: int) -> None:
+    from app.services.reference_cache import get_prompt
+
+    provider = _resolve_llm_provider(backend)
+    prompt = get_prompt("comparison")
+    system_message = (
+        f"{prompt.get('prompt', '')}\n\nReturn JSON that matches this schema:\n"
+        f"{json.dumps(prompt.get('schema', {}), ensure_ascii=False)}"
+    )
+    headers = {"Authorization": f"Bearer {provider.api_key}", "Content-Type": "application/json"}
+    print(f"\nlive: {provider.name} {provider.model}, {len(items)} items")
+    print(f"{'variant':>8} {'prompt_tokens':>14} {'latency, s':>11}")
+    for name, build in (("full", _full_message), ("wire", _wire_message)):
+        latencies = []
+        prompt_tokens = None
+        for _ in range(repeat):
+            payload = {
+                "model": provider.model,
+                "messages": [
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": build(items)},
+                ],
+                "temperature": 0.0,
+                "response_format": {"type": "json_object"},
+            }
+            started = time.perf_counter()
+            _, usage = _post_chat_completion(provider, headers, payload)
+            latencies.append(time.perf_counter() - started)
+            if isinstance(usage, dict):
+                prompt_tokens = usage.get("prompt_tokens", prompt_tokens)
+        print(f"{name:>8} {str(prompt_tokens):>14} {statistics.median(latencies):>11.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 60, 120])
+    parser.add_argument("--input", help="compare_json result or debug_chunk JSON")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="send both variants to the LLM provider")
+    parser.add_argument("--backend", default=None, help="extraction_backend that selects the provider")
+    args = parser.parse_args()
+
+    batches = [_load_items(args.input)] if args.input else [
+        [_item(index) for index in range(size)] for size in args.sizes
+    ]
+    print(
+        f"{'items':>6} {'full, KiB':>10} {'wire, KiB':>10} {'full, tok':>10} {'wire, tok':>10} "
+        f"{'ratio':>7} {'build full, ms':>15} {'build wire, ms':>15}"
+    )
+    for items in batches:
+        full = _full_message(items)
+        wire = _wire_message(items)
+        full_tokens = estimate_tokens(full)
+        wire_tokens = estimate_tokens(wire)
+        print(
+            f"{len(items):>6} {len(full.encode()) / 1024:>10.1f} {len(wire.encode()) / 1024:>10.1f} "
+            f"{full_tokens:>10} {wire_tokens:>10} {wire_tokens / full_tokens:>6.0%} "
+            f"{_median_seconds(_full_message, items, args.repeat) * 1000:>15.2f} "
+            f"{_median_seconds(_wire_message, items, args.repeat) * 1000:>15.2f}"
+        )
+    if args.live:
+        _live(batches[-1] if args.input else batches[0], args.backend, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Починка неразобранного ответа уходит провайдеру, который его прислал."""
+
+from app.services import compare_service
+from app.services.compare_service import CompareParseError, _LlmProvider, _RunContext
+
+PRIMARY = _LlmProvider("openrouter", "https://primary.test", "key", "model-a", 4, 1000, 1000)
+ALTERNATE = _LlmProvider("yandex", "https://alternate.test", "key", "model-b", 2, 1000, 1000)
+CONTEXT = _RunContext({"prompt": "p", "schema": {}}, [], None)
+
+
+def test_repair_goes_to_the_provider_that_answered(monkeypatch):
+    repaired_by: list[str] = []
+
+    def hedged(items, context, provider):
+        raise CompareParseError("bad json", "{broken", ALTERNATE)
+
+    def repair(raw, schema, provider):
+        repaired_by.append(provider.name)
+        return {"comparisons": [], "summary": ""}
+
+    monkeypatch.setattr(compare_service, "_compare_chunk_hedged", hedged)
+    monkeypatch.setattr(compare_service, "_repair_json", repair)
+
+    compare_service._compare_chunk_or_repair([{}], 0, 1, CONTEXT, PRIMARY)
+
+    assert repaired_by == ["yandex"]
@@ -0,0 +1,165 @@
+"""Отмена проигравшей попытки хеджа не должна задевать соседние chunk'и.
+
+Два потоковых ответа идут через один клиент пула (как у chunk'ов одного
+провайдера в compare_service): отмена одного завершает только его, второй
+дочитывается целиком. По HTTP/2 оба ответа идут одним TCP-соединением.
+"""
+
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import h2.config
+import h2.connection
+import h2.events
+import httpx
+import pytest
+
+from app.services import compare_service
+from app.services.compare_service import _Cancellation, _ChunkCancelled, _LlmProvider
+
+EVENTS = 20
+INTERVAL = 0.05
+
+
+def _sse(index: int) -> bytes:
+    event = {"choices": [{"delta": {"content": f"{index},"}}]}
+    return f"data: {json.dumps(event)}\n\n".encode()
+
+
+def _expected_text() -> str:
+    return "".join(f"{index}," for index in range(EVENTS))
+
+
+def _serve_h2(listener: socket.socket, connections: list) -> None:
+    sock, _ = listener.accept()
+    connections.append(sock)
+    conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+    conn.initiate_connection()
+    sock.sendall(conn.data_to_send())
+    sock.settimeout(INTERVAL / 5)
+    streams: dict[int, int] = {}
+    next_tick = time.monotonic()
+    while True:
+        try:
+            data = sock.recv(65535)
+        except socket.timeout:
+            data = None
+        except OSError:
+            return
+        if data == b"":
+            return
+        for event in conn.receive_data(data) if data else []:
+            if isinstance(event, h2.events.StreamEnded):
+                conn.send_headers(
+                    event.stream_id, [(":status", "200"), ("content-type", "text/event-stream")]
+                )
+                streams[event.stream_id] = 0
+            elif isinstance(event, h2.events.StreamReset):
+                streams.pop(event.stream_id, None)
+        if time.monotonic() >= next_tick:
+            next_tick = time.monotonic() + INTERVAL
+            for stream_id, sent in list(streams.items()):
+                if sent < EVENTS:
+                    conn.send_data(stream_id, _sse(sent))
+                    streams[stream_id] = sent + 1
+                else:
+                    conn.send_data(stream_id, b"data: [DONE]\n\n", end_stream=True)
+                    del streams[stream_id]
+        try:
+            sock.sendall(conn.data_to_send())
+        except OSError:
+            return
+
+
+def _serve_http1(listener: socket.socket, connections: list) -> None:
+    def handle(sock: socket.socket) -> None:
+        buffer = b""
+        while b"\r\n\r\n" not in buffer:
+            buffer += sock.recv(65535)
+        head, _, body = buffer.partition(b"\r\n\r\n")
+        length = next(
+            int(line.split(b":", 1)[1])
+            for line in head.split(b"\r\n")
+            if line.lower().startswith(b"content-length:")
+        )
+        while len(body) < length:
+            body += sock.recv(65535)
+        try:
+            sock.sendall(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            for index in range(EVENTS + 1):
+                time.sleep(INTERVAL)
+                payload = _sse(index) if index < EVENTS else b"data: [DONE]\n\n"
+                sock.sendall(b"%x\r\n%s\r\n" % (len(payload), payload))
+            sock.sendall(b"0\r\n\r\n")
+        except OSError:
+            pass
+
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except OSError:
+            return
+        connections.append(sock)
+        threading.Thread(target=handle, args=(sock,), daemon=True).start()
+
+
+@pytest.mark.parametrize(
+    "http_version, serve, client_kwargs",
+    [
+        ("HTTP/2", _serve_h2, {"http1": False, "http2": True}),
+        ("HTTP/1.1", _serve_http1, {}),
+    ],
+)
+def test_cancelling_one_stream_leaves_the_other_intact(
+    monkeypatch, http_version, serve, client_kwargs
+):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    connections: list[socket.socket] = []
+    threading.Thread(target=serve, args=(listener, connections), daemon=True).start()
+    base_url = f"http://127.0.0.1:{listener.getsockname()[1]}"
+    client = httpx.Client(base_url=base_url, **client_kwargs)
+    monkeypatch.setattr(compare_service, "get_client", lambda _: client)
+    provider = _LlmProvider("test", base_url, "key", "model", 2, 1000, 1000)
+
+    versions: list[str] = []
+    original_attach = _Cancellation.attach
+
+    def attach(self, response):
+        versions.append(response.http_version)
+        original_attach(self, response)
+
+    monkeypatch.setattr(_Cancellation, "attach", attach)
+    loser, winner = _Cancellation(), _Cancellation()
+
+    def run(cancel: _Cancellation) -> str:
+        text, _ = compare_service._stream_chat_completion(provider, {}, {}, cancel)
+        return text
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            losing = pool.submit(run, loser)
+            winning = pool.submit(run, winner)
+            time.sleep(INTERVAL * 4)
+            cancelled_at = time.monotonic()
+            loser.cancel()
+            with pytest.raises(_ChunkCancelled):
+                losing.result(timeout=5)
+            cancel_delay = time.monotonic() - cancelled_at
+            assert winning.result(timeout=10) == _expected_text()
+    finally:
+        client.close()
+        listener.close()
+
+    assert versions == [http_version, http_version]
+    # Отмена срабатывает не позже следующего события потока.
+    assert cancel_delay < INTERVAL * 4
+    if http_version == "HTTP/2":
+        assert len(connections) == 1
@@ -0,0 +1,56 @@
+"""Параллельная отправка chunk'ов (app/services/llm_dispatch.py)."""
+
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_dispatch import run_ordered
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(settings, "COMPARE_CHUNK_DELAY_SECONDS", 0)
+
+
+def test_results_keep_call_order():
+    def call(index: int, delay: float):
+        def run():
+            time.sleep(delay)
+            return index
+        return run
+
+    calls = [call(index, 0.05 * (5 - index)) for index in range(5)]
+    assert run_ordered(calls, provider_name="order", max_workers=3) == [0, 1, 2, 3, 4]
+
+
+def test_failure_is_raised_without_waiting_for_running_chunks():
+    release = threading.Event()
+    started: list[int] = []
+
+    def slow(index: int):
+        def run():
+            started.append(index)
+            release.wait(5)
+            return index
+        return run
+
+    def failing():
+        started.append(1)
+        raise RuntimeError("chunk 1 failed")
+
+    calls = [slow(0), failing, *(slow(index) for index in range(2, 10))]
+    began = time.monotonic()
+    try:
+        with pytest.raises(RuntimeError, match="chunk 1 failed"):
+            run_ordered(calls, provider_name="failure", max_workers=2)
+        elapsed = time.monotonic() - began
+        # Chunk 0 всё ещё ждёт ответа — ошибка не ждёт его.
+        assert elapsed < 1
+        # Chunk'и после упавшего в модель не уходят: работал только chunk 0,
+        # и место упавшего успел занять разве что один следующий.
+        time.sleep(0.1)
+        assert len(started) <= 3
+    finally:
+        release.set()
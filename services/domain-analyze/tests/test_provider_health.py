@@ -0,0 +1,37 @@
+"""Circuit breaker при недоступной базе: сравнение продолжается, а не ждёт
+таймаута соединения на каждом chunk'е."""
+
+import pytest
+
+from app.core.config import settings
+from app.services import provider_health
+
+
+@pytest.fixture
+def broken_db(monkeypatch):
+    attempts: list[int] = []
+
+    def session():
+        attempts.append(1)
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(provider_health, "SessionLocal", session)
+    monkeypatch.setattr(provider_health, "_db_unavailable_until", 0.0)
+    monkeypatch.setattr(settings, "DOMAIN_ANALYZE_DB_RETRY_SECONDS", 60.0)
+    return attempts
+
+
+def test_database_errors_leave_the_circuit_closed(broken_db):
+    assert provider_health.allow_request("openrouter") is True
+    provider_health.record_failure("openrouter")
+    provider_health.record_success("openrouter")
+    assert provider_health.allow_request("openrouter") is True
+    # После первой ошибки база не опрашивается до конца паузы.
+    assert len(broken_db) == 1
+
+
+def test_database_is_retried_after_the_pause(broken_db, monkeypatch):
+    provider_health.allow_request("openrouter")
+    monkeypatch.setattr(provider_health, "_db_unavailable_until", 0.0)
+    provider_health.allow_request("openrouter")
+    assert len(broken_db) == 2
@@ -0,0 +1,232 @@
+"""Корпус строк сравнения для app/services/value_rules.py.
+
+Строки повторяют input_items из debug_chunk ответа compare_json:
+characteristic, tz_value и passport_value_candidates (name/value), как их
+отдаёт извлечение. expected — вердикт правил: True/False (совпадение или
+несоответствие), None — строку должна решать модель. Единица по умолчанию
+берётся так же, как в compare_service._rule_verdict: из хвоста названия
+характеристики.
+"""
+
+import pytest
+
+from app.services.value_rules import ParsedValue, decide, parse_value, unit_from_name
+
+CORPUS = [
+    # Требование «не менее»/«не более» и точное значение паспорта.
+    {
+        "characteristic": "Напор",
+        "tz_value": "не менее 10 м",
+        "passport_value_candidates": [{"name": "Напор", "value": "12 м"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Напор",
+        "tz_value": "не менее 10 м",
+        "passport_value_candidates": [{"name": "Напор", "value": "8 м"}],
+        "expected": False,
+    },
+    {
+        "characteristic": "Масса",
+        "tz_value": "не более 25 кг",
+        "passport_value_candidates": [{"name": "Масса", "value": "24,5 кг"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Уровень шума",
+        "tz_value": "не более 70 дБА",
+        "passport_value_candidates": [{"name": "Уровень шума", "value": "75 дБА"}],
+        "expected": False,
+    },
+    # Пересчёт единиц одной величины.
+    {
+        "characteristic": "Номинальное напряжение",
+        "tz_value": "380 В",
+        "passport_value_candidates": [{"name": "Напряжение", "value": "0,38 кВ"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Мощность двигателя",
+        "tz_value": "не менее 5,5 кВт",
+        "passport_value_candidates": [{"name": "Мощность", "value": "5500 Вт"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Рабочее давление",
+        "tz_value": "не менее 10 бар",
+        "passport_value_candidates": [{"name": "Давление", "value": "1,6 МПа"}],
+        "expected": True,
+    },
+    # Единица только в заголовке таблицы паспорта / в названии характеристики.
+    {
+        "characteristic": "Подача, м³/ч",
+        "tz_value": "не менее 40",
+        "passport_value_candidates": [{"name": "Подача, м³/ч", "value": "45"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Мощность, кВт",
+        "tz_value": "не более 7,5",
+        "passport_value_candidates": [{"name": "Мощность, кВт", "value": 11}],
+        "expected": False,
+    },
+    # Допуски и диапазоны.
+    {
+        "characteristic": "Частота тока",
+        "tz_value": "50±5 Гц",
+        "passport_value_candidates": [{"name": "Частота", "value": "50 Гц"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Температура перекачиваемой жидкости",
+        "tz_value": "от 0 до 90 °C",
+        "passport_value_candidates": [{"name": "Температура жидкости", "value": "5...80 °C"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Температура перекачиваемой жидкости",
+        "tz_value": "от 0 до 90 °C",
+        "passport_value_candidates": [{"name": "Температура жидкости", "value": "-10...120 °C"}],
+        "expected": None,
+    },
+    {
+        "characteristic": "Рабочее давление",
+        "tz_value": "1-3 бар",
+        "passport_value_candidates": [{"name": "Давление", "value": "2 бар"}],
+        "expected": True,
+    },
+    # Частота вращения: «мин⁻¹» — единица, а не диапазон «1 мин … 1».
+    {
+        "characteristic": "Частота вращения",
+        "tz_value": "1500 мин⁻¹",
+        "passport_value_candidates": [{"name": "Частота вращения", "value": "1500 об/мин"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Частота вращения",
+        "tz_value": "не более 3000 мин-1",
+        "passport_value_candidates": [{"name": "Частота вращения", "value": "2900 мин-1"}],
+        "expected": True,
+    },
+    {
+        "characteristic": "Частота вращения",
+        "tz_value": "1 мин-1",
+        "passport_value_candidates": [{"name": "Время разгона", "value": "60 с"}],
+        "expected": None,
+    },
+    # Строки, которые правила отдают модели.
+    {
+        "characteristic": "Степень защиты",
+        "tz_value": "IP55",
+        "passport_value_candidates": [{"name": "Степень защиты", "value": "IP54"}],
+        "expected": None,
+    },
+    {
+        "characteristic": "Материал корпуса",
+        "tz_value": "чугун",
+        "passport_value_candidates": [{"name": "Корпус", "value": "серый чугун"}],
+        "expected": None,
+    },
+    {
+        "characteristic": "Подача",
+        "tz_value": "не менее 40 м³/ч",
+        "passport_value_candidates": [
+            {"name": "Подача (номинальная)", "value": "45 м³/ч"},
+            {"name": "Подача (максимальная)", "value": "60 м³/ч"},
+        ],
+        "expected": None,
+    },
+    {
+        "characteristic": "Номинальный ток",
+        "tz_value": "не более 10 А",
+        "passport_value_candidates": [{"name": "Напряжение", "value": "230 В"}],
+        "expected": None,
+    },
+    {
+        "characteristic": "Напор",
+        "tz_value": "12 м",
+        "passport_value_candidates": [{"name": "Напор", "value": "10-14 м"}],
+        "expected": None,
+    },
+    # Единица только с одной стороны: число без единицы не сравнивается с
+    # пересчитанным в базовую единицу.
+    {
+        "characteristic": "Мощность",
+        "tz_value": "10",
+        "passport_value_candidates": [{"name": "Мощность", "value": "10 кВт"}],
+        "expected": None,
+    },
+    {
+        "characteristic": "Напор",
+        "tz_value": "не менее 10 м",
+        "passport_value_candidates": [{"name": "Напор", "value": "12"}],
+        "expected": None,
+    },
+    {
+        "characteristic": "Масса",
+        "tz_value": "не более 25 кг",
+        "passport_value_candidates": [{"name": "Масса", "value": "30"}],
+        "expected": None,
+    },
+    {
+        # Без единицы с обеих сторон — сравниваются сами числа.
+        "characteristic": "Число фаз",
+        "tz_value": "3",
+        "passport_value_candidates": [{"name": "Число фаз", "value": "3"}],
+        "expected": True,
+    },
+    {
+        # Расхождение в пределах округления при пересчёте — решает модель.
+        "characteristic": "Подача",
+        "tz_value": "не менее 10 м³/ч",
+        "passport_value_candidates": [{"name": "Подача", "value": "2,77 л/с"}],
+        "expected": None,
+    },
+]
+
+
+def _decide(item: dict):
+    candidates = item["passport_value_candidates"]
+    return decide(
+        item["tz_value"],
+        [candidate["value"] for candidate in candidates],
+        tz_default_unit=unit_from_name(item["characteristic"]),
+        passport_default_unit=unit_from_name(candidates[0]["name"])
+        or unit_from_name(item["characteristic"]),
+    )
+
+
+@pytest.mark.parametrize(
+    "item", CORPUS, ids=[f"{item['characteristic']}: {item['tz_value']}" for item in CORPUS]
+)
+def test_corpus(item):
+    verdict = _decide(item)
+    if item["expected"] is None:
+        assert verdict is None
+    else:
+        assert verdict is not None
+        assert verdict.is_match is item["expected"]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1500 мин⁻¹", ParsedValue(1500.0, 1500.0, "rotation", True)),
+        ("1 мин-1", ParsedValue(1.0, 1.0, "rotation", True)),
+        ("1-3 бар", ParsedValue(100_000.0, 300_000.0, "pressure", False)),
+        ("1 м - 3 м", ParsedValue(1.0, 3.0, "length", False)),
+        ("от 1 до 3 бар", ParsedValue(100_000.0, 300_000.0, "pressure", False)),
+        ("1 500 об/мин", ParsedValue(1500.0, 1500.0, "rotation", True)),
+        ("не менее 10,5 м", ParsedValue(10.5, None, "length", False)),
+        ("10, 20", None),
+        ("IP55", None),
+    ],
+)
+def test_parse_value(value, expected):
+    assert parse_value(value) == expected
+
+
+def test_unit_only_on_one_side_is_left_to_the_model():
+    assert decide("10", ["10 кВт"]) is None
+    assert decide("10 кВт", ["10"]) is None
+    assert decide("не менее 10 м", ["12"]) is None
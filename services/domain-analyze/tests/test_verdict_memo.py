@@ -0,0 +1,88 @@
+"""Инкрементальное сравнение: в LLM уходят только строки без запомненного
+вердикта, а недоступная база вердиктов означает полный прогон, а не ошибку."""
+
+import pytest
+
+from app.core.config import settings
+from app.services import compare_service, verdict_memo
+from app.services.compare_service import _LlmProvider, _RunContext
+
+PROVIDER = _LlmProvider("test", "http://llm.test", "key", "model", 2, 100_000, 100_000)
+
+
+def _items(power: str) -> list[dict]:
+    return [
+        {"product_name": "Насос", "characteristic": "Напор", "tz_value": "не менее 10 м",
+         "passport_value": "12 м", "passport_value_candidates": [{"value": "12 м"}]},
+        {"product_name": "Насос", "characteristic": "Мощность", "tz_value": "не более 5 кВт",
+         "passport_value": power, "passport_value_candidates": [{"value": power}]},
+    ]
+
+
+@pytest.fixture
+def compare(monkeypatch):
+    """compare_json без сети: строки задаёт тест, модель отвечает «совпадает»
+    на всё, что ей прислали, и запоминает, что именно прислали."""
+    sent: list[list[str]] = []
+    items: list[dict] = []
+
+    def fake_chunk(chunk_items, chunk_index, chunk_count, context, provider):
+        sent.append([item["characteristic"] for item in chunk_items])
+        return {
+            "comparisons": [
+                {"id": index, "is_match": True, "tz_quote": None, "passport_quote": None, "note": None}
+                for index in range(len(chunk_items))
+            ]
+        }
+
+    monkeypatch.setattr(settings, "COMPARE_INCREMENTAL", True)
+    monkeypatch.setattr(settings, "COMPARE_RULES_ENABLED", False)
+    monkeypatch.setattr(settings, "COMPARE_CHUNK_DELAY_SECONDS", 0)
+    monkeypatch.setattr(compare_service, "_build_comparison_items", lambda tz, passport: list(items))
+    monkeypatch.setattr(compare_service, "_resolve_llm_provider", lambda backend: PROVIDER)
+    monkeypatch.setattr(
+        compare_service, "_load_run_context", lambda: _RunContext({"prompt": "p"}, [], None)
+    )
+    monkeypatch.setattr(compare_service, "_compare_chunk_or_repair", fake_chunk)
+
+    def run(new_items: list[dict]) -> list[str]:
+        items[:] = new_items
+        sent.clear()
+        result = compare_service.compare_json({}, {})
+        assert [row["is_match"] for row in result["comparisons"]] == [True] * len(new_items)
+        return sorted(name for chunk in sent for name in chunk)
+
+    return run
+
+
+def test_rerun_sends_only_changed_items(monkeypatch, compare):
+    stored: dict[tuple[str, str, str], dict] = {}
+
+    def load(model, version, fingerprints):
+        return {
+            fingerprint: stored[(model, version, fingerprint)]
+            for fingerprint in fingerprints
+            if (model, version, fingerprint) in stored
+        }
+
+    def save(model, version, verdicts):
+        stored.update({(model, version, fingerprint): v for fingerprint, v in verdicts.items()})
+
+    monkeypatch.setattr(verdict_memo, "load", load)
+    monkeypatch.setattr(verdict_memo, "save", save)
+
+    assert compare(_items("4 кВт")) == ["Мощность", "Напор"]
+    assert compare(_items("4 кВт")) == []
+    assert compare(_items("4,5 кВт")) == ["Мощность"]
+
+
+def test_unavailable_verdict_store_falls_back_to_a_full_run(monkeypatch, compare):
+    def broken_session():
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(verdict_memo, "SessionLocal", broken_session)
+
+    assert verdict_memo.load("model", "version", ["a"]) == {}
+    verdict_memo.save("model", "version", {"a": {"is_match": True}})
+    assert compare(_items("4 кВт")) == ["Мощность", "Напор"]
+    assert compare(_items("4 кВт")) == ["Мощность", "Напор"]
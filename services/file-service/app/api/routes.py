@@ -1,87 +1,98 @@
+import mimetypes
 import shutil
 import subprocess
 import tempfile
 from pathlib import Path
-from uuid import uuid4
+from urllib.parse import quote
 
 import aiofiles
-from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from botocore.exceptions import ClientError
+from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
 from celery.result import AsyncResult
+from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
 from app.celery_app import celery_app
 from app.core.config import settings
-from app.services.storage import download_file_path, presign_url
-from app.tasks import upload_to_s3
+from app.services import preview
+from app.services.office_pool import PoolBusyError
+from app.services.storage import open_object, presign_url
+from app.services.streaming_upload import stream_form_to_s3
+from app.tasks import schedule_preview, upload_to_s3
 
 router = APIRouter()
 
+_STREAM_CHUNK_BYTES = 1024 * 1024
+_PRESIGN_BATCH_MAX_KEYS = 500
 
-def _is_docx_document(name: str, content_type: str | None) -> bool:
-    suffix = Path(name).suffix.lower()
-    normalized = (content_type or "").split(";", 1)[0].strip().lower()
-    return (
-        suffix in {".doc", ".docx"}
-        or normalized
-        in {
-            "application/msword",
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        }
-    )
 
+class PresignBatchRequest(BaseModel):
+    keys: list[str]
+    expires_in: int = Field(default=3600, gt=0, le=7 * 24 * 3600)
 
-def _is_excel_document(name: str, content_type: str | None) -> bool:
-    suffix = Path(name).suffix.lower()
-    normalized = (content_type or "").split(";", 1)[0].strip().lower()
-    return (
-        suffix in {".xls", ".xlsx", ".xlsm"}
-        or normalized
-        in {
-            "application/vnd.ms-excel",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        }
-    )
 
+def _safe_download_name(name: str) -> str:
+    return Path(name or "document").name or "document"
 
-def _is_pdf_document(name: str, content_type: str | None) -> bool:
-    suffix = Path(name).suffix.lower()
-    normalized = (content_type or "").split(";", 1)[0].strip().lower()
-    return suffix == ".pdf" or normalized == "application/pdf"
 
+def _content_disposition(disposition_type: str, filename: str) -> str:
+    # Так же, как FileResponse: не-ASCII имя уходит в filename* (RFC 6266).
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition_type}; filename*=utf-8''{quoted}"
+    return f'{disposition_type}; filename="{filename}"'
 
-def _safe_download_name(name: str) -> str:
-    return Path(name or "document").name or "document"
+
+def _single_byte_range(range_header: str | None) -> str | None:
+    """Range, который можно передать в get_object: S3 понимает только один
+    диапазон байтов. На остальные отвечаем целым объектом, как разрешает
+    RFC 9110."""
+    if not range_header:
+        return None
+    value = range_header.strip()
+    if not value.lower().startswith("bytes=") or "," in value:
+        return None
+    return value
 
 
-def _convert_office_document_to_pdf(source_path: Path, output_dir: Path) -> Path:
-    profile_dir = output_dir / "lo-profile"
-    profile_dir.mkdir(parents=True, exist_ok=True)
-    command = [
-        "soffice",
-        "--headless",
-        "--nologo",
-        "--nofirststartwizard",
-        "--nodefault",
-        f"-env:UserInstallation=file://{profile_dir.as_posix()}",
-        "--convert-to",
-        "pdf",
-        "--outdir",
-        str(output_dir),
-        str(source_path),
-    ]
-    result = subprocess.run(command, capture_output=True, text=True, timeout=90, check=False)
-    if result.returncode != 0:
-        detail = (result.stderr or result.stdout or "LibreOffice conversion failed").strip()
-        raise RuntimeError(detail)
-
-    pdf_path = output_dir / f"{source_path.stem}.pdf"
-    if pdf_path.exists():
-        return pdf_path
-
-    candidates = sorted(output_dir.glob("*.pdf"), key=lambda path: path.stat().st_mtime, reverse=True)
-    if not candidates:
-        raise RuntimeError("LibreOffice did not create a PDF preview")
-    return candidates[0]
+async def _stream_s3_object(
+    key: str,
+    filename: str,
+    background_tasks: BackgroundTasks,
+    *,
+    media_type: str | None = None,
+    range_header: str | None = None,
+    disposition_type: str = "inline",
+) -> StreamingResponse:
+    """Отдаёт объект S3 потоком из get_object, без временного файла.
+
+    Range передаётся в S3 как есть, и ответ приходит 206 с Content-Range —
+    так PDF.js во вьюере догружает только нужные страницы."""
+    try:
+        obj = await run_in_threadpool(open_object, key, _single_byte_range(range_header))
+    except ClientError as exc:
+        if exc.response.get("Error", {}).get("Code") == "InvalidRange":
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable")
+        raise
+    body = obj["Body"]
+    background_tasks.add_task(body.close)
+    headers = {
+        "content-disposition": _content_disposition(disposition_type, filename),
+        "accept-ranges": "bytes",
+    }
+    if obj.get("ContentLength") is not None:
+        headers["content-length"] = str(obj["ContentLength"])
+    if obj.get("ContentRange"):
+        headers["content-range"] = obj["ContentRange"]
+    if obj.get("ETag"):
+        headers["etag"] = obj["ETag"]
+    return StreamingResponse(
+        iterate_in_threadpool(body.iter_chunks(_STREAM_CHUNK_BYTES)),
+        status_code=206 if obj.get("ContentRange") else 200,
+        media_type=media_type or obj.get("ContentType") or "application/octet-stream",
+        headers=headers,
+    )
 
 
 @router.post("/files/upload-batch")
@@ -128,6 +139,41 @@ async def upload_batch(
     }
 
 
+@router.post("/files/upload-stream")
+async def upload_stream(
+    request: Request,
+    analysis_id: str,
+    tz_file_id: str,
+    passport_file_id: str,
+):
+    """Заливает tz_file и passport_file из multipart-тела прямо в S3, не
+    сохраняя их на диск (см. app/services/streaming_upload.py). Остальные
+    поля формы возвращаются как есть — их разбирает api-gateway."""
+    try:
+        fields, files = await stream_form_to_s3(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            {
+                "tz_file": ("tz", tz_file_id),
+                "passport_file": ("passport", passport_file_id),
+            },
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+    for uploaded in files.values():
+        uploaded["url"] = presign_url(uploaded["key"])
+        schedule_preview(uploaded["key"], uploaded["name"], uploaded["content_type"])
+    return {
+        "analysis_id": analysis_id,
+        "fields": fields,
+        "tz": files.get("tz_file"),
+        "passport": files.get("passport_file"),
+    }
+
+
 @router.get("/files/presign")
 async def get_presigned_url(key: str, expires_in: int = 3600):
     """Сгенерировать свежий presigned URL для ключа в S3/MinIO."""
@@ -138,6 +184,22 @@ async def get_presigned_url(key: str, expires_in: int = 3600):
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+@router.post("/files/presign-batch")
+async def get_presigned_urls(payload: PresignBatchRequest):
+    """Presigned URL сразу для нескольких ключей: подпись считается локально
+    общим S3-клиентом, так что пакет стоит один HTTP-запрос к сервису."""
+    if len(payload.keys) > _PRESIGN_BATCH_MAX_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {_PRESIGN_BATCH_MAX_KEYS} keys per request",
+        )
+    try:
+        urls = {key: presign_url(key, payload.expires_in) for key in dict.fromkeys(payload.keys)}
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    return {"urls": urls, "expires_in": payload.expires_in}
+
+
 @router.get("/files/status/{task_id}")
 async def upload_status(task_id: str):
     result = AsyncResult(task_id, app=celery_app)
@@ -148,18 +210,21 @@ async def upload_status(task_id: str):
 async def download_file(
     key: str,
     name: str,
+    request: Request,
     background_tasks: BackgroundTasks,
 ):
+    safe_name = _safe_download_name(name)
     try:
-        downloads_dir = Path(settings.TMP_DIR) / "downloads"
-        downloads_dir.mkdir(parents=True, exist_ok=True)
-        target_path = downloads_dir / f"{uuid4()}_{name}"
-        download_file_path(key, str(target_path))
-        background_tasks.add_task(target_path.unlink, missing_ok=True)
-        return FileResponse(
-            path=str(target_path),
-            filename=name,
+        return await _stream_s3_object(
+            key,
+            safe_name,
+            background_tasks,
+            media_type=mimetypes.guess_type(safe_name)[0],
+            range_header=request.headers.get("range"),
+            disposition_type="attachment",
         )
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
@@ -168,44 +233,57 @@ async def download_file(
 async def preview_file(
     key: str,
     name: str,
+    request: Request,
     background_tasks: BackgroundTasks,
     content_type: str | None = None,
 ):
     safe_name = _safe_download_name(name)
-    if not (
-        _is_pdf_document(safe_name, content_type)
-        or _is_docx_document(safe_name, content_type)
-        or _is_excel_document(safe_name, content_type)
-    ):
+    is_pdf = preview.is_pdf_document(safe_name, content_type)
+    if not (is_pdf or preview.is_office_document(safe_name, content_type)):
         raise HTTPException(
             status_code=415,
             detail="Preview supports PDF, Word and Excel documents only",
         )
 
+    preview_name = safe_name if is_pdf else f"{Path(safe_name).stem}.pdf"
     try:
-        Path(settings.TMP_DIR).mkdir(parents=True, exist_ok=True)
-        work_dir = Path(tempfile.mkdtemp(prefix="preview-", dir=settings.TMP_DIR))
-        source_path = work_dir / safe_name
-        download_file_path(key, str(source_path))
-        background_tasks.add_task(shutil.rmtree, work_dir, ignore_errors=True)
+        range_header = request.headers.get("range")
+        if is_pdf:
+            return await _stream_s3_object(
+                key,
+                preview_name,
+                background_tasks,
+                media_type="application/pdf",
+                range_header=range_header,
+            )
 
-        if _is_pdf_document(safe_name, content_type):
-            return FileResponse(
-                path=str(source_path),
-                filename=safe_name,
+        cached_key = await run_in_threadpool(preview.cached_preview_key, key)
+        if cached_key is not None:
+            return await _stream_s3_object(
+                cached_key,
+                preview_name,
+                background_tasks,
                 media_type="application/pdf",
-                content_disposition_type="inline",
+                range_header=range_header,
             )
 
-        pdf_path = _convert_office_document_to_pdf(source_path, work_dir)
-        preview_name = f"{Path(safe_name).stem}.pdf"
+        # Превью ещё не готово (заливка была до появления кэша или задача
+        # build_preview не успела): конвертируем здесь, результат попадёт в кэш.
+        Path(settings.TMP_DIR).mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(prefix="preview-", dir=settings.TMP_DIR))
+        background_tasks.add_task(shutil.rmtree, work_dir, ignore_errors=True)
+        pdf_path = await run_in_threadpool(preview.render_preview, key, safe_name, work_dir)
         return FileResponse(
             path=str(pdf_path),
             filename=preview_name,
             media_type="application/pdf",
             content_disposition_type="inline",
         )
+    except HTTPException:
+        raise
     except subprocess.TimeoutExpired:
         raise HTTPException(status_code=504, detail="Document preview conversion timed out")
+    except PoolBusyError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
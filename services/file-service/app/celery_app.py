@@ -24,5 +24,9 @@ celery_app.conf.update(
             "queue": "file_service",
             "routing_key": "file_service",
         },
+        "file_service.build_preview": {
+            "queue": "file_service",
+            "routing_key": "file_service",
+        },
     },
 )
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 
 from app.api.routes import router as file_router
+from app.services import office_pool
 
 app = FastAPI(title="file-service")
 app.include_router(file_router)
@@ -8,3 +9,9 @@ app.include_router(file_router)
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics/office-pool")
+async def office_pool_metrics():
+    """Очередь, счётчики и задержки пула LibreOffice процесса API."""
+    return office_pool.stats()
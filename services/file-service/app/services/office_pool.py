@@ -0,0 +1,270 @@
+"""Пул долгоживущих экземпляров LibreOffice для конвертации в PDF.
+
+Раньше каждое превью запускало свой soffice с новым профилем: несколько
+секунд холодного старта на каждый документ и ничем не ограниченное число
+одновременных soffice под нагрузкой. Здесь процесс держит до
+OFFICE_POOL_SIZE экземпляров unoserver (soffice + XML-RPC-обёртка над UNO),
+каждый со своим портом и постоянным профилем, и отдаёт документы им:
+
+- экземпляры запускаются лениво, при первой конвертации, которой они нужны;
+- ждать свободного экземпляра могут не больше OFFICE_POOL_MAX_QUEUE
+  конвертаций, остальные сразу получают PoolBusyError (503), а ожидание
+  ограничено OFFICE_POOL_QUEUE_TIMEOUT_SECONDS;
+- конвертация дольше OFFICE_CONVERSION_TIMEOUT_SECONDS прерывается
+  (subprocess.TimeoutExpired, как и у прежнего вызова soffice), а экземпляр
+  перезапускается;
+- экземпляр перезапускается и после OFFICE_POOL_RECYCLE_AFTER конвертаций
+  (LibreOffice со временем копит память), и после падения.
+
+stats() отдаёт глубину очереди, счётчики и задержки конвертаций — их
+показывает GET /metrics/office-pool.
+
+Пул свой у каждого процесса: у API и у каждого процесса Celery-воркера.
+"""
+
+import atexit
+import math
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+import time
+import xmlrpc.client
+from collections import deque
+from pathlib import Path
+
+from app.core.config import settings
+
+
+class PoolBusyError(RuntimeError):
+    """Очередь на конвертацию переполнена или ожидание истекло."""
+
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout: float) -> None:
+        super().__init__()
+        self._timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self._timeout
+        return connection
+
+
+class _Instance:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.port = 0
+        self.profile_dir = Path(settings.TMP_DIR) / "lo-pool" / f"{os.getpid()}-{index}"
+        self.process: subprocess.Popen | None = None
+        self.conversions = 0
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        # Порты выбираются свободные при каждом запуске: процессов с пулом
+        # в контейнере несколько (API и дочерние процессы Celery).
+        self.port = _free_port()
+        uno_port = _free_port()
+        self.process = subprocess.Popen(
+            [
+                settings.UNOSERVER_EXECUTABLE,
+                "--interface", "127.0.0.1",
+                "--port", str(self.port),
+                "--uno-port", str(uno_port),
+                "--user-installation", self.profile_dir.as_uri(),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            # Своя группа процессов: stop() гасит и unoserver, и его soffice.
+            start_new_session=True,
+        )
+        self.conversions = 0
+        deadline = time.monotonic() + settings.OFFICE_POOL_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"LibreOffice instance {self.index} did not start")
+
+    def stop(self) -> None:
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+                process.wait(timeout=10)
+            except (ProcessLookupError, subprocess.TimeoutExpired):
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.wait()
+
+    def convert(self, source_path: Path, pdf_path: Path, timeout: float) -> None:
+        proxy = xmlrpc.client.ServerProxy(
+            f"http://127.0.0.1:{self.port}",
+            transport=_TimeoutTransport(timeout),
+            allow_none=True,
+        )
+        # convert(inpath, indata, outpath, convert_to): файлы общие, так что
+        # по XML-RPC передаются только пути.
+        try:
+            proxy.convert(str(source_path), None, str(pdf_path), "pdf")
+        except socket.timeout as exc:
+            raise subprocess.TimeoutExpired("unoserver convert", timeout) from exc
+        finally:
+            self.conversions += 1
+
+
+class OfficePool:
+    def __init__(self) -> None:
+        self._size = max(1, settings.OFFICE_POOL_SIZE)
+        self._idle: deque[_Instance] = deque(_Instance(index) for index in range(self._size))
+        self._condition = threading.Condition()
+        self._waiting = 0
+        self._busy = 0
+        self._counters = {"conversions": 0, "failures": 0, "timeouts": 0, "rejected": 0, "recycled": 0}
+        self._latencies: deque[float] = deque(maxlen=max(1, settings.OFFICE_POOL_LATENCY_WINDOW))
+        self._closed = False
+
+    def convert(self, source_path: Path, output_dir: Path) -> Path:
+        instance = self._acquire()
+        pdf_path = output_dir / f"{source_path.stem}.pdf"
+        started = time.monotonic()
+        healthy = False
+        try:
+            if not instance.alive():
+                instance.start()
+            instance.convert(source_path, pdf_path, settings.OFFICE_CONVERSION_TIMEOUT_SECONDS)
+            healthy = instance.alive()
+        except subprocess.TimeoutExpired:
+            self._count("timeouts")
+            raise
+        except xmlrpc.client.Fault as exc:
+            # Ошибка самого документа: экземпляр исправен.
+            healthy = instance.alive()
+            self._count("failures")
+            raise RuntimeError(exc.faultString.strip() or "LibreOffice conversion failed") from exc
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            recycle = not healthy or instance.conversions >= settings.OFFICE_POOL_RECYCLE_AFTER
+            if recycle and instance.process is not None:
+                instance.stop()
+                self._count("recycled")
+            self._release(instance)
+
+        if not pdf_path.exists():
+            self._count("failures")
+            raise RuntimeError("LibreOffice did not create a PDF preview")
+        with self._condition:
+            self._counters["conversions"] += 1
+            self._latencies.append(time.monotonic() - started)
+        return pdf_path
+
+    def stats(self) -> dict:
+        with self._condition:
+            samples = sorted(self._latencies)
+            stats = {
+                "size": self._size,
+                "running": sum(1 for instance in self._idle if instance.alive()) + self._busy,
+                "busy": self._busy,
+                "queue_depth": self._waiting,
+                "max_queue": settings.OFFICE_POOL_MAX_QUEUE,
+                **self._counters,
+            }
+        stats["latency_seconds"] = {
+            "p50": _percentile(samples, 0.5),
+            "p95": _percentile(samples, 0.95),
+            "max": samples[-1] if samples else None,
+            "samples": len(samples),
+        }
+        return stats
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            instances = list(self._idle)
+        for instance in instances:
+            instance.stop()
+            shutil.rmtree(instance.profile_dir, ignore_errors=True)
+
+    def _acquire(self) -> _Instance:
+        with self._condition:
+            if self._closed:
+                raise PoolBusyError("LibreOffice pool is shut down")
+            if not self._idle and self._waiting >= settings.OFFICE_POOL_MAX_QUEUE:
+                self._counters["rejected"] += 1
+                raise PoolBusyError("Too many documents are waiting for conversion")
+            self._waiting += 1
+            try:
+                if not self._condition.wait_for(
+                    lambda: self._idle, timeout=settings.OFFICE_POOL_QUEUE_TIMEOUT_SECONDS
+                ):
+                    self._counters["rejected"] += 1
+                    raise PoolBusyError("Timed out waiting for a LibreOffice instance")
+            finally:
+                self._waiting -= 1
+            self._busy += 1
+            return self._idle.popleft()
+
+    def _release(self, instance: _Instance) -> None:
+        with self._condition:
+            self._busy -= 1
+            # Уже запущенные экземпляры отдаются первыми, чтобы не будить
+            # лишние soffice, пока хватает работающих.
+            if instance.alive():
+                self._idle.appendleft(instance)
+            else:
+                self._idle.append(instance)
+            self._condition.notify()
+
+    def _count(self, name: str) -> None:
+        with self._condition:
+            self._counters[name] += 1
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _percentile(samples: list[float], percentile: float) -> float | None:
+    if not samples:
+        return None
+    rank = math.ceil(percentile * len(samples)) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+_pool: OfficePool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> OfficePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficePool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def stats() -> dict:
+    with _pool_lock:
+        pool = _pool
+    if pool is None:
+        return {"enabled": settings.OFFICE_POOL_ENABLED, "size": settings.OFFICE_POOL_SIZE, "running": 0}
+    return {"enabled": settings.OFFICE_POOL_ENABLED, **pool.stats()}
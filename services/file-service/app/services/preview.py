@@ -0,0 +1,154 @@
+"""Превью документов и их кэш.
+
+Word и Excel показываются в браузере как PDF, который собирает LibreOffice —
+это секунды на каждое открытие. Поэтому готовый PDF кладётся обратно в S3
+под ключом {S3_PREVIEW_PREFIX}/<ETag исходника>.pdf: ETag меняется вместе с
+содержимым объекта, так что устаревшее превью никогда не отдаётся, а
+одинаковые файлы делят одно превью. Сразу после заливки превью строит
+Celery-задача build_preview, и /files/preview обычно просто отдаёт готовый
+объект из S3.
+
+Кэш — ускорение, а не источник данных: если S3 не отвечает на проверку или
+запись превью, документ конвертируется и отдаётся как раньше.
+"""
+
+import subprocess
+from pathlib import Path
+
+from app.core.config import settings
+from app.services import office_pool
+from app.services.storage import _client, transfer_config
+
+
+def is_docx_document(name: str, content_type: str | None) -> bool:
+    suffix = Path(name).suffix.lower()
+    normalized = (content_type or "").split(";", 1)[0].strip().lower()
+    return (
+        suffix in {".doc", ".docx"}
+        or normalized
+        in {
+            "application/msword",
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        }
+    )
+
+
+def is_excel_document(name: str, content_type: str | None) -> bool:
+    suffix = Path(name).suffix.lower()
+    normalized = (content_type or "").split(";", 1)[0].strip().lower()
+    return (
+        suffix in {".xls", ".xlsx", ".xlsm"}
+        or normalized
+        in {
+            "application/vnd.ms-excel",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        }
+    )
+
+
+def is_pdf_document(name: str, content_type: str | None) -> bool:
+    suffix = Path(name).suffix.lower()
+    normalized = (content_type or "").split(";", 1)[0].strip().lower()
+    return suffix == ".pdf" or normalized == "application/pdf"
+
+
+def is_office_document(name: str, content_type: str | None) -> bool:
+    return is_docx_document(name, content_type) or is_excel_document(name, content_type)
+
+
+def convert_office_document_to_pdf(source_path: Path, output_dir: Path) -> Path:
+    if settings.OFFICE_POOL_ENABLED:
+        return office_pool.get_pool().convert(source_path, output_dir)
+    return _convert_with_soffice(source_path, output_dir)
+
+
+def _convert_with_soffice(source_path: Path, output_dir: Path) -> Path:
+    """Разовый запуск soffice — без пула (OFFICE_POOL_ENABLED=false)."""
+    profile_dir = output_dir / "lo-profile"
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    command = [
+        "soffice",
+        "--headless",
+        "--nologo",
+        "--nofirststartwizard",
+        "--nodefault",
+        f"-env:UserInstallation=file://{profile_dir.as_posix()}",
+        "--convert-to",
+        "pdf",
+        "--outdir",
+        str(output_dir),
+        str(source_path),
+    ]
+    result = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        timeout=settings.OFFICE_CONVERSION_TIMEOUT_SECONDS,
+        check=False,
+    )
+    if result.returncode != 0:
+        detail = (result.stderr or result.stdout or "LibreOffice conversion failed").strip()
+        raise RuntimeError(detail)
+
+    pdf_path = output_dir / f"{source_path.stem}.pdf"
+    if pdf_path.exists():
+        return pdf_path
+
+    candidates = sorted(output_dir.glob("*.pdf"), key=lambda path: path.stat().st_mtime, reverse=True)
+    if not candidates:
+        raise RuntimeError("LibreOffice did not create a PDF preview")
+    return candidates[0]
+
+
+def _preview_key(source_etag: str) -> str:
+    return f"{settings.S3_PREVIEW_PREFIX}/{source_etag}.pdf"
+
+
+def _source_etag(client, key: str) -> str | None:
+    try:
+        head = client.head_object(Bucket=settings.BUCKET_NAME, Key=key)
+    except Exception:
+        return None
+    return (head.get("ETag") or "").strip('"') or None
+
+
+def cached_preview_key(key: str) -> str | None:
+    """Ключ готового PDF-превью объекта key или None, если его ещё нет."""
+    if not settings.PREVIEW_CACHE_ENABLED or not settings.BUCKET_NAME:
+        return None
+    client = _client()
+    source_etag = _source_etag(client, key)
+    if source_etag is None:
+        return None
+    preview_key = _preview_key(source_etag)
+    try:
+        client.head_object(Bucket=settings.BUCKET_NAME, Key=preview_key)
+    except Exception:
+        return None
+    return preview_key
+
+
+def render_preview(key: str, name: str, work_dir: Path) -> Path:
+    """Скачивает документ в work_dir, конвертирует его в PDF и сохраняет
+    результат в кэш превью. Возвращает путь к PDF в work_dir."""
+    if not settings.BUCKET_NAME:
+        raise ValueError("BUCKET_NAME is not set")
+    client = _client()
+    # ETag берётся до скачивания: если объект перезапишут в процессе, PDF
+    # ляжет под старым ETag и новой версии просто не достанется.
+    source_etag = _source_etag(client, key) if settings.PREVIEW_CACHE_ENABLED else None
+    source_path = work_dir / (Path(name).name or "document")
+    client.download_file(settings.BUCKET_NAME, key, str(source_path), Config=transfer_config())
+    pdf_path = convert_office_document_to_pdf(source_path, work_dir)
+    if source_etag is not None:
+        try:
+            client.upload_file(
+                str(pdf_path),
+                settings.BUCKET_NAME,
+                _preview_key(source_etag),
+                ExtraArgs={"ContentType": "application/pdf"},
+                Config=transfer_config(),
+            )
+        except Exception:
+            pass
+    return pdf_path
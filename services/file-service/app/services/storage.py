@@ -1,22 +1,67 @@
+import os
+import threading
 from pathlib import Path
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 
 from app.core.config import settings
 
+_client_lock = threading.Lock()
+_cached_client: tuple[int, object] | None = None
+_transfer_config: TransferConfig | None = None
 
-def _client():
-    return boto3.client(
+
+def _create_client():
+    # Своя Session: сессия boto3 по умолчанию не потокобезопасна.
+    return boto3.session.Session().client(
         "s3",
         endpoint_url=settings.S3_ENDPOINT,
         region_name=settings.S3_REGION,
         aws_access_key_id=settings.AWS_KEY_ID,
         aws_secret_access_key=settings.AWS_SECRET_KEY,
-        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        config=Config(
+            signature_version="s3v4",
+            s3={"addressing_style": "path"},
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        ),
     )
 
 
+def _client():
+    """Общий S3-клиент процесса.
+
+    Создание клиента (endpoint, учётные данные, модель сервиса) стоит
+    миллисекунды и раньше повторялось на каждый presign, хотя сама подпись
+    считается локально. Клиент boto3 потокобезопасен. Привязка к pid нужна
+    для Celery prefork: дочерний процесс не должен делить пул соединений
+    с родителем."""
+    global _cached_client
+    cached = _cached_client
+    pid = os.getpid()
+    if cached is not None and cached[0] == pid:
+        return cached[1]
+    with _client_lock:
+        if _cached_client is None or _cached_client[0] != pid:
+            _cached_client = (pid, _create_client())
+        return _cached_client[1]
+
+
+def transfer_config() -> TransferConfig:
+    """Настройки upload_file/download_file: файлы больше порога идут
+    частями S3_UPLOAD_PART_SIZE_BYTES в S3_TRANSFER_CONCURRENCY потоков."""
+    global _transfer_config
+    if _transfer_config is None:
+        _transfer_config = TransferConfig(
+            multipart_threshold=settings.S3_TRANSFER_MULTIPART_THRESHOLD_BYTES,
+            multipart_chunksize=settings.S3_UPLOAD_PART_SIZE_BYTES,
+            max_concurrency=settings.S3_TRANSFER_CONCURRENCY,
+            use_threads=True,
+        )
+    return _transfer_config
+
+
 def upload_file_path(file_path: str, key: str, content_type: str | None = None) -> dict:
     if not settings.BUCKET_NAME:
         raise ValueError("BUCKET_NAME is not set")
@@ -29,7 +74,13 @@ def upload_file_path(file_path: str, key: str, content_type: str | None = None)
     if content_type:
         extra_args["ContentType"] = content_type
 
-    client.upload_file(str(path), settings.BUCKET_NAME, key, ExtraArgs=extra_args or None)
+    client.upload_file(
+        str(path),
+        settings.BUCKET_NAME,
+        key,
+        ExtraArgs=extra_args or None,
+        Config=transfer_config(),
+    )
     presigned_url = client.generate_presigned_url(
         "get_object",
         Params={"Bucket": settings.BUCKET_NAME, "Key": key},
@@ -42,8 +93,7 @@ def presign_url(key: str, expires_in: int | None = None) -> str:
     if not settings.BUCKET_NAME:
         raise ValueError("BUCKET_NAME is not set")
     ttl = expires_in if expires_in is not None else settings.S3_PRESIGNED_TTL_SECONDS
-    client = _client()
-    return client.generate_presigned_url(
+    return _client().generate_presigned_url(
         "get_object",
         Params={"Bucket": settings.BUCKET_NAME, "Key": key},
         ExpiresIn=ttl,
@@ -54,5 +104,47 @@ def download_file_path(key: str, target_path: str) -> str:
     if not settings.BUCKET_NAME:
         raise ValueError("BUCKET_NAME is not set")
     client = _client()
-    client.download_file(settings.BUCKET_NAME, key, target_path)
+    client.download_file(settings.BUCKET_NAME, key, target_path, Config=transfer_config())
     return target_path
+
+
+def find_by_sha256(client, digest: str) -> str | None:
+    """Ключ уже залитого объекта с таким же содержимым, если он есть.
+
+    Указатель sha256 → ключ хранится отдельным маленьким объектом под
+    S3_DEDUP_PREFIX. Ошибки хранилища дедупликацию просто отключают: файл
+    будет залит заново."""
+    try:
+        pointer = client.get_object(
+            Bucket=settings.BUCKET_NAME, Key=f"{settings.S3_DEDUP_PREFIX}/{digest}"
+        )
+        key = pointer["Body"].read().decode("utf-8").strip()
+        if not key:
+            return None
+        client.head_object(Bucket=settings.BUCKET_NAME, Key=key)
+        return key
+    except Exception:
+        return None
+
+
+def remember_sha256(client, digest: str, key: str) -> None:
+    try:
+        client.put_object(
+            Bucket=settings.BUCKET_NAME,
+            Key=f"{settings.S3_DEDUP_PREFIX}/{digest}",
+            Body=key.encode("utf-8"),
+            ContentType="text/plain",
+        )
+    except Exception:
+        pass
+
+
+def open_object(key: str, byte_range: str | None = None) -> dict:
+    """Ответ get_object: тело (Body) читается потоком, без временного файла.
+    byte_range — значение HTTP-заголовка Range (bytes=start-end)."""
+    if not settings.BUCKET_NAME:
+        raise ValueError("BUCKET_NAME is not set")
+    params = {"Bucket": settings.BUCKET_NAME, "Key": key}
+    if byte_range:
+        params["Range"] = byte_range
+    return _client().get_object(**params)
@@ -0,0 +1,287 @@
+"""Потоковая заливка файлов из тела запроса прямо в S3.
+
+Раньше файл проходил диск дважды: file-service писал его в TMP_DIR, а
+Celery-задача upload_to_s3 перечитывала его и отдавала boto3. Здесь
+multipart/form-data разбирается по мере чтения тела запроса, байты каждого
+файла режутся на части S3_UPLOAD_PART_SIZE_BYTES и отправляются через S3
+multipart upload, до S3_UPLOAD_CONCURRENCY частей параллельно. Пока все
+слоты заняты, чтение тела запроса останавливается, так что в памяти
+держится не больше (S3_UPLOAD_CONCURRENCY + 1) частей на файл.
+
+SHA-256 считается на лету. Если файл с таким содержимым уже залит
+(S3_UPLOAD_DEDUP), незавершённая multipart-заливка отменяется и
+возвращается ключ существующего объекта. Файлы меньше одной части
+заливаются одним put_object.
+"""
+
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import NamedTuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings
+from app.services.storage import _client, find_by_sha256, remember_sha256
+
+# Поля формы (не файлы) — короткие строки; больше не принимаем.
+_MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadedObject(NamedTuple):
+    key: str
+    size_bytes: int
+    sha256: str
+    deduplicated: bool
+
+
+class S3StreamUpload:
+    """Заливка одного файла в S3 по мере поступления байтов."""
+
+    def __init__(self, client, key: str, content_type: str | None) -> None:
+        self._client = client
+        self._key = key
+        self._content_type = content_type
+        self._buffer = bytearray()
+        self._sha256 = hashlib.sha256()
+        self._size = 0
+        self._upload_id: str | None = None
+        self._parts: list[asyncio.Task] = []
+        self._slots = asyncio.Semaphore(max(1, settings.S3_UPLOAD_CONCURRENCY))
+
+    async def write(self, data: bytes) -> None:
+        self._sha256.update(data)
+        self._size += len(data)
+        self._buffer.extend(data)
+        part_size = settings.S3_UPLOAD_PART_SIZE_BYTES
+        while len(self._buffer) >= part_size:
+            part = bytes(self._buffer[:part_size])
+            del self._buffer[:part_size]
+            await self._submit_part(part)
+
+    async def finish(self) -> UploadedObject:
+        digest = self._sha256.hexdigest()
+        if self._upload_id is None:
+            existing = await self._find_duplicate(digest)
+            if existing is not None:
+                return UploadedObject(existing, self._size, digest, True)
+            extra = {"ContentType": self._content_type} if self._content_type else {}
+            await asyncio.to_thread(
+                self._client.put_object,
+                Bucket=settings.BUCKET_NAME,
+                Key=self._key,
+                Body=bytes(self._buffer),
+                **extra,
+            )
+        else:
+            if self._buffer:
+                await self._submit_part(bytes(self._buffer))
+                self._buffer.clear()
+            parts = await asyncio.gather(*self._parts)
+            existing = await self._find_duplicate(digest)
+            if existing is not None:
+                await self.abort()
+                return UploadedObject(existing, self._size, digest, True)
+            await asyncio.to_thread(
+                self._client.complete_multipart_upload,
+                Bucket=settings.BUCKET_NAME,
+                Key=self._key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": list(parts)},
+            )
+            self._upload_id = None
+        if settings.S3_UPLOAD_DEDUP:
+            await asyncio.to_thread(remember_sha256, self._client, digest, self._key)
+        return UploadedObject(self._key, self._size, digest, False)
+
+    async def abort(self) -> None:
+        for task in self._parts:
+            task.cancel()
+        await asyncio.gather(*self._parts, return_exceptions=True)
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                await asyncio.to_thread(
+                    self._client.abort_multipart_upload,
+                    Bucket=settings.BUCKET_NAME,
+                    Key=self._key,
+                    UploadId=upload_id,
+                )
+            except Exception:
+                pass
+
+    async def _find_duplicate(self, digest: str) -> str | None:
+        if not settings.S3_UPLOAD_DEDUP:
+            return None
+        return await asyncio.to_thread(find_by_sha256, self._client, digest)
+
+    async def _submit_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            extra = {"ContentType": self._content_type} if self._content_type else {}
+            created = await asyncio.to_thread(
+                self._client.create_multipart_upload,
+                Bucket=settings.BUCKET_NAME,
+                Key=self._key,
+                **extra,
+            )
+            self._upload_id = created["UploadId"]
+        # Упавшая часть прерывает заливку сразу, а не после чтения всего тела.
+        for task in self._parts:
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+        await self._slots.acquire()
+        part_number = len(self._parts) + 1
+        self._parts.append(asyncio.create_task(self._upload_part(part_number, data)))
+
+    async def _upload_part(self, part_number: int, data: bytes) -> dict:
+        try:
+            response = await asyncio.to_thread(
+                self._client.upload_part,
+                Bucket=settings.BUCKET_NAME,
+                Key=self._key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        finally:
+            self._slots.release()
+
+
+class _MultipartEvents:
+    """Колбэки MultipartParser → очередь событий для async-обработки."""
+
+    def __init__(self) -> None:
+        self.events: list[tuple] = []
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: dict[bytes, bytes] = {}
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def drain(self) -> list[tuple]:
+        events, self.events = self.events, []
+        return events
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field.extend(data[start:end])
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value.extend(data[start:end])
+
+    def _on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8")
+        filename = options.get(b"filename")
+        content_type = self._headers.get(b"content-type")
+        self.events.append(
+            (
+                "part",
+                name,
+                filename.decode("utf-8") if filename is not None else None,
+                content_type.decode("latin-1") if content_type else None,
+            )
+        )
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self.events.append(("data", data[start:end]))
+
+    def _on_part_end(self) -> None:
+        self.events.append(("end",))
+
+
+async def stream_form_to_s3(
+    body,
+    content_type_header: str,
+    file_keys: dict[str, tuple[str, str]],
+) -> tuple[dict[str, str], dict[str, dict]]:
+    """Разбирает multipart-тело запроса и заливает файлы в S3.
+
+    file_keys: имя поля формы → (префикс ключа, file_id); ключ объекта —
+    "<префикс>/<file_id>_<имя файла>". Возвращает текстовые поля формы и
+    описание залитых файлов по имени поля. Файлы в других полях
+    игнорируются."""
+    if not settings.BUCKET_NAME:
+        raise ValueError("BUCKET_NAME is not set")
+    _, params = parse_options_header(content_type_header)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("Missing multipart boundary")
+
+    client = _client()
+    events = _MultipartEvents()
+    parser = MultipartParser(boundary, events.callbacks())
+    fields: dict[str, str] = {}
+    files: dict[str, dict] = {}
+    uploads: list[S3StreamUpload] = []
+    current: tuple | None = None  # (kind, name, payload)
+
+    async def handle(event: tuple) -> None:
+        nonlocal current
+        if event[0] == "part":
+            _, name, filename, part_type = event
+            if filename is None:
+                current = ("field", name, bytearray())
+            elif name in file_keys:
+                prefix, file_id = file_keys[name]
+                safe_name = Path(filename).name or "document"
+                upload = S3StreamUpload(client, f"{prefix}/{file_id}_{safe_name}", part_type)
+                uploads.append(upload)
+                current = ("file", name, (upload, safe_name, part_type))
+            else:
+                current = ("skip", name, None)
+        elif event[0] == "data" and current is not None:
+            kind, name, payload = current
+            if kind == "field":
+                payload.extend(event[1])
+                if len(payload) > _MAX_FIELD_BYTES:
+                    raise ValueError(f"Form field {name!r} is too large")
+            elif kind == "file":
+                await payload[0].write(event[1])
+        elif event[0] == "end" and current is not None:
+            kind, name, payload = current
+            if kind == "field":
+                fields[name] = payload.decode("utf-8")
+            elif kind == "file":
+                upload, safe_name, part_type = payload
+                uploaded = await upload.finish()
+                files[name] = {
+                    "name": safe_name,
+                    "content_type": part_type,
+                    **uploaded._asdict(),
+                }
+            current = None
+
+    try:
+        async for chunk in body:
+            parser.write(chunk)
+            for event in events.drain():
+                await handle(event)
+        parser.finalize()
+        for event in events.drain():
+            await handle(event)
+    except BaseException:
+        for upload in uploads:
+            await upload.abort()
+        raise
+    return fields, files
@@ -1,9 +1,14 @@
 import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
 
 import httpx
 
 from app.celery_app import celery_app
 from app.core.config import settings
+from app.services import preview
 from app.services.storage import upload_file_path
 
 
@@ -27,6 +32,7 @@ def upload_to_s3(
             "size_bytes": size_bytes,
             "status": "uploaded",
         }
+        schedule_preview(key, os.path.basename(file_path), content_type)
     except Exception as exc:
         payload = {
             "analysis_id": analysis_id,
@@ -44,3 +50,34 @@ def upload_to_s3(
         client.post(f"{settings.API_GATEWAY_URL}/files/callback", json=payload)
 
     return payload
+
+
+@celery_app.task(name="file_service.build_preview", queue="file_service")
+def build_preview(key: str, name: str, content_type: str | None = None) -> dict:
+    """Заранее собирает PDF-превью Word/Excel-документа (см. app/services/preview.py)."""
+    if not preview.is_office_document(name, content_type):
+        return {"key": key, "status": "skipped"}
+    if preview.cached_preview_key(key) is not None:
+        return {"key": key, "status": "cached"}
+    Path(settings.TMP_DIR).mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix="preview-", dir=settings.TMP_DIR))
+    try:
+        preview.render_preview(key, name, work_dir)
+    except (RuntimeError, subprocess.TimeoutExpired) as exc:
+        # Битый документ не станет конвертироваться при повторе; /files/preview
+        # покажет ту же ошибку пользователю.
+        return {"key": key, "status": "failed", "error": str(exc)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"key": key, "status": "built"}
+
+
+def schedule_preview(key: str, name: str, content_type: str | None) -> None:
+    """Ставит build_preview для Word/Excel. Ошибка брокера не должна ронять
+    заливку: превью тогда соберётся при первом открытии."""
+    if not settings.PREVIEW_CACHE_ENABLED or not preview.is_office_document(name, content_type):
+        return
+    try:
+        build_preview.delay(key, name, content_type)
+    except Exception:
+        pass
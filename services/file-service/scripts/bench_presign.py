@@ -0,0 +1,88 @@
+"""Замер presign: новый boto3-клиент на каждый вызов (как storage._client
+делал раньше) против общего клиента процесса (storage.presign_url).
+
+Подпись считается локально, в S3 запросы не уходят, так что хватает
+настроек из env/.env (MinIO из docker-compose) или заглушки moto:
+
+    python scripts/bench_presign.py [--calls 500] [--threads 1 8] [--moto]
+
+С --moto bucket и учётные данные берутся фиктивные, реальный S3 не нужен.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.services import storage  # noqa: E402
+
+
+def _presign_with_new_client(key: str) -> str:
+    return storage._create_client().generate_presigned_url(
+        "get_object",
+        Params={"Bucket": settings.BUCKET_NAME, "Key": key},
+        ExpiresIn=settings.S3_PRESIGNED_TTL_SECONDS,
+    )
+
+
+def _presign_with_shared_client(key: str) -> str:
+    return storage.presign_url(key)
+
+
+def _measure(presign, calls: int, threads: int, repeat: int) -> float:
+    """Медиана presign в секунду по repeat прогонам."""
+    keys = [f"tz/bench-{index}.pdf" for index in range(calls)]
+    rates = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if threads == 1:
+            for key in keys:
+                presign(key)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(presign, keys))
+        rates.append(calls / (time.perf_counter() - started))
+    return statistics.median(rates)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--moto", action="store_true", help="fake S3 via moto.mock_aws")
+    args = parser.parse_args()
+
+    context = nullcontext()
+    if args.moto:
+        from moto import mock_aws
+
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+        settings.S3_ENDPOINT = None
+        settings.S3_REGION = "us-east-1"
+        settings.AWS_KEY_ID = "bench"
+        settings.AWS_SECRET_KEY = "bench"
+        settings.BUCKET_NAME = settings.BUCKET_NAME or "bench"
+        context = mock_aws()
+    if not settings.BUCKET_NAME:
+        parser.error("BUCKET_NAME is not set (use env/.env or --moto)")
+
+    with context:
+        storage.presign_url("tz/warmup.pdf")
+        print(f"{'threads':>7} {'new client, /s':>15} {'shared, /s':>12} {'speedup':>8}")
+        for threads in args.threads:
+            before = _measure(_presign_with_new_client, args.calls, threads, args.repeat)
+            after = _measure(_presign_with_shared_client, args.calls, threads, args.repeat)
+            print(f"{threads:>7} {before:>15.0f} {after:>12.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import json
 from datetime import date
 from typing import Any
@@ -17,13 +18,14 @@ from fastapi import (
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import desc, select
+from sqlalchemy import desc, func, select
 from sqlalchemy.orm import Session
 
 from app.db.models import (
     AppealClassificationRule,
     AuditEvent,
     CanonicalAttribute,
+    KnowledgeChunk,
     LetterTemplate,
     NormativeSource,
 )
@@ -549,6 +551,29 @@ def update_normative_source_form(
     return RedirectResponse(url=_redirect_to(project_key, "sources"), status_code=303)
 
 
+@router.get("/version")
+def knowledge_version(
+    project_key: str | None = Query(default=None),
+    db: Session = Depends(get_db),
+):
+    """Версия данных проекта: меняется при любом изменении канонических
+    атрибутов, источников или их chunk'ов. Клиенты (domain-analyze) держат
+    канонические атрибуты и выдачу поиска в кэше, пока версия не сменилась."""
+    parts: list[str] = []
+    for model, column in (
+        (CanonicalAttribute, CanonicalAttribute.domain),
+        (NormativeSource, NormativeSource.project_key),
+        (KnowledgeChunk, KnowledgeChunk.project_key),
+    ):
+        query = select(func.count(), func.max(model.updated_at))
+        if project_key:
+            query = query.where(column == project_key)
+        count, last_updated = db.execute(query).one()
+        parts.append(f"{model.__tablename__}:{count}:{last_updated.isoformat() if last_updated else ''}")
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+    return {"project_key": project_key, "version": digest}
+
+
 @router.get("/retrieval/search", response_model=RetrievalResponse)
 def retrieval_search(
     q: str = Query(..., min_length=2),
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException
+import hashlib
+import json
+
+from fastapi import APIRouter, Header, HTTPException, Response
 
 from app.services.prompt_store import list_prompt_summaries, resolve_prompt
 
 router = APIRouter()
 
 
+def _prompt_etag(prompt: dict) -> str:
+    payload = json.dumps(prompt, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
 @router.get("/health")
 async def health():
     return {"ok": True}
@@ -16,8 +24,19 @@ async def list_prompts():
 
 
 @router.get("/prompts/{file_type}")
-async def get_prompt(file_type: str):
+async def get_prompt(
+    file_type: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+):
     try:
-        return resolve_prompt(file_type)
+        prompt = resolve_prompt(file_type)
     except KeyError:
         raise HTTPException(status_code=404, detail="Unknown file type")
+    # ETag позволяет клиентам держать промпт в кэше и лишь изредка
+    # перепроверять его: неизменившийся промпт отдаётся пустым 304.
+    etag = _prompt_etag(prompt)
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return prompt
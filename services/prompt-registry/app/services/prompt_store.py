@@ -299,22 +299,25 @@ PROMPTS = {
         "type": "comparison",
         "title": "Compare TZ vs Passport",
         "prompt": (
-            "Ты — аналитик технической документации. Сравни техническое задание (ТЗ) и паспорт изделия. "
+            "Ты — аналитик технической документации. Сравни требования технического задания (ТЗ) "
+            "со значениями из паспорта изделия. "
             "Представь результат строго в формате JSON без использования markdown или форматирования. "
-            "Сравнивай следующие параметры: наименование продукции, характеристики, значения и ссылки на источники. "
-            "Выполняй сравнение по КАЖДОЙ характеристике. "
-            "Если данные отсутствуют или их невозможно сопоставить — укажи match=false. Не добавляй лишнего текста.\n\n"
-            "Формат результата: массив comparison_items. Каждый элемент должен содержать поля: "
-            "product_name, characteristic, tz_value, passport_value, tz_references, passport_references. "
-            "Дополнительно допускается массив comparisons, который может содержать несколько comparison_items. "
-            "Структура должна быть строго валидным JSON.\n\n"
+            "Выполняй сравнение по КАЖДОЙ строке входных данных. Не добавляй лишнего текста.\n\n"
+            "Входные данные: объект с массивом comparison_items. Каждый элемент содержит поля: "
+            "id (целое число, номер строки), product_name, characteristic, tz_value (требование ТЗ), "
+            "passport_value (значение из паспорта или null) и, если паспорт называет характеристику "
+            "несколько раз по-разному, passport_value_candidates — список всех найденных значений.\n\n"
+            "Формат результата: объект с полями match, summary и comparisons. comparisons содержит ровно "
+            "по одному элементу на каждую строку comparison_items.\n\n"
             "Правила формирования:\n"
-            "1) characteristic должен иметь формат: \"<product_name> - <characteristic>\".\n"
-            "2) tz_value и passport_value заполняй только при наличии данных, иначе указывай null.\n"
-            "3) tz_references и passport_references должны содержать точные цитаты из документов. "
-            "Если данные отсутствуют — добавь пояснение в поле note.\n"
+            "1) В каждом элементе comparisons верни id той строки, к которой он относится, без изменений.\n"
+            "2) characteristic, tz_value и passport_value переноси из входной строки; "
+            "при отсутствии данных указывай null.\n"
+            "3) tz_quote и passport_quote — значение ТЗ и значение паспорта, на которые опирается вердикт, "
+            "дословно так, как они даны во входной строке (для паспорта — выбранное значение из "
+            "passport_value_candidates); если значения нет — null.\n"
             "4) Устанавливай is_match=false, если значения не совпадают, отсутствуют "
-            "или невозможно определить соответствие.\n"
+            "или невозможно определить соответствие; причину кратко укажи в note.\n"
         ),
         "schema": {
             "type": "object",
@@ -327,6 +330,7 @@ PROMPTS = {
                     "items": {
                         "type": "object",
                         "required": [
+                            "id",
                             "characteristic",
                             "tz_value",
                             "passport_value",
@@ -335,6 +339,7 @@ PROMPTS = {
                             "is_match"
                         ],
                         "properties": {
+                            "id": {"type": "integer"},
                             "characteristic": {"type": "string"},
                             "tz_value": {"type": ["string", "null"]},
                             "passport_value": {"type": ["string", "null"]},